@@ -1,7 +1,8 @@
 import os
-import json
 import sys
+import argparse
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np # Import numpy for np.mean
 
 # Add the project root to sys.path to allow absolute imports
@@ -9,79 +10,142 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.insert(0, project_root)
 
 # Now perform absolute imports
-from src.generation.generate import read_midi_file
-from src.analysis.network_analyzer import analyze_midi_sequence_as_network
+from src.analysis.network_analyzer import analyze_midi_sequence_as_network, METRICS
+from src.analysis.metrics_index import MetricsIndex, INDEX_FILENAME
 from src.data_preprocessing.data_preprocessing import _limit_consecutive_notes # Import the note limiting function
+from src.data_preprocessing.jams_cache import read_note_annotations
 
-def analyze_original_data_metrics(data_path, genres):
+def _original_file_metrics(file_path):
+    """
+    Worker task: network metrics of one original JAMS file, all its note_midi annotations
+    joined into one sequence. Returns (metrics, error); metrics is None for an empty file.
+    """
+    try:
+        sequence = [note_val for annotation in read_note_annotations(file_path) for note_val in annotation]
+
+        # Apply the same note limiting as in preprocessing
+        filtered_sequence = _limit_consecutive_notes(sequence, max_consecutive=5)
+        return (analyze_midi_sequence_as_network(filtered_sequence) if filtered_sequence else None), None
+    except Exception as e:
+        return None, str(e)
+
+def analyze_original_data_metrics(data_path, genres, workers=None):
     """
     Analyzes the original JAMS files to calculate average network metrics per genre.
+
+    The directory is listed once and every file analysed once, even when it matches
+    several genres, on a pool of worker processes. Parsed files come from the JAMS
+    cache shared with preprocessing (see jams_cache.py), so a re-run only parses the
+    files added or modified since the last one.
+
+    Args:
+        data_path (str): Directory of the original JAMS files.
+        genres (list): Genres to report; a file belongs to a genre whose name appears in its file name.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+
+    Returns:
+        dict: Average of each metric, per genre, in the order of genres (genres
+        without any analysed file are left out).
     """
     print("\n--- Analyzing Original Data Metrics ---")
     genre_metrics = defaultdict(lambda: defaultdict(list))
 
+    file_genres = {}
+    for filename in sorted(os.listdir(data_path)):
+        if filename.endswith(".jams"):
+            matching = [genre_name for genre_name in genres if genre_name.lower() in filename.lower()]
+            if matching:
+                file_genres[filename] = matching
     for genre_name in genres:
-        print(f"Processing original {genre_name} data...")
-        for filename in os.listdir(data_path):
-            if filename.endswith(".jams") and genre_name.lower() in filename.lower():
-                file_path = os.path.join(data_path, filename)
-                try:
-                    with open(file_path, 'r') as f:
-                        jams_data = json.load(f)
-                    
-                    sequence = []
-                    for annotation in jams_data['annotations']:
-                        if annotation['namespace'] == 'note_midi':
-                            for note_data in annotation['data']:
-                                sequence.append(int(round(note_data['value'])))
-                    
-                    # Apply the same note limiting as in preprocessing
-                    filtered_sequence = _limit_consecutive_notes(sequence, max_consecutive=5)
-
-                    if filtered_sequence:
-                        metrics = analyze_midi_sequence_as_network(filtered_sequence)
-                        for key, value in metrics.items():
-                            genre_metrics[genre_name][key].append(value)
-
-                except Exception as e:
-                    print(f"Error processing original JAMS file {filename}: {e}")
-    
+        print(f"Processing original {genre_name} data: {sum(genre_name in g for g in file_genres.values())} files")
+
+    filenames = list(file_genres)
+    file_paths = [os.path.join(data_path, filename) for filename in filenames]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(file_paths) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_original_file_metrics, file_paths, chunksize=max(1, len(file_paths) // (workers * 4))))
+    else:
+        results = [_original_file_metrics(file_path) for file_path in file_paths]
+
+    for filename, (metrics, error) in zip(filenames, results):
+        if error is not None:
+            print(f"Error processing original JAMS file {filename}: {error}")
+        elif metrics:
+            for genre_name in file_genres[filename]:
+                for key, value in metrics.items():
+                    genre_metrics[genre_name][key].append(value)
+
+    averages = {}
     print("\n--- Average Original Data Metrics per Genre ---")
-    for genre, metrics_list in genre_metrics.items():
+    # In the order of genres, whatever order the files came in
+    for genre in [genre_name for genre_name in genres if genre_name in genre_metrics]:
+        metrics_list = genre_metrics[genre]
         print(f"\nGenre: {genre}")
+        averages[genre] = {}
         for metric_name, values in metrics_list.items():
             if values:
-                print(f"- {metric_name}: {np.mean(values):.4f}")
+                averages[genre][metric_name] = float(np.mean(values))
+                print(f"- {metric_name}: {averages[genre][metric_name]:.4f}")
             else:
                 print(f"- {metric_name}: N/A")
     print("------------------------------------------")
+    return averages
 
-def evaluate_generated_solos(output_dir):
+def evaluate_generated_solos(output_dir, index_path=None, prune=False):
     """
     Evaluates generated solos by analyzing their network metrics.
+
+    Metrics are kept in a SQLite index (see metrics_index.py, by default
+    output/metrics.sqlite): only the files added or modified since the last run are
+    read and analysed, and the per genre/temperature averages come from the index.
+
+    Args:
+        output_dir (str): Directory of the generated MIDI files.
+        index_path (str): Metrics index. Defaults to output_dir/metrics.sqlite.
+        prune (bool): Drop the index rows of files no longer in output_dir.
+
+    Returns:
+        list: Mean metrics per genre and temperature (see MetricsIndex.aggregate).
     """
     print("\n--- Analyzing Generated Solos ---")
     generated_files = [f for f in os.listdir(output_dir) if f.endswith('.mid')]
 
     if not generated_files:
         print(f"No generated MIDI files found in {output_dir}. Please generate some solos first.")
-        return
+        return []
 
-    for filename in generated_files:
-        file_path = os.path.join(output_dir, filename)
+    index = MetricsIndex(index_path or os.path.join(output_dir, INDEX_FILENAME))
+    analysed = index.update(output_dir)
+    print(f"{len(analysed)} new or modified file(s), {len(generated_files) - len(analysed)} already in the index.")
+    for filename, metrics in analysed.items():
         print(f"\nAnalyzing {filename}...")
-        
-        midi_notes = read_midi_file(file_path)
-        if midi_notes:
-            metrics = analyze_midi_sequence_as_network(midi_notes)
+        if metrics is not None:
             for key, value in metrics.items():
                 print(f"- {key}: {value}")
         else:
             print(f"Could not read notes from {filename}.")
+    if prune:
+        print(f"Pruned {index.prune(output_dir)} index row(s) of removed files.")
+
+    groups = index.aggregate(("genre", "temperature"))
+    print("\n--- Average Generated Solo Metrics per Genre and Temperature ---")
+    for group in groups:
+        temperature = "unknown" if group["temperature"] is None else f"{group['temperature']:g}"
+        print(f"\nGenre: {group['genre']}, temperature: {temperature} ({group['count']} solos)")
+        for metric_name in METRICS:
+            print(f"- {metric_name}: {group[metric_name]:.4f}")
 
     print("\n--- Objective Evaluation Complete ---")
+    return groups
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Objective evaluation of the original data and of the generated solos.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for the original data (default: all CPUs).")
+    parser.add_argument("--index", default=None, help="Metrics index of the generated solos (default: output/metrics.sqlite).")
+    parser.add_argument("--prune", action="store_true", help="Drop index rows of solos no longer in output/.")
+    args = parser.parse_args()
+
     # Define paths
     output_dir = os.path.join(project_root, "output")
     original_data_dir = os.path.join(project_root, "data") # Original JAMS files are here
@@ -90,7 +154,7 @@ if __name__ == '__main__':
     print("--- Starting Objective Evaluation ---")
 
     # Analyze original data first
-    analyze_original_data_metrics(original_data_dir, genres)
+    analyze_original_data_metrics(original_data_dir, genres, workers=args.workers)
 
     # Then analyze generated solos
-    evaluate_generated_solos(output_dir)
+    evaluate_generated_solos(output_dir, index_path=args.index, prune=args.prune)
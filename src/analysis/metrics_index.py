@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+from contextlib import closing
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.generate import midi_notes
+from src.analysis.network_analyzer import analyze_sequences_as_networks, METRICS
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "metrics.sqlite"
+GROUP_COLUMNS = ("genre", "tier", "temperature")
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def genre_from_filename(filename):
+    """Genre of a generated file, from its name ("rock_solo_<uuid>.mid" -> "rock")."""
+    return filename.split("_", 1)[0].lower()
+
+class MetricsIndex:
+    """
+    Persistent SQLite index of the generated solos and of their network metrics.
+
+    One row per file in the output directory, keyed by file name and content hash. The
+    backend records the generation parameters of every file it saves (record_generation);
+    update() analyses only the files that are new or whose content changed since they
+    were indexed, and aggregate() answers per genre/tier/temperature queries from the
+    index without reading any MIDI file. Files that can't be parsed keep analyzed_at
+    NULL and the reason in error, so they never count in aggregate(). Rows outlive the
+    files they describe (the output retention policy deletes files) until prune() is called.
+
+    Every call opens its own connection, so an index can be shared by threads and processes.
+
+    Args:
+        db_path (str): SQLite database file, created if missing.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        metric_columns = ", ".join(f"{name} REAL" for name in METRICS)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS solos (
+                    filename TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    genre TEXT,
+                    tier TEXT,
+                    temperature REAL,
+                    params TEXT,
+                    {metric_columns},
+                    recorded_at REAL,
+                    analyzed_at REAL,
+                    error TEXT
+                )""")
+            if "error" not in {row["name"] for row in conn.execute("PRAGMA table_info(solos)")}:
+                # Indexes written before the error column scored unreadable files as empty
+                # solos: analyse those again so they are told apart
+                conn.execute("ALTER TABLE solos ADD COLUMN error TEXT")
+                conn.execute("UPDATE solos SET analyzed_at = NULL WHERE sequence_length = 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS solos_content_hash ON solos (content_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS solos_genre_temperature ON solos (genre, temperature)")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def record_generation(self, filename, data, params):
+        """
+        Records the generation parameters of a file written to the output directory.
+        params is a dict with at least "genre"; "tier" and "temperature" are also stored
+        in their own columns for aggregate(). Metrics are left to update().
+        """
+        digest = content_hash(data)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                INSERT INTO solos (filename, content_hash, genre, tier, temperature, params, recorded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (filename) DO UPDATE SET
+                    genre = excluded.genre, tier = excluded.tier, temperature = excluded.temperature,
+                    params = excluded.params, recorded_at = excluded.recorded_at,
+                    analyzed_at = CASE WHEN content_hash = excluded.content_hash THEN analyzed_at END,
+                    error = CASE WHEN content_hash = excluded.content_hash THEN error END,
+                    content_hash = excluded.content_hash""",
+                (filename, digest, params["genre"].lower(), params.get("tier"), params.get("temperature"),
+                 json.dumps(params, sort_keys=True), time.time()))
+
+    def update(self, directory):
+        """
+        Brings the index up to date with the .mid files of a directory.
+
+        A file is skipped when its size and modification time match its row, or when its
+        content hash does. Files whose content is already indexed under another name (e.g.
+        the same seeded request saved twice) reuse those metrics; the rest are read and
+        analysed together with analyze_sequences_as_networks. A file that can't be parsed
+        is stored with its error and no metrics, and only read again once its content changes.
+
+        Returns:
+            dict: File name -> metrics of the files analysed by this call, None for the
+            files that could not be parsed.
+        """
+        filenames = sorted(f for f in os.listdir(directory) if f.endswith(".mid"))
+        with closing(self._connect()) as conn:
+            rows = {row["filename"]: row for row in conn.execute("SELECT * FROM solos")}
+        analysed_hashes = {row["content_hash"]: row for row in rows.values() if row["analyzed_at"] is not None}
+
+        unchanged, reused, pending, notes, failed = [], [], [], [], []
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+                row = rows.get(filename)
+                done = row is not None and (row["analyzed_at"] is not None or row["error"] is not None)
+                if done and (row["size"], row["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                with open(path, "rb") as f:
+                    data = f.read()
+            except FileNotFoundError:
+                continue # Removed by the retention sweep in the meantime
+            digest = content_hash(data)
+            key = (filename, digest, stat.st_size, stat.st_mtime_ns)
+            if done and row["content_hash"] == digest:
+                unchanged.append(key)
+            elif digest in analysed_hashes:
+                reused.append((key, {name: analysed_hashes[digest][name] for name in METRICS}))
+            else:
+                try:
+                    notes.append(midi_notes(data))
+                    pending.append(key)
+                except Exception as e:
+                    logger.warning(f"Metrics index: could not read {filename}: {e}")
+                    failed.append((key, str(e) or type(e).__name__))
+
+        table = analyze_sequences_as_networks(notes) if pending else {}
+        analysed = {key[0]: {name: table[name][i].item() for name in METRICS} for i, key in enumerate(pending)}
+        analysed.update({key[0]: metrics for key, metrics in reused})
+
+        now = time.time()
+        metric_columns = ", ".join(METRICS)
+        updates = ", ".join(f"{name} = excluded.{name}" for name in METRICS)
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("UPDATE solos SET size = ?, mtime_ns = ? WHERE filename = ?",
+                             [(size, mtime_ns, filename) for filename, _, size, mtime_ns in unchanged])
+            conn.executemany(f"""
+                INSERT INTO solos (filename, content_hash, size, mtime_ns, genre, {metric_columns}, analyzed_at)
+                VALUES (?, ?, ?, ?, ?, {", ".join("?" for _ in METRICS)}, ?)
+                ON CONFLICT (filename) DO UPDATE SET
+                    content_hash = excluded.content_hash, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    {updates}, analyzed_at = excluded.analyzed_at, error = NULL""",
+                [(filename, digest, size, mtime_ns, genre_from_filename(filename),
+                  *(analysed[filename][name] for name in METRICS), now)
+                 for filename, digest, size, mtime_ns in pending + [key for key, _ in reused]])
+            conn.executemany(f"""
+                INSERT INTO solos (filename, content_hash, size, mtime_ns, genre, error)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (filename) DO UPDATE SET
+                    content_hash = excluded.content_hash, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                    {", ".join(f"{name} = NULL" for name in METRICS)}, analyzed_at = NULL, error = excluded.error""",
+                [(filename, digest, size, mtime_ns, genre_from_filename(filename), error)
+                 for (filename, digest, size, mtime_ns), error in failed])
+        logger.info(f"Metrics index: {len(analysed)} file(s) analysed, {len(failed)} unreadable, "
+                    f"{len(filenames) - len(analysed) - len(failed)} already indexed")
+        analysed.update({key[0]: None for key, _ in failed})
+        return analysed
+
+    def prune(self, directory):
+        """Deletes the rows of files no longer in the directory. Returns the number of rows deleted."""
+        present = set(os.listdir(directory))
+        with closing(self._connect()) as conn, conn:
+            missing = [(row["filename"],) for row in conn.execute("SELECT filename FROM solos") if row["filename"] not in present]
+            conn.executemany("DELETE FROM solos WHERE filename = ?", missing)
+        return len(missing)
+
+    def aggregate(self, group_by=("genre", "temperature"), genre=None):
+        """
+        Count and mean of every metric over the analysed solos, per group.
+
+        Args:
+            group_by (tuple): Columns among GROUP_COLUMNS. Files saved without recorded
+                parameters have no tier or temperature and form their own group.
+            genre (str): Only this genre.
+
+        Returns:
+            list: One dict per group, with the group columns, "count" and the mean metrics.
+        """
+        group_by = tuple(group_by)
+        unknown = [column for column in group_by if column not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by {unknown}. Use columns among {GROUP_COLUMNS}.")
+        columns = ", ".join(group_by + ("COUNT(*) AS count",) + tuple(f"AVG({name}) AS {name}" for name in METRICS))
+        query = f"SELECT {columns} FROM solos WHERE analyzed_at IS NOT NULL"
+        args = ()
+        if genre is not None:
+            query += " AND genre = ?"
+            args = (genre.lower(),)
+        if group_by:
+            query += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+        with closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(query, args)]
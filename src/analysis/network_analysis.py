@@ -1,10 +1,15 @@
 
 import os
 import json
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
+from scipy import sparse
+from scipy.sparse import csgraph
 from music21 import converter, note, chord
 
+BACKENDS = ("sparse", "networkx")
+
 def midi_to_sequence(midi_path):
     """Converts a MIDI file to a sequence of MIDI note numbers."""
     midi = converter.parse(midi_path)
@@ -37,21 +42,54 @@ def sequence_to_graph(sequence):
             G.add_edge(u, v, weight=1)
     return G
 
-def get_graph_metrics(G):
+def sequence_to_adjacency(sequence):
+    """
+    Builds the sparse weighted adjacency matrix of the graph of sequence_to_graph,
+    without networkx. Sequences can be merged into a corpus graph by passing their
+    concatenation (or by summing matrices over the same notes).
+
+    Returns:
+        tuple: (scipy.sparse.csr_array, node i -> note)
+    """
+    notes, indices = np.unique(np.asarray(sequence, dtype=np.int64), return_inverse=True)
+    weights = np.ones(max(len(indices) - 1, 0), dtype=np.int64)
+    adjacency = sparse.coo_array((weights, (indices[:-1], indices[1:])), shape=(len(notes), len(notes))).tocsr()
+    adjacency.sum_duplicates()
+    return adjacency, notes.tolist()
+
+def get_graph_metrics(G, backend="sparse", sample_sources=None, seed=None):
     """
     Calculates graph metrics. Handles disconnected graphs.
+
+    Args:
+        G: A networkx graph, or a (weighted) scipy sparse adjacency matrix (see
+            sequence_to_adjacency).
+        backend (str): "sparse" (scipy.sparse.csgraph breadth-first searches and
+            sparse matrix products) or "networkx". Both give the same metrics.
+        sample_sources (int): Sparse backend only. Estimate each component's average
+            path length from this many random source nodes instead of all of them,
+            and report the 95% error bound as "avg_path_length_error".
+        seed: Seed of the source sampling.
     """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown graph backend '{backend}'. Use 'sparse' or 'networkx'.")
+    if sparse.issparse(G):
+        if backend == "networkx":
+            G = nx.from_scipy_sparse_array(G, create_using=nx.DiGraph)
+        elif G.shape[0] == 0:
+            return _empty_metrics()
+        else:
+            return _sparse_graph_metrics(sparse.csr_array(G), sample_sources, seed)
     if not G.nodes():
-        return {
-            "avg_clustering": 0,
-            "avg_path_length": 0,
-            "num_nodes": 0,
-            "num_edges": 0,
-        }
+        return _empty_metrics()
+    if backend == "sparse":
+        return _sparse_graph_metrics(nx.to_scipy_sparse_array(G, weight=None, format="csr"), sample_sources, seed,
+                                     directed=G.is_directed())
 
     avg_clustering = nx.average_clustering(G)
     num_nodes = G.number_of_nodes()
     num_edges = G.number_of_edges()
+    degrees = [degree for _, degree in G.degree()]
 
     # For path length, use the undirected version of the graph to avoid issues
     # with graphs that are not strongly connected.
@@ -81,7 +119,97 @@ def get_graph_metrics(G):
         "avg_path_length": avg_path_length,
         "num_nodes": num_nodes,
         "num_edges": num_edges,
+        "avg_degree": float(np.mean(degrees)),
+        "max_degree": int(max(degrees)),
+    }
+
+def _empty_metrics():
+    return {
+        "avg_clustering": 0,
+        "avg_path_length": 0,
+        "num_nodes": 0,
+        "num_edges": 0,
+        "avg_degree": 0,
+        "max_degree": 0,
+    }
+
+def _clustering(adjacency, directed=True):
+    """Average clustering as nx.average_clustering, from sparse matrix products (self-loops ignored)."""
+    A = adjacency.astype(bool).astype(np.int64)
+    A.setdiag(0)
+    A.eliminate_zeros()
+    if directed:
+        # Fagiolo's directed clustering: triangles of A + A^T over the possible ones,
+        # discounting reciprocated edges
+        S = A + A.T
+        triangles = (S @ S).multiply(S).sum(axis=1)
+        total_degree = np.asarray(S.sum(axis=1)).ravel()
+        reciprocal = np.asarray(A.multiply(A.T).sum(axis=1)).ravel()
+        possible = 2 * (total_degree * (total_degree - 1) - 2 * reciprocal)
+    else:
+        triangles = (A @ A).multiply(A).sum(axis=1)
+        degree = np.asarray(A.sum(axis=1)).ravel()
+        possible = degree * (degree - 1)
+    triangles = np.asarray(triangles, dtype=np.float64).ravel()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float(np.where(triangles > 0, triangles / possible, 0.0).mean())
+
+def _component_path_lengths(U, nodes, sample_sources, rng):
+    """
+    Average shortest path length of one connected component from breadth-first
+    searches. Returns (estimate, variance of the estimate); the variance is 0 when
+    every node is a source.
+    """
+    n = len(nodes)
+    sources = nodes
+    if sample_sources and sample_sources < n:
+        sources = rng.choice(nodes, size=sample_sources, replace=False)
+    distances = csgraph.shortest_path(U, method='D', directed=False, unweighted=True, indices=sources)
+    # Mean distance from each source to the other n - 1 nodes of its component
+    per_source = distances[:, nodes].sum(axis=1) / (n - 1)
+    if len(sources) == n:
+        return float(per_source.mean()), 0.0
+    k = len(sources)
+    # Sampling without replacement: finite population correction
+    variance = per_source.var(ddof=1) / k * (n - k) / (n - 1) if k > 1 else float('inf')
+    return float(per_source.mean()), float(variance)
+
+def _sparse_graph_metrics(adjacency, sample_sources=None, seed=None, directed=True):
+    num_nodes = adjacency.shape[0]
+    binary = adjacency.astype(bool).astype(np.int64)
+    num_edges = binary.nnz if directed else (binary.nnz + binary.diagonal().astype(bool).sum()) // 2
+    if directed:
+        # in + out degree, a self-loop counting for both
+        degrees = np.asarray(binary.sum(axis=0)).ravel() + np.asarray(binary.sum(axis=1)).ravel()
+    else:
+        degrees = np.asarray(binary.sum(axis=1)).ravel() + binary.diagonal()
+
+    U = (binary + binary.T).astype(bool).astype(np.int8)
+    _, labels = csgraph.connected_components(U, directed=False)
+    rng = np.random.default_rng(seed)
+    total_path_length = 0.0
+    total_variance = 0.0
+    total_nodes = 0
+    for label in np.unique(labels):
+        nodes = np.flatnonzero(labels == label)
+        if len(nodes) > 1:
+            component_path_length, variance = _component_path_lengths(U, nodes, sample_sources, rng)
+            total_path_length += component_path_length * len(nodes)
+            total_variance += variance * len(nodes) ** 2
+            total_nodes += len(nodes)
+
+    metrics = {
+        "avg_clustering": _clustering(adjacency, directed),
+        "avg_path_length": total_path_length / total_nodes if total_nodes > 0 else 0,
+        "num_nodes": int(num_nodes),
+        "num_edges": int(num_edges),
+        "avg_degree": float(degrees.mean()),
+        "max_degree": int(degrees.max()),
     }
+    if sample_sources:
+        # Normal approximation, 95% confidence
+        metrics["avg_path_length_error"] = 1.96 * float(np.sqrt(total_variance)) / total_nodes if total_nodes > 0 else 0.0
+    return metrics
 
 def compare_solos(generated_midi_path, original_jams_path):
     """Compares the network metrics of a generated solo and an original solo."""
@@ -1,7 +1,11 @@
 import networkx as nx
 import numpy as np
 
-def analyze_midi_sequence_as_network(midi_sequence):
+NUM_NOTES = 128 # MIDI note range
+ENGINES = ("numpy", "networkx")
+METRICS = ("sequence_length", "num_nodes", "num_edges", "avg_degree", "clustering_coefficient", "density")
+
+def analyze_midi_sequence_as_network(midi_sequence, engine="numpy"):
     """
     Analyzes a sequence of MIDI notes as a complex network.
 
@@ -11,10 +15,21 @@ def analyze_midi_sequence_as_network(midi_sequence):
 
     Args:
         midi_sequence (list): A list of MIDI note numbers.
+        engine (str): "numpy" (array operations on the transition matrix, see
+            analyze_sequences_as_networks) or "networkx" (builds an nx.DiGraph). Both
+            give the same metrics.
 
     Returns:
         dict: A dictionary containing network metrics.
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown network engine '{engine}'. Use 'numpy' or 'networkx'.")
+    if engine == "numpy" and len(midi_sequence) > 0:
+        table = analyze_sequences_as_networks([midi_sequence])
+        return {name: table[name][0].item() for name in METRICS}
+    return _analyze_with_networkx(midi_sequence)
+
+def _analyze_with_networkx(midi_sequence):
     if not midi_sequence:
         return {
             "num_nodes": 0,
@@ -70,6 +85,78 @@ def analyze_midi_sequence_as_network(midi_sequence):
 
     return metrics
 
+def _ragged(sequences):
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    offsets = np.zeros(len(sequences) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    tokens = np.concatenate([np.asarray(sequence, dtype=np.int64) for sequence in sequences]) if len(sequences) else np.zeros(0, dtype=np.int64)
+    return tokens, offsets
+
+def analyze_sequences_as_networks(tokens, offsets=None, chunk_size=256):
+    """
+    Network metrics of many sequences at once, without building any graph object.
+
+    For chunk_size sequences at a time, one bincount over (sequence, note, next note)
+    indices gives a stack of transition count matrices (entry [a, b]: how often note a
+    is followed by note b), restricted to the notes that occur in the chunk. Node,
+    edge, degree and density figures are reductions over them, and the clustering
+    coefficient (of the undirected graph, self-loops ignored, as nx.average_clustering)
+    comes from the adjacency matrices: a node's triangles are the diagonal of A^3.
+
+    Args:
+        tokens: MIDI notes of all sequences concatenated, with offsets (sequence i is
+            tokens[offsets[i]:offsets[i + 1]], as in a SequenceStore), or a list of
+            sequences when offsets is None.
+        offsets: Sequence boundaries, len(sequences) + 1 entries.
+        chunk_size (int): Sequences whose matrices are held in memory together.
+
+    Returns:
+        dict: Metric name (see METRICS) -> array with one value per sequence.
+    """
+    if offsets is None:
+        tokens, offsets = _ragged(tokens)
+    tokens = np.asarray(tokens, dtype=np.int64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if tokens.size and (tokens.min() < 0 or tokens.max() >= NUM_NOTES):
+        raise ValueError(f"MIDI notes must be between 0 and {NUM_NOTES - 1}")
+    lengths = np.diff(offsets)
+    num_sequences = len(lengths)
+    table = {name: np.zeros(num_sequences, dtype=np.int64 if name in ("num_nodes", "num_edges") else np.float64)
+             for name in METRICS if name != "sequence_length"}
+
+    for start in range(0, num_sequences, chunk_size):
+        stop = min(start + chunk_size, num_sequences)
+        # Index the notes of the chunk compactly: a guitar solo uses far fewer than 128
+        used, notes = np.unique(tokens[offsets[start]:offsets[stop]], return_inverse=True)
+        size = max(len(used), 1)
+        sequence_ids = np.repeat(np.arange(stop - start), lengths[start:stop])
+        same_sequence = sequence_ids[:-1] == sequence_ids[1:]
+        transitions = ((sequence_ids[:-1] * size + notes[:-1]) * size + notes[1:])[same_sequence]
+        counts = np.bincount(transitions, minlength=(stop - start) * size * size)
+        edges = counts.reshape(stop - start, size, size) > 0
+        present = np.bincount(sequence_ids * size + notes, minlength=(stop - start) * size) > 0
+
+        num_nodes = present.reshape(stop - start, size).sum(axis=1)
+        num_edges = edges.sum(axis=(1, 2))
+        # Undirected adjacency without self-loops; the matrix products are exact in float32
+        adjacency = (edges | edges.transpose(0, 2, 1)).astype(np.float32)
+        diagonal = np.arange(size)
+        adjacency[:, diagonal, diagonal] = 0
+        degree = adjacency.sum(axis=2).astype(np.float64)
+        # Ordered pairs of adjacent neighbours of each node, i.e. twice its triangles
+        triangles = np.einsum('sij,sij->si', adjacency @ adjacency, adjacency).astype(np.float64)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            node_clustering = np.where(degree > 1, triangles / (degree * (degree - 1)), 0.0)
+            table["num_nodes"][start:stop] = num_nodes
+            table["num_edges"][start:stop] = num_edges
+            # Every directed edge (self-loops included) adds one to the degree of both ends
+            table["avg_degree"][start:stop] = np.where(num_nodes > 0, 2 * num_edges / num_nodes, 0.0)
+            table["clustering_coefficient"][start:stop] = np.where(num_nodes > 0, node_clustering.sum(axis=1) / num_nodes, 0.0)
+            table["density"][start:stop] = np.where(num_nodes > 1, num_edges / (num_nodes * (num_nodes - 1.0)), 0.0)
+
+    return dict(sequence_length=lengths, **table)
+
 if __name__ == '__main__':
     # Example usage with a sample MIDI sequence
     sample_midi_sequence = [60, 62, 64, 60, 65, 64, 62, 60, 60, 60, 62, 64, 65, 67, 65, 64, 62, 60]
@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.benchmarks.decoding_benchmark import random_model_handle, decode_incremental
+from src.generation.batch_scheduler import BatchScheduler
+from src.generation.generate import seed_to_pattern
+
+SEED_NOTES = "E4 G4 A4 B4 D5"
+
+def _summarise(latencies, wall_time, total_notes):
+    return {
+        "notes_per_second": total_notes / wall_time,
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p95": float(np.percentile(latencies, 95)),
+    }
+
+def run_unbatched(handle, concurrency, generation_length):
+    """Every request decodes on its own thread at batch size 1."""
+    pattern = seed_to_pattern(SEED_NOTES, handle.note_to_int)
+
+    def one_request(_):
+        start = time.perf_counter()
+        decode_incremental(handle, pattern, generation_length)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one_request, range(concurrency)))
+    return _summarise(latencies, time.perf_counter() - start, concurrency * generation_length)
+
+def run_batched(handle, concurrency, generation_length, max_batch_size, max_wait):
+    """All requests go through the BatchScheduler."""
+    scheduler = BatchScheduler(lambda genre, tier="full": handle, max_batch_size=max_batch_size, max_wait=max_wait, genres=[handle.genre])
+    # Staggered lengths so requests leave the batch at different steps
+    lengths = [generation_length - (i % 4) * (generation_length // 8) for i in range(concurrency)]
+    start = time.perf_counter()
+    futures = [scheduler.submit(handle.genre, SEED_NOTES, length, temperature=0.8 + 0.1 * (i % 3)) for i, length in enumerate(lengths)]
+    latencies = []
+    for future in futures:
+        future.result()
+        latencies.append(time.perf_counter() - start)
+    result = _summarise(latencies, time.perf_counter() - start, sum(lengths))
+    result["avg_batch_size"] = scheduler.stats()["avg_batch_size"]
+    scheduler.shutdown()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput vs latency of batched and unbatched generation.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--generation-length", type=int, default=200)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--vocab-size", type=int, default=60)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--rnn-units", type=int, default=1536)
+    args = parser.parse_args()
+
+    handle = random_model_handle(args.vocab_size, args.embedding_dim, args.rnn_units)
+    # Trace the graphs before timing
+    run_unbatched(handle, 1, 2)
+    run_batched(handle, 2, 2, args.max_batch_size, args.max_wait_ms / 1000)
+
+    print(f"{'concurrency':>11} | {'mode':<9} | {'notes/s':>9} | {'p50 (s)':>8} | {'p95 (s)':>8} | {'avg batch':>9}")
+    for concurrency in args.concurrency:
+        unbatched = run_unbatched(handle, concurrency, args.generation_length)
+        batched = run_batched(handle, concurrency, args.generation_length, args.max_batch_size, args.max_wait_ms / 1000)
+        print(f"{concurrency:>11} | {'unbatched':<9} | {unbatched['notes_per_second']:>9.1f} | {unbatched['latency_p50']:>8.3f} | {unbatched['latency_p95']:>8.3f} | {1:>9}")
+        print(f"{concurrency:>11} | {'batched':<9} | {batched['notes_per_second']:>9.1f} | {batched['latency_p50']:>8.3f} | {batched['latency_p95']:>8.3f} | {batched['avg_batch_size']:>9.1f}")
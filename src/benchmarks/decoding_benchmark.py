@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.incremental import IncrementalDecoder, get_step_model
+from src.generation.sampling import BatchSampler, log_softmax
+from src.generation.model_registry import ModelHandle, load_model_handle
+
+def random_model_handle(vocab_size, embedding_dim, rnn_units, sequence_length=50, genre="Random"):
+    """Builds a randomly initialised create_model network wrapped in a ModelHandle."""
+    from src.modeling.modeling import create_model
+
+    model = create_model(vocab_size, embedding_dim, rnn_units, sequence_length)
+    model.build((None, sequence_length - 1))
+    int_to_note = {str(i): 40 + i for i in range(vocab_size)}
+    return ModelHandle(genre, model, int_to_note, None, None, None)
+
+def decode_window(handle, pattern, generation_length, temperature=1.0):
+    """The sliding-window loop of generate_music, without the MIDI writing."""
+    current_pattern = list(pattern)
+    sampler = BatchSampler(handle.vocab_size)
+    sampler.add(temperature)
+    generated = []
+    for _ in range(generation_length):
+        prediction = handle.model.predict(np.reshape(current_pattern, (1, len(current_pattern))), verbose=0)
+        index = int(sampler.sample(probs=prediction)[0])
+        generated.append(index)
+        current_pattern = current_pattern[1:] + [index]
+    return generated
+
+def decode_incremental(handle, pattern, generation_length, temperature=1.0):
+    """The incremental loop of generate_music, without the MIDI writing."""
+    decoder = IncrementalDecoder(get_step_model(handle))
+    sampler = BatchSampler(handle.vocab_size)
+    sampler.add(temperature)
+    logits = decoder.prime(pattern)
+    generated = []
+    for i in range(generation_length):
+        index = int(sampler.sample(logits=logits)[0])
+        generated.append(index)
+        if i < generation_length - 1:
+            logits = decoder.step([index])
+    return generated
+
+def first_step_difference(handle, pattern):
+    """Max absolute difference between the first next-note distributions of both paths."""
+    window_probs = handle.model.predict(np.reshape(pattern, (1, len(pattern))), verbose=0)[0]
+    incremental_logits = IncrementalDecoder(get_step_model(handle)).prime(pattern)
+    incremental_probs = np.exp(log_softmax(incremental_logits))[0]
+    return float(np.max(np.abs(window_probs - incremental_probs)))
+
+def run_benchmark(handle, generation_length, sequence_length=50, repeats=3, seed=0):
+    rng = np.random.default_rng(seed)
+    pattern = list(rng.integers(0, handle.vocab_size, size=sequence_length - 1))
+
+    results = {}
+    for name, decode in (("window", decode_window), ("incremental", decode_incremental)):
+        # One short untimed run to trace the graphs
+        decode(handle, pattern, 2)
+        timings = []
+        for _ in range(repeats):
+            np.random.seed(seed)
+            start = time.perf_counter()
+            generated = decode(handle, pattern, generation_length)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results[name] = {"seconds": best, "notes_per_second": generation_length / best, "first_note": generated[0]}
+
+    results["first_step_max_abs_diff"] = first_step_difference(handle, pattern)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark sliding-window vs incremental decoding.")
+    parser.add_argument("--genre", help="Benchmark a trained genre model from models/ instead of a random one.")
+    parser.add_argument("--vocab-size", type=int, default=60)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--rnn-units", type=int, default=1536)
+    parser.add_argument("--generation-length", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.genre:
+        handle = load_model_handle(args.genre)
+    else:
+        handle = random_model_handle(args.vocab_size, args.embedding_dim, args.rnn_units)
+
+    results = run_benchmark(handle, args.generation_length, repeats=args.repeats)
+    print(f"Model: {handle.genre} (vocab {handle.vocab_size}), {args.generation_length} notes")
+    for name in ("window", "incremental"):
+        r = results[name]
+        print(f"- {name:<12} {r['notes_per_second']:8.1f} notes/s  ({r['seconds']:.3f}s, first note {r['first_note']})")
+    print(f"- speedup: {results['incremental']['notes_per_second'] / results['window']['notes_per_second']:.1f}x")
+    print(f"- first-step max |p_window - p_incremental|: {results['first_step_max_abs_diff']:.2e}")
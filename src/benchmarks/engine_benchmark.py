@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.utils.memory import peak_rss_mb
+
+def measure_engine(genre, models_dir, engine, generation_length, sequence_length=50):
+    """
+    Loads a genre with the given engine in the current (fresh) process and measures
+    startup (imports + load + warm-up), peak RSS and per-note latency of incremental decoding.
+    """
+    start = time.perf_counter()
+    from src.generation.model_registry import load_model_handle, warm_up_handle
+    from src.generation.incremental import IncrementalDecoder, get_step_model
+    from src.generation.sampling import BatchSampler
+
+    handle = load_model_handle(genre, models_dir, engine)
+    warm_up_handle(handle, sequence_length, decoding="incremental")
+    startup = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    pattern = rng.integers(0, handle.vocab_size, size=(1, sequence_length - 1))
+    decoder = IncrementalDecoder(get_step_model(handle))
+    sampler = BatchSampler(handle.vocab_size)
+    sampler.add(1.0, rng=rng)
+    logits = decoder.prime(pattern)
+    step_times = []
+    for _ in range(generation_length):
+        indices = sampler.sample(logits=logits)
+        step_start = time.perf_counter()
+        logits = decoder.step(indices)
+        step_times.append(time.perf_counter() - step_start)
+
+    return {
+        "engine": engine,
+        "startup_seconds": startup,
+        "peak_rss_mb": peak_rss_mb(),
+        "tensorflow_imported": "tensorflow" in sys.modules,
+        "note_ms_p50": float(np.percentile(step_times, 50)) * 1000,
+        "note_ms_p95": float(np.percentile(step_times, 95)) * 1000,
+    }
+
+def run_in_subprocess(genre, models_dir, engine, generation_length):
+    """Runs measure_engine in a fresh interpreter, so imports and RSS are not shared between engines."""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--genre", genre, "--models-dir", models_dir,
+               "--engine", engine, "--generation-length", str(generation_length)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def prepare_random_models(models_dir, vocab_size, embedding_dim, rnn_units, sequence_length=50, genre="Random"):
+    """
+    Saves a randomly initialised create_model network (.h5, note mapping and exported .npz).
+    Its vocabulary is vocab_size consecutive MIDI notes from 40, or lower if they would pass 127.
+    """
+    if not 0 < vocab_size <= 128:
+        raise ValueError(f"vocab_size must be between 1 and 128 (MIDI notes), got {vocab_size}")
+    from src.modeling.modeling import create_model
+    from src.generation.model_registry import model_paths
+    from src.generation.numpy_engine import export_weights, weights_path
+
+    model = create_model(vocab_size, embedding_dim, rnn_units, sequence_length)
+    model.build((None, sequence_length - 1))
+    model_path, int_to_note_path = model_paths(genre, models_dir)
+    model.save(model_path)
+    with open(int_to_note_path, 'w') as f:
+        lowest = min(40, 128 - vocab_size)
+        json.dump({str(i): lowest + i for i in range(vocab_size)}, f)
+    export_weights(model, weights_path(genre, models_dir))
+    return model
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the Keras and NumPy inference engines.")
+    parser.add_argument("--genre", help="Benchmark a trained genre model (with exported weights) instead of a random one.")
+    parser.add_argument("--models-dir", default=os.path.join(project_root, "models"))
+    parser.add_argument("--vocab-size", type=int, default=60)
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--rnn-units", type=int, default=1536)
+    parser.add_argument("--generation-length", type=int, default=200)
+    parser.add_argument("--engine", choices=["keras", "numpy"], help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure_engine(args.genre, args.models_dir, args.engine, args.generation_length)))
+        sys.exit(0)
+
+    from src.generation.numpy_engine import NumpyLSTM, check_parity, weights_path
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.genre:
+            genre, models_dir = args.genre, args.models_dir
+            from tensorflow.keras.models import load_model
+            from src.generation.model_registry import model_paths
+            model = load_model(model_paths(genre, models_dir)[0], compile=False)
+        else:
+            genre, models_dir = "Random", tmp_dir
+            model = prepare_random_models(models_dir, args.vocab_size, args.embedding_dim, args.rnn_units)
+
+        parity = check_parity(model, NumpyLSTM.load(weights_path(genre, models_dir)))
+        results = [run_in_subprocess(genre, models_dir, engine, args.generation_length) for engine in ("keras", "numpy")]
+
+    print(f"Model: {genre}, {args.generation_length} notes")
+    print(f"Parity: window max |p_keras - p_numpy| {parity['window_max_abs_diff']:.2e}, "
+          f"step max |logits_keras - logits_numpy| {parity['step_max_abs_diff']:.2e}")
+    print(f"{'engine':>8} {'startup s':>10} {'peak RSS MB':>12} {'note ms p50':>12} {'note ms p95':>12} {'TF loaded':>10}")
+    for r in results:
+        print(f"{r['engine']:>8} {r['startup_seconds']:>10.2f} {r['peak_rss_mb']:>12.0f} "
+              f"{r['note_ms_p50']:>12.2f} {r['note_ms_p95']:>12.2f} {str(r['tensorflow_imported']):>10}")
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import networkx as nx
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.analysis.network_analysis import get_graph_metrics, sequence_to_graph
+
+def random_walk(num_notes, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.clip(64 + np.cumsum(rng.choice([-5, -3, -2, -1, 0, 1, 2, 3, 5], size=num_notes)), 28, 100).tolist()
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def run_benchmark(graphs, sample_sources, seed=0):
+    """
+    Times get_graph_metrics with the networkx backend, the sparse backend and the
+    sparse backend with sampled sources. Returns one dict per graph.
+    """
+    results = []
+    for name, G in graphs.items():
+        reference, networkx_seconds = _timed(lambda: get_graph_metrics(G, backend="networkx"))
+        exact, sparse_seconds = _timed(lambda: get_graph_metrics(G, backend="sparse"))
+        sampled, sampled_seconds = _timed(lambda: get_graph_metrics(G, backend="sparse", sample_sources=sample_sources, seed=seed))
+        results.append({
+            "graph": name,
+            "nodes": reference["num_nodes"],
+            "edges": reference["num_edges"],
+            "networkx_seconds": networkx_seconds,
+            "sparse_seconds": sparse_seconds,
+            "sampled_seconds": sampled_seconds,
+            "max_diff": max(abs(reference[key] - exact[key]) for key in reference),
+            "path_length": reference["avg_path_length"],
+            "sampled_path_length": sampled["avg_path_length"],
+            "error_bound": sampled["avg_path_length_error"],
+        })
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the networkx and sparse backends of get_graph_metrics.")
+    parser.add_argument("--solo-notes", type=int, default=5000, help="Length of the random solo graph.")
+    parser.add_argument("--corpus-notes", type=int, default=1000000, help="Notes merged into the corpus graph.")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 5000], help="Sizes of the random sparse graphs.")
+    parser.add_argument("--average-degree", type=float, default=6.0)
+    parser.add_argument("--sample-sources", type=int, default=64)
+    args = parser.parse_args()
+
+    graphs = {
+        f"solo ({args.solo_notes} notes)": sequence_to_graph(random_walk(args.solo_notes)),
+        f"corpus ({args.corpus_notes} notes)": sequence_to_graph(random_walk(args.corpus_notes, seed=1)),
+    }
+    for n in args.nodes:
+        graphs[f"random n={n}"] = nx.gnm_random_graph(n, int(n * args.average_degree / 2), seed=n, directed=True)
+
+    results = run_benchmark(graphs, args.sample_sources)
+    print(f"{'graph':>24} {'nodes':>6} {'edges':>7} {'networkx s':>10} {'sparse s':>9} {'sampled s':>9} {'max diff':>9} "
+          f"{'path len':>8} {'sampled':>16}")
+    for r in results:
+        sampled = f"{r['sampled_path_length']:.3f}±{r['error_bound']:.3f}"
+        print(f"{r['graph']:>24} {r['nodes']:>6} {r['edges']:>7} {r['networkx_seconds']:>10.3f} {r['sparse_seconds']:>9.3f} "
+              f"{r['sampled_seconds']:>9.3f} {r['max_diff']:>9.1e} {r['path_length']:>8.3f} {sampled:>16}")
@@ -0,0 +1,272 @@
+"""
+End-to-end generation latency of generate_music and POST /generate_solo, on small
+randomly initialised create_model networks, so it runs offline without the real weights.
+
+Every configuration (engine, decoding, batch size) runs in a fresh interpreter and
+measures:
+  * cold latency: model load and first generation of each genre (import time recorded apart)
+  * warm latency: p50/p95/p99 over repeated generations, per genre (vocabulary size),
+    generation_length and, for the endpoint, concurrency
+  * per-note decode time of generate_notes
+
+    python src/benchmarks/latency_benchmark.py --output baseline.json
+    python src/benchmarks/latency_benchmark.py --output new.json --compare baseline.json --threshold 0.2
+
+With --compare, the run fails (exit code 1) if any latency that is in both runs got
+slower than the baseline by more than the threshold (and by more than --min-delta-ms).
+Runs are only compared if they used the same settings (engines, decodings, batch
+sizes, lengths, concurrency, repeats, model sizes) on a machine with the same CPU
+count, architecture and Python version; otherwise the comparison is refused.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+SEED_NOTES = "E4 G4 A4 B4 D5"
+COMPARED_METRICS = ("seconds", "latency_p50", "latency_p95", "note_ms_p50")
+# Machine fields two runs must share to be compared; the full platform string (kernel version) may differ
+COMPARED_MACHINE = ("cpus", "architecture", "python")
+
+def _percentiles(latencies):
+    return {
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p95": float(np.percentile(latencies, 95)),
+        "latency_p99": float(np.percentile(latencies, 99)),
+    }
+
+def _row(config, genre, vocab_size, kind, **fields):
+    row = dict(config, genre=genre, vocab_size=vocab_size, kind=kind, **fields)
+    row["key"] = " ".join(f"{name}={row[name]}" for name in
+                          ("path", "engine", "decoding", "batch_size", "genre", "vocab_size", "kind",
+                           "generation_length", "concurrency") if row.get(name) is not None)
+    return row
+
+def measure_direct(models_dir, vocab_sizes, engine, decoding, lengths, repeats):
+    """generate_music and generate_notes called in-process, as the CLI and scripts do."""
+    start = time.perf_counter()
+    from src.generation.generate import generate_music, generate_notes
+    from src.generation.model_registry import load_model_handle
+    import_seconds = time.perf_counter() - start
+
+    config = {"path": "generate_music", "engine": engine, "decoding": decoding}
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = os.path.join(tmp_dir, "solo.mid")
+        for genre, vocab_size in vocab_sizes.items():
+            start = time.perf_counter()
+            handle = load_model_handle(genre, models_dir, engine)
+            generate_music(genre, SEED_NOTES, output_path, generation_length=lengths[0], model_handle=handle, decoding=decoding)
+            rows.append(_row(config, genre, vocab_size, "cold", seconds=time.perf_counter() - start,
+                             import_seconds=import_seconds, generation_length=lengths[0]))
+
+            for length in lengths:
+                latencies, note_times = [], []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    generate_music(genre, SEED_NOTES, output_path, generation_length=length, model_handle=handle, decoding=decoding)
+                    latencies.append(time.perf_counter() - start)
+
+                    previous = time.perf_counter()
+                    for _ in generate_notes(genre, SEED_NOTES, generation_length=length, model_handle=handle, decoding=decoding):
+                        now = time.perf_counter()
+                        note_times.append(now - previous)
+                        previous = now
+                rows.append(_row(config, genre, vocab_size, "warm", generation_length=length, **_percentiles(latencies),
+                                 note_ms_p50=float(np.percentile(note_times, 50)) * 1000,
+                                 note_ms_p95=float(np.percentile(note_times, 95)) * 1000))
+    return rows
+
+def measure_endpoint(models_dir, vocab_sizes, engine, decoding, batch_size, lengths, concurrencies, repeats):
+    """POST /generate_solo through the FastAPI app, configured like a deployment would be."""
+    os.environ.update({
+        "INFERENCE_ENGINE": engine,
+        "DECODING_MODE": decoding,
+        "BATCHING_ENABLED": "1" if batch_size else "0",
+        "BATCH_MAX_SIZE": str(batch_size or 1),
+        "GENERATION_WORKERS": str(max(concurrencies)),
+        "GENERATION_QUEUE_SIZE": str(4 * max(concurrencies)),
+        "PERSIST_OUTPUT": "0",
+        "RESULT_CACHE_SIZE": "0",
+        "WARMUP_GENRES": "",
+        "LOG_LEVEL": "WARNING",
+    })
+    sys.path.insert(0, os.path.join(project_root, "webapp", "backend"))
+    start = time.perf_counter()
+    from fastapi.testclient import TestClient
+    import main
+    import_seconds = time.perf_counter() - start
+    main.model_registry.models_dir = models_dir
+
+    config = {"path": "/generate_solo", "engine": engine, "decoding": "batched" if batch_size else decoding,
+              "batch_size": batch_size}
+    rows = []
+    with TestClient(main.app) as client:
+        def post(genre, length):
+            start = time.perf_counter()
+            response = client.post("/generate_solo", json={"genre": genre, "seed_notes": SEED_NOTES, "generation_length": length})
+            response.raise_for_status()
+            return time.perf_counter() - start
+
+        for genre, vocab_size in vocab_sizes.items():
+            rows.append(_row(config, genre, vocab_size, "cold", seconds=post(genre, lengths[0]),
+                             import_seconds=import_seconds, generation_length=lengths[0]))
+            for length in lengths:
+                for concurrency in concurrencies:
+                    latencies = []
+                    start = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                        for _ in range(repeats):
+                            latencies.extend(pool.map(lambda _: post(genre, length), range(concurrency)))
+                    wall_time = time.perf_counter() - start
+                    rows.append(_row(config, genre, vocab_size, "warm", generation_length=length, concurrency=concurrency,
+                                     notes_per_second=len(latencies) * length / wall_time, **_percentiles(latencies)))
+    return rows
+
+def run_in_subprocess(worker, models_dir, vocab_sizes, engine, decoding, batch_size, args):
+    """Runs one configuration in a fresh interpreter, so imports and loaded models are not shared between them."""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", worker, "--models-dir", models_dir,
+               "--vocab-sizes", json.dumps(vocab_sizes), "--engines", engine, "--decodings", decoding,
+               "--batch-sizes", str(batch_size), "--generation-lengths", *map(str, args.generation_lengths),
+               "--concurrency", *map(str, args.concurrency), "--repeats", str(args.repeats)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def settings_mismatches(results, baseline):
+    """Returns the settings and machine fields that differ between two runs, as (field, baseline value, new value)."""
+    mismatches = []
+    for section, fields in (("settings", None), ("machine", COMPARED_MACHINE)):
+        new, old = results.get(section, {}), baseline.get(section, {})
+        for field in fields or sorted(set(new) | set(old)):
+            if new.get(field) != old.get(field):
+                mismatches.append((f"{section}.{field}", old.get(field), new.get(field)))
+    return mismatches
+
+def compare(results, baseline, threshold, min_delta_ms=1.0, metrics=COMPARED_METRICS):
+    """
+    Compares the rows of two runs by key. Returns (regressions, comparisons), each a
+    list of (key, metric, baseline value, new value, ratio).
+
+    Raises:
+        ValueError: The runs used different settings or machines (see settings_mismatches).
+    """
+    mismatches = settings_mismatches(results, baseline)
+    if mismatches:
+        differences = ", ".join(f"{field} {old!r} -> {new!r}" for field, old, new in mismatches)
+        raise ValueError(f"Cannot compare runs with different settings: {differences}")
+    baseline_rows = {row["key"]: row for row in baseline["rows"]}
+    regressions, comparisons = [], []
+    for row in results["rows"]:
+        old = baseline_rows.get(row["key"])
+        if old is None:
+            continue
+        for metric in metrics:
+            if row.get(metric) is None or old.get(metric) is None:
+                continue
+            ratio = row[metric] / old[metric] if old[metric] else float('inf')
+            entry = (row["key"], metric, old[metric], row[metric], ratio)
+            comparisons.append(entry)
+            # note_ms is in milliseconds, the other metrics in seconds
+            delta_ms = (row[metric] - old[metric]) * (1 if metric.startswith("note_ms") else 1000)
+            if ratio > 1 + threshold and delta_ms > min_delta_ms:
+                regressions.append(entry)
+    return regressions, comparisons
+
+def run_suite(args):
+    from src.benchmarks.engine_benchmark import prepare_random_models
+
+    rows = []
+    with tempfile.TemporaryDirectory() as models_dir:
+        for genre, vocab_size in args.vocab_sizes.items():
+            prepare_random_models(models_dir, vocab_size, args.embedding_dim, args.rnn_units, genre=genre)
+        for engine in args.engines:
+            for decoding in args.decodings:
+                rows += run_in_subprocess("direct", models_dir, args.vocab_sizes, engine, decoding, 0, args)
+                if 0 in args.batch_sizes:
+                    rows += run_in_subprocess("endpoint", models_dir, args.vocab_sizes, engine, decoding, 0, args)
+            for batch_size in args.batch_sizes:
+                if batch_size:
+                    rows += run_in_subprocess("endpoint", models_dir, args.vocab_sizes, engine, "incremental", batch_size, args)
+    return {
+        "created": time.time(),
+        "machine": {"platform": platform.platform(), "architecture": platform.machine(),
+                    "python": platform.python_version(), "cpus": os.cpu_count()},
+        "settings": {"embedding_dim": args.embedding_dim, "rnn_units": args.rnn_units, "vocab_sizes": args.vocab_sizes,
+                     "engines": args.engines, "decodings": args.decodings, "batch_sizes": args.batch_sizes,
+                     "generation_lengths": args.generation_lengths, "concurrency": args.concurrency,
+                     "repeats": args.repeats},
+        "rows": rows,
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Cold/warm latency of generate_music and /generate_solo, with a regression gate.")
+    parser.add_argument("--vocab-sizes", type=json.loads, default={"Rock": 40, "All": 120},
+                        help='Genres to create random models for, with their vocabulary size (JSON, e.g. \'{"Rock": 40}\').')
+    parser.add_argument("--embedding-dim", type=int, default=32)
+    parser.add_argument("--rnn-units", type=int, default=128)
+    parser.add_argument("--generation-lengths", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[0, 8],
+                        help="BATCH_MAX_SIZE of the endpoint; 0 runs it without the batch scheduler.")
+    parser.add_argument("--engines", nargs="+", choices=["keras", "numpy"], default=["keras", "numpy"])
+    parser.add_argument("--decodings", nargs="+", choices=["window", "incremental"], default=["window", "incremental"])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare with a previous results file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown ratio over the baseline (0.2 = 20%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="Ignore slowdowns smaller than this.")
+    parser.add_argument("--worker", choices=["direct", "endpoint"], help=argparse.SUPPRESS)
+    parser.add_argument("--models-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == "direct":
+        print(json.dumps(measure_direct(args.models_dir, args.vocab_sizes, args.engines[0], args.decodings[0],
+                                        args.generation_lengths, args.repeats)))
+        sys.exit(0)
+    if args.worker == "endpoint":
+        print(json.dumps(measure_endpoint(args.models_dir, args.vocab_sizes, args.engines[0], args.decodings[0],
+                                          args.batch_sizes[0], args.generation_lengths, args.concurrency, args.repeats)))
+        sys.exit(0)
+
+    results = run_suite(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    print(f"{'path':<14} {'engine':>6} {'decoding':>11} {'genre':>6} {'vocab':>5} {'kind':>4} {'length':>6} {'conc':>4} "
+          f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'note ms':>7}")
+    for row in results["rows"]:
+        if row["kind"] == "cold":
+            latencies = f"{row['seconds']:>7.3f} {'':>7} {'':>7}"
+        else:
+            latencies = f"{row['latency_p50']:>7.3f} {row['latency_p95']:>7.3f} {row['latency_p99']:>7.3f}"
+        note_ms = f"{row['note_ms_p50']:>7.2f}" if "note_ms_p50" in row else f"{'':>7}"
+        print(f"{row['path']:<14} {row['engine']:>6} {row['decoding']:>11} {row['genre']:>6} {row['vocab_size']:>5} "
+              f"{row['kind']:>4} {row['generation_length']:>6} {row.get('concurrency') or '':>4} {latencies} {note_ms}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        try:
+            regressions, comparisons = compare(results, baseline, args.threshold, args.min_delta_ms)
+        except ValueError as e:
+            print(f"\n{e}")
+            sys.exit(1)
+        print(f"\nCompared {len(comparisons)} measurements with {args.compare}")
+        for key, metric, old, new, ratio in regressions:
+            print(f"  SLOWER {metric} {old:.4f} -> {new:.4f} (x{ratio:.2f}): {key}")
+        if regressions:
+            print(f"{len(regressions)} measurements slowed down by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print(f"No slowdown above {args.threshold:.0%}")
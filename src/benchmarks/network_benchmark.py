@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.analysis.network_analyzer import analyze_midi_sequence_as_network, analyze_sequences_as_networks, METRICS
+
+def random_solos(num_sequences, seed=0):
+    """Random-walk solos in the guitar range, 50 to 500 notes long."""
+    rng = np.random.default_rng(seed)
+    solos = []
+    for length in rng.integers(50, 500, size=num_sequences):
+        steps = rng.choice([-5, -3, -2, -1, 0, 1, 2, 3, 5], size=length)
+        solos.append((np.clip(64 + np.cumsum(steps), 40, 88)).tolist())
+    return solos
+
+def run_benchmark(sequences):
+    """Times the networkx engine, the NumPy engine one sequence at a time, and the batched NumPy engine."""
+    timings = {}
+    start = time.perf_counter()
+    reference = [analyze_midi_sequence_as_network(sequence, engine="networkx") for sequence in sequences]
+    timings["networkx"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    single = [analyze_midi_sequence_as_network(sequence, engine="numpy") for sequence in sequences]
+    timings["numpy"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = analyze_sequences_as_networks(sequences)
+    timings["numpy batch"] = time.perf_counter() - start
+
+    max_diff = 0.0
+    for i, expected in enumerate(reference):
+        for name in METRICS:
+            max_diff = max(max_diff, abs(expected[name] - single[i][name]), abs(expected[name] - table[name][i]))
+    return timings, max_diff
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the networkx and NumPy network metric engines.")
+    parser.add_argument("--num-sequences", type=int, default=2000)
+    parser.add_argument("--store", help="Use the sequences of a sequence store instead of random solos.")
+    args = parser.parse_args()
+
+    if args.store:
+        from src.data_preprocessing.sequence_store import SequenceStore
+        store = SequenceStore(args.store)
+        sequences = [store[i].tolist() for i in range(min(args.num_sequences, len(store)))]
+    else:
+        sequences = random_solos(args.num_sequences)
+
+    timings, max_diff = run_benchmark(sequences)
+    print(f"{len(sequences)} sequences, {sum(len(s) for s in sequences)} notes; max |numpy - networkx| {max_diff:.2e}")
+    print(f"{'engine':>12} {'seconds':>8} {'sequences/s':>12} {'speedup':>8}")
+    for engine, seconds in timings.items():
+        print(f"{engine:>12} {seconds:>8.3f} {len(sequences) / seconds:>12.0f} {timings['networkx'] / seconds:>7.1f}x")
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.generate import sample
+from src.generation.sampling import BatchSampler
+
+def _random_probs(rng, batch_size, vocab_size):
+    logits = rng.normal(size=(batch_size, vocab_size)) * 3
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return (probs / probs.sum(axis=1, keepdims=True)).astype(np.float32), logits.astype(np.float32)
+
+def time_per_row(probs, steps, temperature, rngs):
+    """The previous decode loop: one sample() call per sequence per step."""
+    start = time.perf_counter()
+    for _ in range(steps):
+        for row in range(probs.shape[0]):
+            sample(probs[row], temperature, rngs[row])
+    return time.perf_counter() - start
+
+def time_batched(logits, steps, temperature, rngs, **options):
+    """One BatchSampler.sample call per step for the whole batch."""
+    sampler = BatchSampler(logits.shape[1], capacity=logits.shape[0])
+    for rng in rngs:
+        sampler.add(temperature, rng=rng, **options)
+    start = time.perf_counter()
+    for _ in range(steps):
+        sampler.sample(logits=logits)
+    return time.perf_counter() - start
+
+def run_benchmark(batch_sizes, vocab_sizes, steps, temperature=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for vocab_size in vocab_sizes:
+        for batch_size in batch_sizes:
+            probs, logits = _random_probs(rng, batch_size, vocab_size)
+            rngs = [np.random.default_rng(seed + row) for row in range(batch_size)]
+            per_row = time_per_row(probs, steps, temperature, rngs)
+            batched = time_batched(logits, steps, temperature, rngs)
+            filtered = time_batched(logits, steps, temperature, rngs, top_k=10, top_p=0.9, repetition_penalty=1.2, max_consecutive=4)
+            results.append({
+                "vocab_size": vocab_size,
+                "batch_size": batch_size,
+                "per_row_us_per_step": per_row / steps * 1e6,
+                "batched_us_per_step": batched / steps * 1e6,
+                "batched_filtered_us_per_step": filtered / steps * 1e6,
+                "speedup": per_row / batched,
+            })
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark per-row sampling vs the vectorised BatchSampler.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--vocab-sizes", type=int, nargs="+", default=[60, 128])
+    parser.add_argument("--steps", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'vocab':>6} {'batch':>6} {'per-row us':>11} {'batched us':>11} {'filtered us':>12} {'speedup':>8}")
+    for r in run_benchmark(args.batch_sizes, args.vocab_sizes, args.steps):
+        print(f"{r['vocab_size']:>6} {r['batch_size']:>6} {r['per_row_us_per_step']:>11.1f} "
+              f"{r['batched_us_per_step']:>11.1f} {r['batched_filtered_us_per_step']:>12.1f} {r['speedup']:>7.1f}x")
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.data_preprocessing.sequence_store import SequenceStore, convert_text_file
+
+def write_random_text_file(path, num_sequences, seed=0):
+    """Writes a processed_sequences-style text file with random guitar-range sequences."""
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for _ in range(num_sequences):
+            sequence = rng.integers(40, 90, size=rng.integers(20, 400))
+            f.write(' '.join(map(str, sequence)) + '\n')
+
+def _measure(fn):
+    """
+    Returns (result, seconds, peak traced allocation in MB). Time and memory come from
+    two separate runs, since tracing slows Python-heavy code down considerably.
+    """
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, seconds, peak / 1e6
+
+def run_benchmark(text_path, store_path):
+    from src.modeling.modeling import load_sequences
+
+    results = {}
+    sequences, seconds, peak = _measure(lambda: load_sequences(text_path))
+    results["load_sequences"] = {"seconds": seconds, "peak_mb": peak, "sequences": len(sequences)}
+    del sequences
+
+    start = time.perf_counter()
+    convert_text_file(text_path, store_path)
+    results["convert"] = {"seconds": time.perf_counter() - start}
+
+    store, seconds, peak = _measure(lambda: SequenceStore(store_path))
+    results["store_open"] = {"seconds": seconds, "peak_mb": peak, "sequences": len(store)}
+
+    # Touch every token, as building training windows would
+    _, seconds, peak = _measure(lambda: int(np.sum(store.tokens, dtype=np.int64)))
+    results["store_scan"] = {"seconds": seconds, "peak_mb": peak}
+
+    results["text_file_mb"] = os.path.getsize(text_path) / 1e6
+    results["store_mb"] = sum(entry.stat().st_size for entry in os.scandir(store_path)) / 1e6
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark load_sequences against the memory-mapped sequence store.")
+    parser.add_argument("--text-file", help="processed_sequences_*.txt to benchmark; a random one is generated if omitted.")
+    parser.add_argument("--num-sequences", type=int, default=25000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        text_path = args.text_file
+        if text_path is None:
+            text_path = os.path.join(tmp_dir, "processed_sequences_random.txt")
+            write_random_text_file(text_path, args.num_sequences)
+        results = run_benchmark(text_path, os.path.join(tmp_dir, "benchmark.store"))
+
+    print(f"Text file: {results['text_file_mb']:.1f} MB, store: {results['store_mb']:.1f} MB, "
+          f"{results['load_sequences']['sequences']} sequences")
+    print(f"- load_sequences:  {results['load_sequences']['seconds']:.3f}s, peak {results['load_sequences']['peak_mb']:.1f} MB")
+    print(f"- store open:      {results['store_open']['seconds']:.4f}s, peak {results['store_open']['peak_mb']:.2f} MB")
+    print(f"- store full scan: {results['store_scan']['seconds']:.3f}s, peak {results['store_scan']['peak_mb']:.1f} MB")
+    print(f"- one-off convert: {results['convert']['seconds']:.3f}s")
@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.utils.memory import peak_rss_mb
+from src.data_preprocessing.sequence_store import SequenceStoreWriter, SequenceStore, DEFAULT_AUGMENTATION
+
+def write_random_store(path, num_sequences, seed=0):
+    """Writes a store of random guitar-range original sequences (transposed at training time)."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(20, 400, size=num_sequences)
+    writer = SequenceStoreWriter(path, augmentation=dict(DEFAULT_AUGMENTATION, materialised=False))
+    writer.add(rng.integers(45, 85, size=lengths.sum()), lengths, np.zeros(num_sequences, dtype=np.int8))
+    return writer.close()
+
+def _dense_data(sequences, sequence_length):
+    """The previous approach: every window and transposition copied into X, targets one-hot encoded."""
+    from tensorflow.keras.utils import to_categorical
+    from src.modeling.modeling import build_training_data, window_starts, expand_transpositions, TRANSPOSITIONS
+
+    notes = build_training_data(sequences, sequence_length, "exhaustive")[0]
+    lookup = np.zeros(max(notes) + 1, dtype=np.int64)
+    lookup[notes] = np.arange(len(notes))
+    starts, shifts = expand_transpositions(*window_starts(sequences, sequence_length), TRANSPOSITIONS)
+    windows = np.asarray(sequences.tokens)[starts[:, np.newaxis] + np.arange(sequence_length)].astype(np.int16)
+    windows += shifts[:, np.newaxis]
+    X = lookup[windows[:, :-1]]
+    y = to_categorical(lookup[windows[:, -1]], num_classes=len(notes))
+    return notes, X, y
+
+def measure(store_path, mode, steps, embedding_dim, rnn_units, sequence_length=50, batch_size=64):
+    """
+    Builds the exhaustive training data of a store with the "dense" (previous) or
+    "streaming" pipeline in the current (fresh) process, then trains `steps` batches
+    of a small create_model network. Returns build time, samples/sec and peak RSS.
+    """
+    from tensorflow.keras.callbacks import LambdaCallback
+    from src.modeling.modeling import build_training_data, create_model
+
+    sequences = SequenceStore(store_path)
+    start = time.perf_counter()
+    if mode == "dense":
+        notes, X, y = _dense_data(sequences, sequence_length)
+        samples = len(X)
+    else:
+        notes, train_batches, validation_batches = build_training_data(sequences, sequence_length, "exhaustive",
+                                                                       batch_size=batch_size, seed=0)
+        samples = len(train_batches.starts) + len(validation_batches.starts)
+    build_seconds = time.perf_counter() - start
+
+    model = create_model(len(notes), embedding_dim, rnn_units, sequence_length)
+    # Time batches from the end of the first one, leaving out fit() setup and graph tracing
+    batch_ends = []
+    timer = LambdaCallback(on_train_batch_end=lambda batch, logs: batch_ends.append(time.perf_counter()))
+    if mode == "dense":
+        model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+        model.fit(X[:(steps + 1) * batch_size], y[:(steps + 1) * batch_size], batch_size=batch_size, epochs=1,
+                  verbose=0, callbacks=[timer])
+    else:
+        model.fit(train_batches, steps_per_epoch=steps + 1, epochs=1, verbose=0, callbacks=[timer])
+    train_seconds = batch_ends[-1] - batch_ends[0]
+
+    return {
+        "mode": mode,
+        "samples": samples,
+        "build_seconds": build_seconds,
+        "samples_per_second": steps * batch_size / train_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_in_subprocess(store_path, mode, steps, embedding_dim, rnn_units):
+    """Runs measure in a fresh interpreter, so each pipeline's peak RSS is its own."""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", "--store", store_path, "--mode", mode,
+               "--steps", str(steps), "--embedding-dim", str(embedding_dim), "--rnn-units", str(rnn_units)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare dense one-hot training data with streamed windows and sparse targets.")
+    parser.add_argument("--store", help="Sequence store to benchmark; a random one is generated if omitted.")
+    parser.add_argument("--num-sequences", type=int, default=1000)
+    parser.add_argument("--steps", type=int, default=50, help="Training batches timed per pipeline.")
+    parser.add_argument("--embedding-dim", type=int, default=64)
+    parser.add_argument("--rnn-units", type=int, default=256)
+    parser.add_argument("--mode", choices=["dense", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.store, args.mode, args.steps, args.embedding_dim, args.rnn_units)))
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store_path = args.store or write_random_store(os.path.join(tmp_dir, "random.store"), args.num_sequences)
+        results = [run_in_subprocess(store_path, mode, args.steps, args.embedding_dim, args.rnn_units)
+                   for mode in ("dense", "streaming")]
+
+    print(f"{results[0]['samples']} training windows (exhaustive augmentation), {args.steps} timed batches")
+    print(f"{'pipeline':>10} {'build s':>8} {'samples/s':>10} {'peak RSS MB':>12}")
+    for r in results:
+        print(f"{r['mode']:>10} {r['build_seconds']:>8.2f} {r['samples_per_second']:>10.0f} {r['peak_rss_mb']:>12.0f}")
@@ -0,0 +1,56 @@
+import os
+import sys
+import argparse
+import tempfile
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.modeling.modeling import train_model, AUGMENTATION_MODES, GENRES
+
+def run_benchmark(genres, data_dir, epochs, augmentation, embedding_dim, rnn_units, learning_rate, seed=0):
+    """
+    Trains the all-genres model, then every genre both from scratch and warm-started
+    from it. Returns {"all": summary, genre: {"scratch": summary, "warm": summary}}
+    with the train_model summaries (epochs, best_epoch, val_loss, seconds).
+    """
+    results = {}
+    options = dict(epochs=epochs, augmentation=augmentation, seed=seed, data_dir=data_dir,
+                   embedding_dim=embedding_dim, rnn_units=rnn_units)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results["all"] = train_model(genre=None, models_dir=tmp_dir, **options)
+        for genre in genres:
+            results[genre] = {
+                "scratch": train_model(genre=genre, models_dir=tmp_dir, **options),
+                "warm": train_model(genre=genre, models_dir=tmp_dir, warm_start_dir=tmp_dir,
+                                    learning_rate=learning_rate, **options),
+            }
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare genre models trained from scratch with models warm-started from the all-genres model.")
+    parser.add_argument("--genres", nargs="+", default=GENRES)
+    parser.add_argument("--data-dir", default=os.path.join(project_root, "data"))
+    parser.add_argument("--epochs", type=int, default=200)
+    parser.add_argument("--augmentation", choices=AUGMENTATION_MODES, default="random")
+    parser.add_argument("--embedding-dim", type=int, default=256)
+    parser.add_argument("--rnn-units", type=int, default=1536)
+    parser.add_argument("--learning-rate", type=float, default=0.001, help="Learning rate of the warm-started runs.")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.genres, args.data_dir, args.epochs, args.augmentation, args.embedding_dim,
+                            args.rnn_units, args.learning_rate)
+
+    all_model = results.pop("all")
+    print(f"all-genres model: best val_loss {all_model['val_loss']:.4f} at epoch {all_model['best_epoch']}, "
+          f"{all_model['seconds']:.0f}s")
+    print(f"{'genre':>6} {'init':>8} {'best epoch':>11} {'epochs':>7} {'val_loss':>9} {'seconds':>8}")
+    totals = {"scratch": 0.0, "warm": 0.0}
+    for genre, runs in results.items():
+        for init, summary in runs.items():
+            totals[init] += summary["seconds"]
+            print(f"{genre:>6} {init:>8} {summary['best_epoch']:>11} {summary['epochs']:>7} "
+                  f"{summary['val_loss']:>9.4f} {summary['seconds']:>8.0f}")
+    print(f"Genre training time: scratch {totals['scratch']:.0f}s, warm start {totals['warm']:.0f}s "
+          f"(+{all_model['seconds']:.0f}s for the all-genres model, needed either way)")
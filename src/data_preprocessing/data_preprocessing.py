@@ -1,9 +1,19 @@
 
 
-import json
 import os
+import sys
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.data_preprocessing.sequence_store import SequenceStoreWriter, DEFAULT_AUGMENTATION, store_path_for
+from src.data_preprocessing.jams_cache import read_note_annotations
+
 def _transpose_sequence(sequence, semitones):
     """Transposes a MIDI note sequence by a given number of semitones."""
     transposed_sequence = []
@@ -34,68 +44,142 @@ def _limit_consecutive_notes(sequence, max_consecutive=5):
             filtered_sequence.append(note_val)
     return filtered_sequence
 
-def preprocess_data(data_path, output_path, genre=None):
+def extract_sequences(file_path, materialise_transpositions=True, use_cache=True):
+    """
+    Parses one JAMS file and returns its note_midi sequences, after note limiting.
+    With materialise_transpositions each one is followed by its transpositions from
+    -5 to +5 semitones; otherwise only the originals are returned and transposition
+    is left to training time (see modeling.train_model).
+    The parsed annotations are cached on disk (see jams_cache.py) unless use_cache is False.
+    """
+    sequences = []
+
+    # Extract note sequences from the JAMS file
+    for sequence in read_note_annotations(file_path, use_cache):
+        # Apply note limiting
+        filtered_sequence = _limit_consecutive_notes(sequence, max_consecutive=5)
+
+        if filtered_sequence: # Ensure sequence is not empty after filtering
+            sequences.append(filtered_sequence)
+            if not materialise_transpositions:
+                continue
+
+            # Data Augmentation: Transpose sequences
+            for semitones in range(-5, 6): # Transpose by -5 to +5 semitones
+                if semitones == 0: # Original sequence is already added
+                    continue
+                transposed_seq = _transpose_sequence(filtered_sequence, semitones)
+                sequences.append(transposed_seq)
+    return sequences
+
+def _process_file(file_path, materialise_transpositions=True, use_cache=True):
+    """
+    Worker task: parses a file and returns its sequences both as text lines, ready to be
+    written, and as (tokens, lengths, transpositions) arrays for the sequence store.
+    """
+    sequences = extract_sequences(file_path, materialise_transpositions, use_cache)
+    lines = ''.join(' '.join(map(str, sequence)) + '\n' for sequence in sequences)
+    tokens = np.array([note_val for sequence in sequences for note_val in sequence], dtype=np.int16)
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.int64)
+    # extract_sequences emits each original followed by its transpositions
+    shifts = [semitones for semitones in DEFAULT_AUGMENTATION["transpositions"] if semitones != 0] if materialise_transpositions else []
+    transpositions = np.tile(np.array([0] + shifts, dtype=np.int8), len(sequences) // (len(shifts) + 1))
+    return lines, tokens, lengths, transpositions
+
+def _jams_files(data_path):
+    return [filename for filename in os.listdir(data_path) if filename.endswith(".jams")]
+
+def preprocess_data(data_path, output_path, genre=None, materialise_transpositions=False, use_cache=True):
     """
     Reads JAMS files in a directory, extracts the MIDI note sequences,
-    and saves them to a text file.
+    and saves them to a text file and to a binary sequence store next to it
+    (see sequence_store.py).
     If a genre is specified, only processes files containing that genre in their name.
-    Applies data augmentation through transposition.
+    Transposition augmentation is applied at training time, unless
+    materialise_transpositions writes the -5..+5 copies to disk as before.
     """
-    all_sequences = []
-    for filename in os.listdir(data_path):
-        if filename.endswith(".jams"):
-            # Filter by genre if specified
-            if genre and genre.lower() not in filename.lower():
-                continue
+    preprocess_partitions(data_path, {genre: output_path}, workers=1, materialise_transpositions=materialise_transpositions,
+                          use_cache=use_cache)
+
+def preprocess_partitions(data_path, outputs, workers=None, materialise_transpositions=False, use_cache=True):
+    """
+    Writes several genre partitions of the corpus in a single pass.
+
+    Every JAMS file is parsed exactly once, on a pool of worker processes, and its
+    sequences are appended to every partition it belongs to (the genre name appears in
+    the filename, or the partition is None for all genres). Files are written in
+    directory listing order, so each output is identical to a separate
+    preprocess_data call for that genre. Every text file gets a binary sequence
+    store next to it (store_path_for), with the source file and transposition of
+    each sequence.
+
+    Args:
+        data_path (str): Directory containing the JAMS files.
+        outputs (dict): Maps a genre name (or None for all genres) to its output path.
+        workers (int): Number of worker processes. Defaults to the number of CPUs.
+        materialise_transpositions (bool): Also write the transposed copies of every
+            sequence (the previous, 11x larger output) instead of only the originals.
+        use_cache (bool): Read and fill the parsed-JAMS cache (see jams_cache.py).
+    """
+    filenames = _jams_files(data_path)
+    # Files that belong to no requested partition are never parsed
+    routes = []
+    for filename in filenames:
+        genres = [genre for genre in outputs if not genre or genre.lower() in filename.lower()]
+        if genres:
+            routes.append((os.path.join(data_path, filename), genres))
 
-            file_path = os.path.join(data_path, filename)
-            with open(file_path, 'r') as f:
-                jams_data = json.load(f)
-            
-            # Extract note sequences from the JAMS file
-            for annotation in jams_data['annotations']:
-                if annotation['namespace'] == 'note_midi':
-                    sequence = []
-                    for note_data in annotation['data']:
-                        sequence.append(int(round(note_data['value'])))
-                    
-                    # Apply note limiting
-                    filtered_sequence = _limit_consecutive_notes(sequence, max_consecutive=5)
-
-                    if filtered_sequence: # Ensure sequence is not empty after filtering
-                        all_sequences.append(filtered_sequence)
-                        
-                        # Data Augmentation: Transpose sequences
-                        for semitones in range(-5, 6): # Transpose by -5 to +5 semitones
-                            if semitones == 0: # Original sequence is already added
-                                continue
-                            transposed_seq = _transpose_sequence(filtered_sequence, semitones)
-                            all_sequences.append(transposed_seq)
-
-    # Save the sequences to a text file
-    with open(output_path, 'w') as f:
-        for sequence in all_sequences:
-            f.write(' '.join(map(str, sequence)) + '\n')
+    handles = {genre: open(path, 'w') for genre, path in outputs.items()}
+    augmentation = dict(DEFAULT_AUGMENTATION, materialised=materialise_transpositions)
+    stores = {genre: SequenceStoreWriter(store_path_for(path), genre=genre, augmentation=augmentation)
+              for genre, path in outputs.items()}
+
+    def write(file_path, genres, result):
+        lines, tokens, lengths, transpositions = result
+        for genre in genres:
+            handles[genre].write(lines)
+            stores[genre].add(tokens, lengths, transpositions, source_file=os.path.basename(file_path))
+
+    try:
+        file_paths = [file_path for file_path, _ in routes]
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(file_paths) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # map keeps the input order, so partitions are written deterministically
+                chunksize = max(1, len(file_paths) // (workers * 4))
+                results = pool.map(partial(_process_file, materialise_transpositions=materialise_transpositions,
+                                           use_cache=use_cache), file_paths, chunksize=chunksize)
+                for (file_path, genres), result in zip(routes, results):
+                    write(file_path, genres, result)
+        else:
+            for file_path, genres in routes:
+                write(file_path, genres, _process_file(file_path, materialise_transpositions, use_cache))
+    finally:
+        for handle in handles.values():
+            handle.close()
+    for store in stores.values():
+        store.close()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Extract note sequences from the JAMS files in data/.")
+    parser.add_argument("--materialise-transpositions", action="store_true",
+                        help="Write the -5..+5 transposed copies to disk (previous behaviour) instead of transposing at training time.")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every JAMS file again instead of using data/.jams_cache/.")
+    args = parser.parse_args()
+
     # Get the absolute path of the project's root directory
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
     
     data_path = os.path.join(project_root, "data")
     
-    # Process data for each genre
+    # Every genre, plus all data without genre filtering for a general model,
+    # written in a single pass over the corpus
     genres = ["Rock", "Jazz", "Funk", "BN", "SS"] # Add other genres as needed
-    for genre_name in genres:
-        output_file = f"processed_sequences_{genre_name.lower()}.txt"
-        output_path = os.path.join(project_root, "data", output_file)
-        print(f"Processing {genre_name} genre...")
-        preprocess_data(data_path, output_path, genre=genre_name)
-        print(f"Saved {genre_name} sequences to {output_path}")
-
-    # Also process all data without genre filtering for a general model
-    output_path_all = os.path.join(project_root, "data", "processed_sequences_all.txt")
-    print("Processing all genres...")
-    preprocess_data(data_path, output_path_all)
-    print(f"Saved all sequences to {output_path_all}")
-
+    outputs = {genre_name: os.path.join(project_root, "data", f"processed_sequences_{genre_name.lower()}.txt") for genre_name in genres}
+    outputs[None] = os.path.join(project_root, "data", "processed_sequences_all.txt")
 
+    print(f"Processing {', '.join(genres)} and all genres...")
+    preprocess_partitions(data_path, outputs, materialise_transpositions=args.materialise_transpositions,
+                          use_cache=not args.no_cache)
+    for genre_name, output_path in outputs.items():
+        print(f"Saved {genre_name or 'all'} sequences to {output_path}")
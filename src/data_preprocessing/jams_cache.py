@@ -0,0 +1,73 @@
+"""
+On-disk cache of the note annotations parsed out of JAMS files.
+
+Parsing the JSON of a JAMS file is the slow part of both preprocessing and the
+evaluation of the original data, so every file is parsed once and its note_midi
+annotations saved next to it:
+
+    <data dir>/.jams_cache/<file name>.npz   tokens, annotation lengths, and the
+                                            path, mtime and size they were read from
+
+An entry is only used while the JAMS file keeps the same path, modification time
+and size; otherwise the file is parsed again and the entry replaced. Entries are
+written atomically, so worker processes can fill the cache concurrently.
+"""
+import os
+import json
+import numpy as np
+
+CACHE_DIR_NAME = ".jams_cache"
+CACHE_VERSION = 1
+
+def cache_path_for(file_path):
+    """Cache entry of a JAMS file."""
+    return os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR_NAME, os.path.basename(file_path) + ".npz")
+
+def _file_key(file_path):
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size
+
+def parse_note_annotations(file_path):
+    """Parses a JAMS file. Returns its note_midi annotations, each a list of MIDI notes (rounded)."""
+    with open(file_path, 'r') as f:
+        jams_data = json.load(f)
+    return [[int(round(note_data['value'])) for note_data in annotation['data']]
+            for annotation in jams_data['annotations'] if annotation['namespace'] == 'note_midi']
+
+def _load_entry(cache_path, key):
+    try:
+        with np.load(cache_path) as entry:
+            if int(entry["version"]) != CACHE_VERSION or (str(entry["path"]), int(entry["mtime_ns"]), int(entry["size"])) != key:
+                return None
+            tokens, lengths = entry["tokens"], entry["lengths"]
+    except (OSError, ValueError, KeyError):
+        return None
+    boundaries = np.cumsum(lengths)[:-1]
+    return [annotation.tolist() for annotation in np.split(tokens.astype(np.int64), boundaries)] if len(lengths) else []
+
+def _save_entry(cache_path, key, annotations):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tokens = np.array([note_val for annotation in annotations for note_val in annotation], dtype=np.int16)
+    lengths = np.array([len(annotation) for annotation in annotations], dtype=np.int64)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, version=CACHE_VERSION, path=key[0], mtime_ns=key[1], size=key[2], tokens=tokens, lengths=lengths)
+    os.replace(tmp_path, cache_path)
+
+def read_note_annotations(file_path, use_cache=True):
+    """
+    Returns the note_midi annotations of a JAMS file (see parse_note_annotations),
+    from the cache when it is up to date with the file, parsing and caching them otherwise.
+    """
+    if not use_cache:
+        return parse_note_annotations(file_path)
+    key = _file_key(file_path)
+    cache_path = cache_path_for(file_path)
+    annotations = _load_entry(cache_path, key)
+    if annotations is None:
+        annotations = parse_note_annotations(file_path)
+        try:
+            _save_entry(cache_path, key, annotations)
+        except OSError:
+            pass # A read-only data directory only costs the parse next time
+    return annotations
@@ -0,0 +1,198 @@
+"""
+Binary, memory-mapped store for processed note sequences.
+
+A store is a directory (processed_sequences_<genre>.store next to the text file)
+holding:
+  * tokens.npy          all sequences concatenated (uint8 MIDI notes, int16 if out of range)
+  * offsets.npy         int64, sequence i is tokens[offsets[i]:offsets[i + 1]]
+  * transpositions.npy  int8, semitones each sequence was transposed by (0 = original)
+  * sources.npy         int32, index into metadata["source_files"] (-1 if unknown)
+  * metadata.json       genre, augmentation settings, counts and dtypes
+
+The arrays are plain .npy files opened with mmap_mode="r", so opening a store is
+instantaneous and sequences are read straight from the page cache without copying.
+
+Converting existing text files:
+    python src/data_preprocessing/sequence_store.py data/processed_sequences_*.txt
+"""
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+
+FORMAT_VERSION = 1
+# "materialised" tells whether the transposed copies are stored, or left to training time
+DEFAULT_AUGMENTATION = {"transpositions": list(range(-5, 6)), "max_consecutive": 5, "materialised": True}
+
+def store_path_for(text_path):
+    """Returns the store directory that goes with a processed_sequences_*.txt file."""
+    return os.path.splitext(text_path)[0] + ".store"
+
+def _token_dtype(tokens):
+    if tokens.size == 0 or (tokens.min() >= 0 and tokens.max() <= 255):
+        return np.uint8
+    return np.int16
+
+class SequenceStoreWriter:
+    """
+    Accumulates sequences and writes them as a store on close().
+
+    Args:
+        path (str): Store directory. An existing store is replaced atomically.
+        genre (str): Genre of the partition, or None for all genres.
+        augmentation (dict): How the sequences were augmented (see DEFAULT_AUGMENTATION).
+    """
+
+    def __init__(self, path, genre=None, augmentation=None):
+        self.path = path
+        self.genre = genre
+        self.augmentation = augmentation
+        self.source_files = []
+        self._tokens = []
+        self._lengths = []
+        self._transpositions = []
+        self._sources = []
+
+    def add(self, tokens, lengths, transpositions, source_file=None):
+        """
+        Appends the sequences of one source: tokens is their concatenation, lengths and
+        transpositions have one entry per sequence.
+        """
+        if source_file is not None:
+            source = len(self.source_files)
+            self.source_files.append(source_file)
+        else:
+            source = -1
+        self._tokens.append(np.asarray(tokens, dtype=np.int16))
+        self._lengths.append(np.asarray(lengths, dtype=np.int64))
+        self._transpositions.append(np.asarray(transpositions, dtype=np.int8))
+        self._sources.append(np.full(len(lengths), source, dtype=np.int32))
+
+    def close(self):
+        tokens = np.concatenate(self._tokens) if self._tokens else np.zeros(0, dtype=np.int16)
+        lengths = np.concatenate(self._lengths) if self._lengths else np.zeros(0, dtype=np.int64)
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        tokens = tokens.astype(_token_dtype(tokens))
+
+        tmp_path = self.path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        np.save(os.path.join(tmp_path, "tokens.npy"), tokens)
+        np.save(os.path.join(tmp_path, "offsets.npy"), offsets)
+        np.save(os.path.join(tmp_path, "transpositions.npy"),
+                np.concatenate(self._transpositions) if self._transpositions else np.zeros(0, dtype=np.int8))
+        np.save(os.path.join(tmp_path, "sources.npy"),
+                np.concatenate(self._sources) if self._sources else np.zeros(0, dtype=np.int32))
+        metadata = {
+            "format_version": FORMAT_VERSION,
+            "genre": self.genre,
+            "num_sequences": int(len(lengths)),
+            "num_tokens": int(len(tokens)),
+            "token_dtype": np.dtype(tokens.dtype).name,
+            "augmentation": self.augmentation,
+            "source_files": self.source_files,
+        }
+        with open(os.path.join(tmp_path, "metadata.json"), 'w') as f:
+            json.dump(metadata, f, indent=2)
+
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        os.replace(tmp_path, self.path)
+        return self.path
+
+class SequenceStore:
+    """
+    Read-only view of a store. Arrays are memory-mapped; indexing returns a view.
+
+    Args:
+        path (str): Store directory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "metadata.json"), 'r') as f:
+            self.metadata = json.load(f)
+        if self.metadata.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported sequence store version in {path}: {self.metadata.get('format_version')}")
+        self.tokens = np.load(os.path.join(path, "tokens.npy"), mmap_mode='r')
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode='r')
+        self.transpositions = np.load(os.path.join(path, "transpositions.npy"), mmap_mode='r')
+        self.sources = np.load(os.path.join(path, "sources.npy"), mmap_mode='r')
+
+    @property
+    def genre(self):
+        return self.metadata["genre"]
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.tokens[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def notes(self):
+        """Sorted list of the distinct notes in the store."""
+        return np.unique(self.tokens).tolist()
+
+def _infer_transpositions(sequences, augmentation):
+    """
+    Recovers the transposition of every sequence of a text file written by preprocess_data,
+    where each original is followed by its transposed copies in DEFAULT_AUGMENTATION order.
+    Sequences that don't fit that layout are marked as originals.
+    """
+    shifts = [s for s in augmentation["transpositions"] if s != 0]
+    transpositions = np.zeros(len(sequences), dtype=np.int8)
+    i = 0
+    while i < len(sequences):
+        original = np.asarray(sequences[i])
+        group = sequences[i + 1:i + 1 + len(shifts)]
+        if len(group) == len(shifts) and all(
+            len(seq) == len(original) and np.array_equal(np.asarray(seq), original + shift) for seq, shift in zip(group, shifts)
+        ):
+            transpositions[i + 1:i + 1 + len(shifts)] = shifts
+            i += 1 + len(shifts)
+        else:
+            i += 1
+    return transpositions
+
+def convert_text_file(text_path, store_path=None, genre=None):
+    """
+    Converts a processed_sequences_*.txt file to a store (by default next to it).
+    Transpositions are inferred from the preprocess_data layout; sources are unknown.
+    """
+    store_path = store_path or store_path_for(text_path)
+    with open(text_path, 'r') as f:
+        sequences = [list(map(int, line.split())) for line in f]
+    augmentation = dict(DEFAULT_AUGMENTATION, inferred=True)
+    transpositions = _infer_transpositions(sequences, augmentation)
+    augmentation["materialised"] = bool(np.any(transpositions != 0))
+
+    writer = SequenceStoreWriter(store_path, genre=genre, augmentation=augmentation)
+    tokens = [note for seq in sequences for note in seq]
+    writer.add(tokens, [len(seq) for seq in sequences], transpositions)
+    return writer.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert processed_sequences_*.txt files to binary sequence stores.")
+    parser.add_argument("text_files", nargs="+")
+    args = parser.parse_args()
+
+    for text_path in args.text_files:
+        name = os.path.splitext(os.path.basename(text_path))[0]
+        genre = name[len("processed_sequences_"):] if name.startswith("processed_sequences_") else None
+        if genre == "all":
+            genre = None
+        path = convert_text_file(text_path, genre=genre)
+        store = SequenceStore(path)
+        print(f"Converted {text_path} -> {path} ({len(store)} sequences, {len(store.tokens)} tokens, "
+              f"{int((store.transpositions != 0).sum())} transposed)")
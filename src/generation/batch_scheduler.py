@@ -0,0 +1,320 @@
+import os
+import sys
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.generate import seed_to_pattern
+from src.generation.incremental import IncrementalDecoder, get_step_model
+from src.generation.sampling import BatchSampler, validate_sampling_options
+from src.generation.model_registry import model_name, GENRES
+
+class GenerationJob:
+    """A single generation request waiting for, or taking part in, a batched decode."""
+
+    def __init__(self, genre, seed_notes_str, generation_length, temperature, rng, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, tier="full",
+                 on_note=None):
+        self.genre = genre
+        self.tier = tier
+        self.seed_notes_str = seed_notes_str
+        self.generation_length = generation_length
+        self.temperature = temperature
+        self.rng = rng
+        self.top_k = top_k
+        self.top_p = top_p
+        self.repetition_penalty = repetition_penalty
+        self.max_consecutive = max_consecutive
+        self.on_note = on_note
+        self.pattern = None
+        self.generated = []
+        self.future = Future()
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+
+class BatchScheduler:
+    """
+    Collects concurrent generation requests for the same genre (and model tier) into one batched
+    forward pass per decoding step.
+
+    Each genre and tier gets a worker thread that decodes with the incremental (stateful) step
+    model. Requests can join the running batch at any step (their seed is primed in a
+    separate call and their LSTM states appended to the batch) and leave it as soon as
+    they reach their own generation_length. Sampling is one vectorised BatchSampler call
+    per step, but stays per request: every job keeps its own sampling options and
+    np.random.Generator.
+
+    Genre, tier and sampling options are validated in submit(), before a job can reach a
+    worker; a seed that doesn't fit the model's vocabulary only fails its own job. A
+    worker with no job for idle_timeout seconds exits and is recreated on demand.
+
+    Args:
+        get_handle (callable): get_handle(genre, tier) returns the ModelHandle of a genre (e.g. ModelRegistry.get).
+        max_batch_size (int): Maximum number of sequences decoded together.
+        max_wait (float): Seconds an idle worker waits for more requests before starting a batch.
+        genres (list): Genres accepted by submit().
+        idle_timeout (float): Seconds after which an idle worker thread stops.
+    """
+
+    def __init__(self, get_handle, max_batch_size=16, max_wait=0.005, sequence_length=50, genres=GENRES, idle_timeout=60):
+        self.get_handle = get_handle
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.sequence_length = sequence_length
+        self.genres = {genre.lower() for genre in genres}
+        self.idle_timeout = idle_timeout
+        self._queues = {}
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.steps = 0
+        self.decoded_rows = 0
+        self.completed = 0
+        self.latencies = deque(maxlen=1000)
+
+    def submit(self, genre, seed_notes_str, generation_length=500, temperature=1.0, rng=None, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, tier="full",
+               on_note=None):
+        """
+        Queues a request and returns a concurrent.futures.Future with the generated MIDI notes.
+        The sampling options are those of generate.generate_notes; tier selects the model (see model_registry.TIERS).
+        on_note, if given, is called on the worker thread with every MIDI note as soon as it
+        is sampled (e.g. to stream it); an exception it raises fails the job.
+        Raises ValueError for an unknown genre or tier or invalid sampling options.
+        """
+        if genre.lower() not in self.genres:
+            raise ValueError(f"Unknown genre '{genre}'.")
+        key = model_name(genre, tier)
+        validate_sampling_options(temperature, top_k, top_p, repetition_penalty, max_consecutive)
+        if rng is None:
+            rng = np.random.default_rng()
+        job = GenerationJob(genre, seed_notes_str, generation_length, temperature, rng, top_k, top_p, repetition_penalty, max_consecutive, tier,
+                            on_note)
+        if generation_length <= 0:
+            job.future.set_result([])
+            return job.future
+
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("BatchScheduler has been shut down.")
+            jobs = self._queues.get(key)
+            if jobs is None:
+                jobs = self._queues[key] = queue.Queue()
+                worker = threading.Thread(target=self._run, args=(key, jobs), name=f"batch-scheduler-{key}", daemon=True)
+                self._workers[key] = worker
+                worker.start()
+            # Under the lock, so an idle worker can't exit between the lookup and the put
+            jobs.put(job)
+        return job.future
+
+    def shutdown(self):
+        """Stops the workers once their current batch is finished."""
+        with self._lock:
+            self._stopped = True
+            for jobs in self._queues.values():
+                jobs.put(None)
+
+    def stats(self):
+        """Returns batching and latency counters."""
+        # The workers update the counters and add or retire queues concurrently
+        with self._lock:
+            steps, decoded_rows, completed = self.steps, self.decoded_rows, self.completed
+            queued = sum(jobs.qsize() for jobs in self._queues.values())
+            latencies = sorted(self.latencies)
+        return {
+            "steps": steps,
+            "avg_batch_size": decoded_rows / steps if steps else 0,
+            "completed": completed,
+            "queued": queued,
+            "latency_p50": float(np.percentile(latencies, 50)) if latencies else 0,
+            "latency_p95": float(np.percentile(latencies, 95)) if latencies else 0,
+        }
+
+    def _collect(self, key, jobs, active_count):
+        """Takes new jobs from the queue. Returns (new_jobs, stop)."""
+        new_jobs = []
+        capacity = self.max_batch_size - active_count
+        if active_count == 0:
+            # Idle: block for the first job, then give others max_wait to join it
+            try:
+                job = jobs.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if jobs.empty():
+                        # Nothing can be queued for this key any more: retire the worker
+                        self._queues.pop(key, None)
+                        self._workers.pop(key, None)
+                        return new_jobs, True
+                return new_jobs, False
+            if job is None:
+                return new_jobs, True
+            new_jobs.append(job)
+            deadline = time.perf_counter() + self.max_wait
+            while len(new_jobs) < capacity:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    job = jobs.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if job is None:
+                    return new_jobs, True
+                new_jobs.append(job)
+        else:
+            # Busy: let waiting jobs join mid-generation without delaying the batch
+            while len(new_jobs) < capacity:
+                try:
+                    job = jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    return new_jobs, True
+                new_jobs.append(job)
+        return new_jobs, False
+
+    def _prime(self, handle, new_jobs):
+        """
+        Maps the seeds of new jobs to patterns and primes them. Returns (jobs, decoder, logits).
+        A job whose seed can't be mapped, or whose priming fails, gets the exception alone.
+        """
+        primed_jobs = []
+        patterns = []
+        for job in new_jobs:
+            try:
+                job.pattern = seed_to_pattern(job.seed_notes_str, handle.note_to_int, self.sequence_length)
+                patterns.append(job.pattern)
+                primed_jobs.append(job)
+            except Exception as e:
+                _fail(job, e)
+        if not primed_jobs:
+            return [], None, None
+        step_model = get_step_model(handle)
+        decoder = IncrementalDecoder(step_model)
+        try:
+            logits = decoder.prime(np.array(patterns))
+        except Exception:
+            # Prime one job at a time to fail only the one(s) at fault
+            decoder, logits, jobs = None, None, primed_jobs
+            primed_jobs = []
+            for job in jobs:
+                job_decoder = IncrementalDecoder(step_model)
+                try:
+                    job_logits = job_decoder.prime(np.array([job.pattern]))
+                except Exception as e:
+                    _fail(job, e)
+                    continue
+                if decoder is None:
+                    decoder, logits = job_decoder, job_logits
+                else:
+                    decoder.extend(job_decoder)
+                    logits = np.concatenate([logits, job_logits])
+                primed_jobs.append(job)
+        now = time.perf_counter()
+        for job in primed_jobs:
+            job.started_at = now
+        return primed_jobs, decoder, logits
+
+    def _run(self, key, jobs):
+        active = []
+        decoder = None
+        sampler = None
+        logits = None
+        handle = None
+        stop = False
+        while True:
+            if not stop:
+                new_jobs, stop = self._collect(key, jobs, len(active))
+            else:
+                new_jobs = []
+            if not active and not new_jobs:
+                if stop:
+                    break
+                continue
+
+            if new_jobs:
+                primed_jobs = []
+                try:
+                    if not active:
+                        # Pick up reloaded models only between batches
+                        handle = self.get_handle(new_jobs[0].genre, new_jobs[0].tier)
+                except Exception as e:
+                    # Every job of this worker needs the same model
+                    for job in new_jobs:
+                        _fail(job, e)
+                else:
+                    primed_jobs, new_decoder, new_logits = self._prime(handle, new_jobs)
+                if primed_jobs and not active:
+                    sampler = BatchSampler(handle.vocab_size, capacity=self.max_batch_size)
+                for job in primed_jobs:
+                    # The options were validated in submit(), so adding a row can't fail
+                    sampler.add(job.temperature, job.top_k, job.top_p, job.repetition_penalty, job.max_consecutive,
+                                rng=job.rng, history=job.pattern)
+                if primed_jobs:
+                    if active:
+                        decoder.extend(new_decoder)
+                        logits = np.concatenate([logits, new_logits])
+                    else:
+                        decoder, logits = new_decoder, new_logits
+                    active.extend(primed_jobs)
+                if not active:
+                    continue
+
+            # One vectorised sampling call for the whole batch, then drop the finished jobs
+            indices = sampler.sample(logits=logits)
+            keep = np.ones(len(active), dtype=bool)
+            for row, job in enumerate(active):
+                if job.future.cancelled():
+                    keep[row] = False
+                    continue
+                job.generated.append(int(indices[row]))
+                if job.on_note is not None:
+                    try:
+                        job.on_note(handle.int_to_note[str(job.generated[-1])])
+                    except Exception as e:
+                        keep[row] = False
+                        _fail(job, e)
+                        continue
+                if len(job.generated) >= job.generation_length:
+                    keep[row] = False
+                    self._finish(job, handle)
+
+            if not keep.all():
+                active = [job for job, kept in zip(active, keep) if kept]
+                decoder.keep(keep)
+                sampler.keep(keep)
+                logits = logits[keep]
+            if not active:
+                continue
+
+            try:
+                logits = decoder.step([job.generated[-1] for job in active])
+            except Exception as e:
+                for job in active:
+                    _fail(job, e)
+                active = []
+                continue
+            with self._lock:
+                self.steps += 1
+                self.decoded_rows += len(active)
+
+    def _finish(self, job, handle):
+        notes = [handle.int_to_note[str(index)] for index in job.generated]
+        with self._lock:
+            self.completed += 1
+            self.latencies.append(time.perf_counter() - job.submitted_at)
+        try:
+            job.future.set_result(notes)
+        except InvalidStateError:
+            pass # Cancelled by the client meanwhile
+
+def _fail(job, e):
+    try:
+        job.future.set_exception(e)
+    except InvalidStateError:
+        pass # Already cancelled or resolved
@@ -0,0 +1,150 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ExecutorSaturated(Exception):
+    """Raised when the executor cannot accept more work. retry_after is a hint in seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ExecutorShuttingDown(ExecutorSaturated):
+    """Raised when the executor no longer accepts work because it is shutting down."""
+
+class GenerationExecutor:
+    """
+    Bounded execution layer for CPU-heavy generation work.
+
+    Jobs run on a fixed pool of worker threads (the models are shared through the
+    process-wide ModelRegistry, so they are loaded once for all workers). At most
+    max_workers jobs run and max_queue wait; beyond that submit raises
+    ExecutorSaturated so the caller can answer 429 instead of piling up work.
+
+    Args:
+        max_workers (int): Number of generation threads.
+        max_queue (int): Number of jobs allowed to wait for a free worker.
+    """
+
+    def __init__(self, max_workers=2, max_queue=8):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._running = 0
+        self._tracked = 0
+        self._accepting = True
+        self._avg_duration = None
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, cancel_event=..., **kwargs) on the pool.
+
+        Returns (future, cancel_event). Setting cancel_event asks a running job to stop;
+        fn is expected to check it between decoding steps.
+        """
+        cancel_event = threading.Event()
+        self._acquire()
+
+        def run():
+            with self._lock:
+                self._running += 1
+            start = time.perf_counter()
+            try:
+                return fn(*args, cancel_event=cancel_event, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                with self._lock:
+                    self._running -= 1
+                    # Exponential moving average, used for the Retry-After hint
+                    if self._avg_duration is None:
+                        self._avg_duration = duration
+                    else:
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+        try:
+            future = self._pool.submit(run)
+        except RuntimeError:
+            self._release(None)
+            raise ExecutorShuttingDown("Generation executor is shutting down.", retry_after=self.retry_after())
+        future.add_done_callback(lambda f: self._release(f, cancel_event.is_set()))
+        return future, cancel_event
+
+    def track(self, start):
+        """
+        Applies the same admission control to work that runs elsewhere (e.g. the
+        BatchScheduler). start() must return a concurrent.futures.Future.
+        """
+        self._acquire()
+        try:
+            future = start()
+        except Exception:
+            self._release(None)
+            raise
+        with self._lock:
+            self._tracked += 1
+        future.add_done_callback(self._release_tracked)
+        return future
+
+    def retry_after(self):
+        """Estimates in seconds when a slot will free up."""
+        with self._lock:
+            avg_duration = self._avg_duration or 1.0
+            waiting = max(self._in_flight - self.max_workers, 0)
+        return max(1, int(round(avg_duration * (waiting / self.max_workers + 1))))
+
+    def stats(self):
+        """Returns queue depth and counters, for sizing the pool."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queued": max(self._in_flight - self._running - self._tracked, 0),
+                "tracked": self._tracked,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+                "avg_duration": self._avg_duration,
+            }
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            self._accepting = False
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _acquire(self):
+        with self._lock:
+            if not self._accepting:
+                raise ExecutorShuttingDown("Generation executor is shutting down.")
+            if self._in_flight >= self.capacity:
+                self.rejected += 1
+                saturated = True
+            else:
+                self._in_flight += 1
+                saturated = False
+        if saturated:
+            raise ExecutorSaturated("Too many generation requests in progress.", retry_after=self.retry_after())
+
+    def _release(self, future, cancel_requested=False):
+        with self._lock:
+            self._in_flight -= 1
+            if future is not None:
+                if future.cancelled() or cancel_requested:
+                    self.cancelled += 1
+                else:
+                    self.completed += 1
+
+    def _release_tracked(self, future):
+        with self._lock:
+            self._tracked -= 1
+        self._release(future)
@@ -1,10 +1,24 @@
 import numpy as np
-import json
+import io
 import os
-from tensorflow.keras.models import load_model
-from midiutil import MIDIFile # Import MIDIFile
+import sys
+import logging
 import mido # Import mido
 
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.model_registry import load_model_handle
+from src.generation.incremental import IncrementalDecoder, get_step_model
+from src.generation.midi_encoding import encode_midi
+from src.generation.sampling import BatchSampler, log_softmax
+
+logger = logging.getLogger(__name__)
+
+class GenerationCancelled(Exception):
+    """Raised when a generation is stopped through its cancel_event."""
+
 def read_midi_file(midi_file_path):
     """Reads a MIDI file and returns a list of MIDI note numbers."""
     notes = []
@@ -15,16 +29,23 @@ def read_midi_file(midi_file_path):
                 if msg.type == 'note_on' and msg.velocity > 0:
                     notes.append(msg.note)
     except Exception as e:
-        print(f"Error reading MIDI file {midi_file_path}: {e}")
+        logger.error(f"Error reading MIDI file {midi_file_path}: {e}")
     return notes
 
-def sample(preds, temperature=1.0):
-    """Helper function to sample an index from a probability array."""
+def sample(preds, temperature=1.0, rng=None):
+    """
+    Helper function to sample an index from a probability array.
+    If rng (a np.random.Generator) is given it is used instead of the global RNG state.
+    The decoding paths below sample whole batches with sampling.BatchSampler instead.
+    """
     preds = np.asarray(preds).astype('float64')
     preds = np.log(preds) / temperature
     exp_preds = np.exp(preds)
     preds = exp_preds / np.sum(exp_preds)
-    probas = np.random.multinomial(1, preds, 1)
+    if rng is None:
+        probas = np.random.multinomial(1, preds, 1)
+    else:
+        probas = rng.multinomial(1, preds, 1)
     return np.argmax(probas)
 
 def notes_to_midi(notes_str):
@@ -50,30 +71,11 @@ def notes_to_midi(notes_str):
         if midi_val is not None:
             midi_notes.append(midi_val)
         else:
-            print(f"Warning: Could not parse note '{note_name}'. Skipping.")
+            logger.warning(f"Could not parse note '{note_name}'. Skipping.")
     return midi_notes
 
-def generate_music(genre, seed_notes_str, output_path, sequence_length=50, generation_length=500, temperature=1.0):
-    """Generates a new music sequence based on genre and seed notes, and saves it as a MIDI file."""
-    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-    
-    model_path = os.path.join(project_root, "models", f"guitar_solo_generator_{genre.lower()}.h5")
-    int_to_note_path = os.path.join(project_root, "models", f"int_to_note_{genre.lower()}.json")
-
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"Model not found for genre '{genre}': {model_path}")
-    if not os.path.exists(int_to_note_path):
-        raise FileNotFoundError(f"Note mapping not found for genre '{genre}': {int_to_note_path}")
-
-    model = load_model(model_path)
-    
-    with open(int_to_note_path, 'r') as f:
-        int_to_note = json.load(f)
-    note_to_int = {int(note_val): int(index) for index, note_val in int_to_note.items()} # Ensure keys are int
-
-    # DEBUGGING: Print int_to_note mapping
-    print(f"int_to_note mapping for {genre}: {int_to_note}")
-
+def seed_to_pattern(seed_notes_str, note_to_int, sequence_length=50):
+    """Converts a seed notes string to a pattern of sequence_length-1 vocabulary indices."""
     # Convert seed notes string to MIDI numbers
     seed_midi_notes = notes_to_midi(seed_notes_str)
     if not seed_midi_notes:
@@ -86,7 +88,7 @@ def generate_music(genre, seed_notes_str, output_path, sequence_length=50, gener
         if n_midi in note_to_int:
             pattern.append(note_to_int[n_midi])
         else:
-            print(f"Warning: Seed note MIDI {n_midi} not found in model vocabulary. Skipping.")
+            logger.warning(f"Seed note MIDI {n_midi} not found in model vocabulary. Skipping.")
             # Optionally, handle this by mapping to a default note or raising an error
             # For now, we'll just skip it. If pattern becomes empty, it will raise an error later.
 
@@ -98,7 +100,7 @@ def generate_music(genre, seed_notes_str, output_path, sequence_length=50, gener
         # Pad with a common note or a special 'start' token if available
         # For simplicity, let's just repeat the last note or pad with 0 if 0 is a valid note index
         # A more robust solution would involve a dedicated padding token or more sophisticated seed handling
-        print(f"Warning: Seed sequence too short ({len(pattern)}). Padding with first note to {sequence_length-1}.")
+        logger.info(f"Seed sequence too short ({len(pattern)}). Padding with first note to {sequence_length-1}.")
         # Simple padding: repeat the first note
         if pattern:
             pattern = [pattern[0]] * (sequence_length - 1 - len(pattern)) + pattern
@@ -107,55 +109,209 @@ def generate_music(genre, seed_notes_str, output_path, sequence_length=50, gener
             # This case should ideally be caught earlier.
             raise ValueError("Seed notes could not be mapped to model vocabulary and pattern is empty.")
     elif len(pattern) > sequence_length - 1:
-        print(f"Warning: Seed sequence too long ({len(pattern)}). Truncating to {sequence_length-1}.")
+        logger.info(f"Seed sequence too long ({len(pattern)}). Truncating to {sequence_length-1}.")
         pattern = pattern[-(sequence_length - 1):] # Take the last part of the seed
 
-    generated_sequence = []
-    # Start generation from the seed pattern
-    current_pattern = list(pattern) # Make a copy to modify
-
-    for i in range(generation_length):
-        prediction_input = np.reshape(current_pattern, (1, len(current_pattern)))
-        prediction = model.predict(prediction_input, verbose=0)[0]
-        
-        # DEBUGGING: Print prediction probabilities and sampled index
-        # print(f"--- Step {i+1} ---")
-        # print(f"Prediction probabilities (top 5): {np.sort(prediction)[::-1][:5]}")
-        # print(f"Indices of top 5: {np.argsort(prediction)[::-1][:5]}")
-        # print(f"Temperature: {temperature}")
-
-        index = sample(prediction, temperature)
-        # print(f"Sampled index: {index}")
-        
-        result = int_to_note[str(index)] # Keys are strings from JSON
-        generated_sequence.append(result)
-        
-        current_pattern.append(index)
-        current_pattern = current_pattern[1:len(current_pattern)]
-
-    # DEBUGGING: Print the first 20 notes of the generated sequence
-    print(f"First 20 generated MIDI notes: {generated_sequence[:20]}")
-
-    # Use midiutil to create the MIDI file
-    midi_file = MIDIFile(1)  # One track
-    track = 0
-    time = 0
-    channel = 0
-    volume = 100  # 0-127
-    tempo = 120  # BPM
-
-    midi_file.addTrackName(track, time, "Generated Solo")
-    midi_file.addTempo(track, time, tempo)
-
-    for i, n_midi in enumerate(generated_sequence):
-        # DEBUGGING: Print the MIDI value being added
-        print(f"Adding MIDI note to file: {n_midi}")
-        midi_file.addNote(track, channel, n_midi, time + i * 0.5, 0.5, volume) # Fixed duration of 0.5 beats
+    return pattern
+
+def _decode_steps(model_handle, patterns, generation_length, temperature, decoding, cancel_event=None, rng=None, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0):
+    """
+    Decodes a batch of seed patterns together, one step at a time.
+    Yields (sampled_indices, log_probabilities) for every step, with one row per sequence.
+    Sampling for all rows is done in one vectorised call (see sampling.BatchSampler).
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise GenerationCancelled("Generation cancelled.")
+
+    patterns = np.asarray(patterns)
+    num_sequences = patterns.shape[0]
+
+    sampler = BatchSampler(model_handle.vocab_size, capacity=num_sequences)
+    for pattern in patterns:
+        sampler.add(temperature, top_k, top_p, repetition_penalty, max_consecutive, rng=rng, history=pattern)
+
+    if decoding == "incremental":
+        # Consume the seed once, then carry the LSTM states forward so every
+        # new note costs a single timestep (see incremental.py for how this
+        # differs from the sliding window after the first note).
+        decoder = IncrementalDecoder(get_step_model(model_handle))
+        logits = decoder.prime(patterns)
+        for i in range(generation_length):
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled.")
+            indices = sampler.sample(logits=logits)
+            yield indices, log_softmax(logits)
+            if i < generation_length - 1:
+                logits = decoder.step(indices)
+    else:
+        # Start generation from the seed pattern
+        current_patterns = patterns.copy() # Make a copy to modify
+
+        for i in range(generation_length):
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled("Generation cancelled.")
+            prediction = model_handle.model.predict(current_patterns, verbose=0)
+            log_probs = np.log(np.maximum(prediction, 1e-30))
+
+            indices = sampler.sample(logits=log_probs)
+
+            # Per-step details are only formatted when debug logging is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Step {i+1}: top 5 indices {np.argsort(prediction[0])[::-1][:5]}, "
+                             f"probabilities {np.sort(prediction[0])[::-1][:5]}, sampled index {indices[0]}")
+
+            yield indices, log_probs
+
+            current_patterns[:, :-1] = current_patterns[:, 1:]
+            current_patterns[:, -1] = indices
+
+def _prepare(genre, seed_notes_str, sequence_length, model_handle, decoding, engine="keras", tier="full"):
+    if decoding not in ("window", "incremental"):
+        raise ValueError(f"Unknown decoding mode '{decoding}'. Use 'window' or 'incremental'.")
 
+    if model_handle is None:
+        model_handle = load_model_handle(genre, engine=engine, tier=tier)
+
+    logger.debug(f"int_to_note mapping for {genre}: {model_handle.int_to_note}")
+
+    pattern = seed_to_pattern(seed_notes_str, model_handle.note_to_int, sequence_length)
+    return model_handle, pattern
+
+def generate_notes(genre, seed_notes_str, sequence_length=50, generation_length=500, temperature=1.0, model_handle=None, decoding="window", cancel_event=None, rng=None, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, engine="keras", tier="full"):
+    """
+    Generates a new music sequence based on genre and seed notes, yielding each MIDI note
+    as soon as it is sampled.
+    If a preloaded model_handle (see model_registry) is given, the model and note mapping
+    are taken from it instead of being loaded from disk.
+    decoding selects between re-feeding the full window for every note ("window") and
+    stateful single-step decoding ("incremental").
+    If cancel_event (a threading.Event) is set, generation stops with GenerationCancelled.
+    rng (a np.random.Generator) makes the generation reproducible; by default the global
+    NumPy RNG is used.
+    top_k and top_p restrict sampling to the k most likely notes / the smallest set of
+    notes holding top_p of the probability mass (0 and 1.0 disable them).
+    repetition_penalty (> 1 discourages notes played recently) and max_consecutive
+    (maximum repeats of the same note in a row, 0 for no limit) are applied on top.
+    engine selects how the model is loaded when no model_handle is given: "keras" (the
+    .h5 model) or "numpy" (weights exported by numpy_engine.py, no TensorFlow needed), and
+    tier which model: "full" or the distilled "fast" one (see modeling/distill.py).
+    """
+    model_handle, pattern = _prepare(genre, seed_notes_str, sequence_length, model_handle, decoding, engine, tier)
+    int_to_note = model_handle.int_to_note
+
+    for indices, _ in _decode_steps(model_handle, [pattern], generation_length, temperature, decoding, cancel_event, rng,
+                                    top_k, top_p, repetition_penalty, max_consecutive):
+        yield int_to_note[str(indices[0])] # Keys are strings from JSON
+
+def generate_candidates(genre, seed_notes_str, num_candidates=4, sequence_length=50, generation_length=500, temperature=1.0, model_handle=None, decoding="window", cancel_event=None, rng=None, rank=True, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, engine="keras", tier="full"):
+    """
+    Generates several alternative solos for the same seed, decoded together as one batch,
+    so N candidates cost about as much wall-clock time as one.
+    Takes the same options as generate_notes.
+
+    Returns:
+        list: One dict per candidate with "notes" (MIDI numbers) and "log_likelihood"
+        (sum of the model's log-probabilities of the sampled notes, before temperature
+        and the other sampling options).
+        With rank=True the list is sorted from most to least likely.
+    """
+    if num_candidates < 1:
+        raise ValueError("num_candidates must be at least 1.")
+
+    model_handle, pattern = _prepare(genre, seed_notes_str, sequence_length, model_handle, decoding, engine, tier)
+    int_to_note = model_handle.int_to_note
+
+    sampled = []
+    log_likelihoods = np.zeros(num_candidates)
+    rows = np.arange(num_candidates)
+    for indices, log_probs in _decode_steps(model_handle, [pattern] * num_candidates, generation_length, temperature, decoding, cancel_event, rng,
+                                            top_k, top_p, repetition_penalty, max_consecutive):
+        sampled.append(indices)
+        log_likelihoods += log_probs[rows, indices]
+
+    sampled = np.array(sampled).reshape(generation_length, num_candidates)
+    candidates = [
+        {"notes": [int_to_note[str(index)] for index in sampled[:, row]], "log_likelihood": float(log_likelihoods[row])}
+        for row in range(num_candidates)
+    ]
+    if rank:
+        candidates.sort(key=lambda candidate: candidate["log_likelihood"], reverse=True)
+    return candidates
+
+def generate_music(genre, seed_notes_str, output_path, sequence_length=50, generation_length=500, temperature=1.0, model_handle=None, decoding="window", cancel_event=None, rng=None, num_candidates=1, rank=True, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, engine="keras", tier="full"):
+    """
+    Generates a new music sequence based on genre and seed notes, and saves it as a MIDI file.
+    Takes the same options as generate_notes, which it collects to completion.
+    With num_candidates > 1, the candidates are decoded as one batch (see generate_candidates)
+    and written to output_path with a _1, _2, ... suffix; returns a list of
+    (path, log_likelihood) in candidate order.
+    """
+    if num_candidates > 1:
+        candidates = generate_candidates(
+            genre, seed_notes_str,
+            num_candidates=num_candidates,
+            sequence_length=sequence_length,
+            generation_length=generation_length,
+            temperature=temperature,
+            model_handle=model_handle,
+            decoding=decoding,
+            cancel_event=cancel_event,
+            rng=rng,
+            rank=rank,
+            top_k=top_k,
+            top_p=top_p,
+            repetition_penalty=repetition_penalty,
+            max_consecutive=max_consecutive,
+            engine=engine,
+            tier=tier
+        )
+        root, ext = os.path.splitext(output_path)
+        written = []
+        for i, candidate in enumerate(candidates):
+            candidate_path = f"{root}_{i + 1}{ext}"
+            write_midi(candidate["notes"], candidate_path)
+            written.append((candidate_path, candidate["log_likelihood"]))
+        return written
+
+    generated_sequence = list(generate_notes(
+        genre, seed_notes_str,
+        sequence_length=sequence_length,
+        generation_length=generation_length,
+        temperature=temperature,
+        model_handle=model_handle,
+        decoding=decoding,
+        cancel_event=cancel_event,
+        rng=rng,
+        top_k=top_k,
+        top_p=top_p,
+        repetition_penalty=repetition_penalty,
+        max_consecutive=max_consecutive,
+        engine=engine,
+        tier=tier
+    ))
+
+    logger.debug(f"First 20 generated MIDI notes: {generated_sequence[:20]}")
+
+    write_midi(generated_sequence, output_path)
+
+def write_midi(generated_sequence, output_path):
+    """Writes a list of MIDI note numbers to a single-track MIDI file."""
     with open(output_path, "wb") as f:
-        midi_file.writeFile(f)
+        f.write(midi_bytes(generated_sequence))
+
+def midi_bytes(generated_sequence):
+    """Encodes a list of MIDI note numbers as the bytes of a single-track MIDI file, without touching disk."""
+    # Fixed duration of 0.5 beats per note at 120 BPM
+    return encode_midi(generated_sequence, tempo=120, duration=0.5, velocity=100)
+
+def midi_notes(data):
+    """Inverse of midi_bytes: the MIDI note numbers of a MIDI file held in memory."""
+    mid = mido.MidiFile(file=io.BytesIO(data))
+    return [msg.note for track in mid.tracks for msg in track if msg.type == 'note_on' and msg.velocity > 0]
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+
     # Example usage for testing
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
     output_dir = os.path.join(project_root, "output")
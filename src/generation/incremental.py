@@ -0,0 +1,168 @@
+"""
+Stateful incremental decoding for the create_model LSTM generator.
+
+The sliding-window path in generate_music re-feeds the last sequence_length-1 notes
+through the model for every generated note, always starting from a zero LSTM state.
+Here the seed is consumed once and the hidden/cell states are carried forward, so
+each new note costs exactly one timestep.
+
+Where the two paths agree and differ:
+  * The first generated note is drawn from exactly the same distribution (the seed
+    window is fed from a zero state in both cases), so with the same RNG seed the
+    first sampled note is identical.
+  * From the second note on, the sliding window forgets everything older than
+    sequence_length-1 notes, while the stateful path conditions on the whole history
+    (seed plus every generated note). The model was trained on windows of
+    sequence_length-1 notes, so the stateful path runs it past the context length it
+    has seen during training; the distributions, and therefore the sampled notes,
+    diverge from that point even with the same RNG seed.
+
+The step model returns logits rather than probabilities: the output layer's softmax
+is dropped, since the sampler (sampling.BatchSampler) works in log space anyway and
+would otherwise take the log of the softmax again.
+"""
+import numpy as np
+
+def _find_layers(model):
+    """Returns the (embedding, lstm_1, lstm_2, dense) layers of a create_model network."""
+    layers_by_type = {"Embedding": [], "LSTM": [], "Dense": []}
+    for layer in model.layers:
+        layer_type = type(layer).__name__
+        if layer_type in layers_by_type:
+            layers_by_type[layer_type].append(layer)
+    if len(layers_by_type["Embedding"]) != 1 or len(layers_by_type["LSTM"]) != 2 or len(layers_by_type["Dense"]) != 1:
+        raise ValueError("Model does not match the create_model architecture (Embedding, LSTM, LSTM, Dense).")
+    embedding = layers_by_type["Embedding"][0]
+    lstm_1, lstm_2 = layers_by_type["LSTM"]
+    dense = layers_by_type["Dense"][0]
+    return embedding, lstm_1, lstm_2, dense
+
+def build_step_model(model):
+    """
+    Builds an inference model that carries the LSTM hidden/cell states explicitly.
+
+    The returned model has the same weights as the trained create_model network
+    (Dropout is a no-op at inference time and is left out). It takes a batch of
+    token sequences of any length plus the four LSTM states, and returns the next-note
+    logits (the output layer without its softmax) for the last timestep together with the updated states. Feeding a
+    whole seed primes the states in one call; feeding one token per call then costs
+    exactly one timestep per generated note.
+
+    Args:
+        model: A trained model built by modeling.create_model.
+
+    Returns:
+        A Keras model mapping [tokens, h1, c1, h2, c2] to [logits, h1, c1, h2, c2].
+    """
+    from tensorflow.keras import Input, Model
+    from tensorflow.keras.layers import LSTM, Dense, Embedding
+
+    embedding, lstm_1, lstm_2, dense = _find_layers(model)
+    vocab_size = embedding.input_dim
+    units_1 = lstm_1.units
+    units_2 = lstm_2.units
+
+    tokens = Input(shape=(None,), dtype='int32')
+    h1 = Input(shape=(units_1,))
+    c1 = Input(shape=(units_1,))
+    h2 = Input(shape=(units_2,))
+    c2 = Input(shape=(units_2,))
+
+    step_embedding = Embedding(vocab_size, embedding.output_dim)
+    step_lstm_1 = LSTM(units_1, return_sequences=True, return_state=True)
+    step_lstm_2 = LSTM(units_2, return_state=True)
+    step_dense = Dense(dense.units) # Linear: same weights, softmax left to the sampler
+
+    x = step_embedding(tokens)
+    x, h1_out, c1_out = step_lstm_1(x, initial_state=[h1, c1])
+    x, h2_out, c2_out = step_lstm_2(x, initial_state=[h2, c2])
+    logits = step_dense(x)
+    step_model = Model([tokens, h1, c1, h2, c2], [logits, h1_out, c1_out, h2_out, c2_out])
+
+    step_embedding.set_weights(embedding.get_weights())
+    step_lstm_1.set_weights(lstm_1.get_weights())
+    step_lstm_2.set_weights(lstm_2.get_weights())
+    step_dense.set_weights(dense.get_weights())
+    return step_model
+
+def get_step_model(model_handle):
+    """
+    Returns the step model of a ModelHandle, building and caching it on first use.
+    Concurrent callers wait for a single build; the weights a Keras step model copies
+    are added to the handle's size, and the registry is told so it can re-apply its budget.
+    """
+    if model_handle.step_model is not None:
+        return model_handle.step_model
+    from src.generation.numpy_engine import NumpyLSTM
+
+    built = False
+    with model_handle.step_lock:
+        if model_handle.step_model is None:
+            if isinstance(model_handle.model, NumpyLSTM):
+                # The NumPy engine already takes and returns the LSTM states explicitly
+                step_model = model_handle.model
+            else:
+                step_model = build_step_model(model_handle.model)
+                model_handle.step_model_bytes = sum(w.nbytes for w in step_model.get_weights())
+            model_handle.step_model = step_model
+            built = True
+    if built and model_handle.step_model_bytes and model_handle.on_resize is not None:
+        model_handle.on_resize(model_handle)
+    return model_handle.step_model
+
+class IncrementalDecoder:
+    """
+    Decodes a batch of sequences one timestep at a time, carrying the LSTM states forward.
+
+    Usage:
+        decoder = IncrementalDecoder(step_model)
+        logits = decoder.prime(seed_patterns)   # (batch, seed_length) -> (batch, vocab)
+        logits = decoder.step(next_tokens)      # (batch,) -> (batch, vocab)
+    """
+
+    def __init__(self, step_model):
+        self.step_model = step_model
+        if hasattr(step_model, "state_sizes"):
+            self.state_sizes = step_model.state_sizes
+        else:
+            self.state_sizes = [int(t.shape[-1]) for t in step_model.inputs[1:]]
+        self.states = None
+
+    def reset(self, batch_size):
+        self.states = [np.zeros((batch_size, size), dtype=np.float32) for size in self.state_sizes]
+
+    def prime(self, patterns):
+        """Consumes the seed patterns from a zero state and returns the first next-note logits."""
+        patterns = np.asarray(patterns, dtype=np.int32)
+        if patterns.ndim == 1:
+            patterns = patterns[np.newaxis, :]
+        self.reset(patterns.shape[0])
+        return self._run(patterns)
+
+    def step(self, tokens):
+        """Feeds one token per sequence and returns the next-note logits."""
+        tokens = np.asarray(tokens, dtype=np.int32).reshape(-1, 1)
+        return self._run(tokens)
+
+    @property
+    def batch_size(self):
+        return 0 if self.states is None else self.states[0].shape[0]
+
+    def keep(self, mask):
+        """Drops the sequences whose entry in the boolean mask is False."""
+        self.states = [state[mask] for state in self.states]
+
+    def extend(self, other):
+        """Appends the sequences (and states) of another decoder to this batch."""
+        if self.states is None or self.batch_size == 0:
+            self.states = list(other.states)
+        else:
+            self.states = [np.concatenate([mine, theirs]) for mine, theirs in zip(self.states, other.states)]
+
+    def _run(self, tokens):
+        # predict_on_batch reuses the model's compiled predict function; calling
+        # the model eagerly is an order of magnitude slower per step.
+        outputs = self.step_model.predict_on_batch([tokens] + self.states)
+        logits = np.asarray(outputs[0])
+        self.states = [np.asarray(state) for state in outputs[1:]]
+        return logits
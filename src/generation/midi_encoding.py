@@ -0,0 +1,57 @@
+import struct
+import numpy as np
+
+TICKS_PER_QUARTER = 960
+
+def _variable_length(value):
+    """Encodes an integer as a MIDI variable-length quantity."""
+    encoded = [value & 0x7F]
+    value >>= 7
+    while value:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(encoded))
+
+def _chunk(chunk_type, data):
+    return chunk_type + struct.pack(">I", len(data)) + data
+
+def encode_midi(notes, tempo=120, duration=0.5, velocity=100, channel=0, track_name="Generated Solo"):
+    """
+    Encodes a sequence of MIDI note numbers as the bytes of a Standard MIDI File.
+
+    Notes are played back to back, each lasting `duration` beats. The layout is the
+    one midiutil.MIDIFile(1) produces for the same notes (format 1, a tempo track and
+    a note track, 960 ticks per quarter note), but the note track is assembled with
+    NumPy from a fixed per-note event template instead of note-by-note Python calls.
+
+    Args:
+        notes (list or np.ndarray): MIDI note numbers (0-127).
+
+    Returns:
+        bytes: The complete MIDI file.
+    """
+    notes = np.asarray(notes, dtype=np.uint8).reshape(-1)
+
+    header = _chunk(b"MThd", struct.pack(">HHH", 1, 2, TICKS_PER_QUARTER))
+
+    microseconds_per_quarter = int(round(60000000 / tempo))
+    tempo_track = _chunk(b"MTrk", b"\x00\xff\x51\x03" + microseconds_per_quarter.to_bytes(3, "big") + b"\x00\xff\x2f\x00")
+
+    # Every note is: delta 0, note on; delta `duration`, note off
+    delta_off = _variable_length(int(round(duration * TICKS_PER_QUARTER)))
+    template = np.frombuffer(
+        b"\x00" + bytes([0x90 | channel, 0, velocity]) + delta_off + bytes([0x80 | channel, 0, velocity]),
+        dtype=np.uint8
+    )
+    note_on_column = 2
+    note_off_column = note_on_column + 2 + len(delta_off) + 1
+    events = np.tile(template, (len(notes), 1))
+    events[:, note_on_column] = notes
+    events[:, note_off_column] = notes
+
+    name = track_name.encode("latin-1")
+    note_track = _chunk(
+        b"MTrk",
+        b"\x00\xff\x03" + _variable_length(len(name)) + name + events.tobytes() + b"\x00\xff\x2f\x00"
+    )
+    return header + tempo_track + note_track
@@ -0,0 +1,281 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+DEFAULT_MODELS_DIR = os.path.join(project_root, "models")
+
+logger = logging.getLogger(__name__)
+
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS", "All"]
+# "full": the trained model; "fast": the small student distilled from it (see modeling/distill.py)
+TIERS = ("full", "fast")
+
+def model_name(genre, tier="full"):
+    """File name stem of a genre's model of the given tier."""
+    if tier not in TIERS:
+        raise ValueError(f"Unknown model tier '{tier}'. Use one of {', '.join(TIERS)}.")
+    return genre.lower() if tier == "full" else f"{genre.lower()}_{tier}"
+
+def model_paths(genre, models_dir=DEFAULT_MODELS_DIR, tier="full"):
+    """
+    Returns the (model, int_to_note) file paths for a genre and tier. Every tier has
+    its own mapping, written together with its model, so retraining one tier never
+    changes the vocabulary another tier was trained on.
+    """
+    name = model_name(genre, tier)
+    model_path = os.path.join(models_dir, f"guitar_solo_generator_{name}.h5")
+    int_to_note_path = os.path.join(models_dir, f"int_to_note_{name}.json")
+    return model_path, int_to_note_path
+
+def _file_signature(path):
+    """Returns a cheap signature (mtime, size) used to detect changes on disk."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class ModelHandle:
+    """A loaded model together with its vocabulary, ready to be passed to generate_music."""
+
+    def __init__(self, genre, model, int_to_note, model_path, int_to_note_path, signature, tier="full"):
+        self.genre = genre
+        self.tier = tier
+        self.model = model
+        self.int_to_note = int_to_note
+        self.note_to_int = {int(note_val): int(index) for index, note_val in int_to_note.items()}
+        self.model_path = model_path
+        self.int_to_note_path = int_to_note_path
+        self.signature = signature
+        self.model_bytes = sum(w.nbytes for w in model.get_weights())
+        # Built lazily by incremental.get_step_model, under step_lock
+        self.step_model = None
+        self.step_model_bytes = 0
+        self.step_lock = threading.Lock()
+        # Called with the handle when its size changes (set by ModelRegistry)
+        self.on_resize = None
+        self.warmed_up = False
+        self._content_hash = None
+
+    @property
+    def vocab_size(self):
+        return len(self.int_to_note)
+
+    @property
+    def content_hash(self):
+        """SHA-256 of the model and note mapping files, computed on first use."""
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            if self.model_path is not None:
+                for path in (self.model_path, self.int_to_note_path):
+                    with open(path, 'rb') as f:
+                        for block in iter(lambda: f.read(1 << 20), b''):
+                            digest.update(block)
+            else:
+                # Models built in memory (e.g. benchmarks) have no files to hash
+                for weights in self.model.get_weights():
+                    digest.update(weights.tobytes())
+                digest.update(json.dumps(self.int_to_note, sort_keys=True).encode())
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    @property
+    def nbytes(self):
+        # A Keras step model holds its own copy of the weights
+        return self.model_bytes + self.step_model_bytes
+
+ENGINES = ("keras", "numpy")
+
+def load_model_handle(genre, models_dir=DEFAULT_MODELS_DIR, engine="keras", tier="full"):
+    """
+    Loads the model and note mapping of a genre (and model tier) from disk.
+    engine="numpy" loads the weights exported by numpy_engine.py instead of the .h5
+    model, and doesn't import TensorFlow.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}'. Use 'keras' or 'numpy'.")
+
+    model_path, int_to_note_path = model_paths(genre, models_dir, tier)
+    if engine == "numpy":
+        from src.generation.numpy_engine import weights_path
+        model_path = weights_path(genre, models_dir, tier)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"NumPy weights not found for genre '{genre}': {model_path}. "
+                                    f"Export them with src/generation/numpy_engine.py.")
+    elif not os.path.exists(model_path):
+        if tier != "full":
+            raise FileNotFoundError(f"No {tier} model for genre '{genre}': {model_path}. "
+                                    f"Create it with src/modeling/distill.py.")
+        raise FileNotFoundError(f"Model not found for genre '{genre}': {model_path}")
+    if not os.path.exists(int_to_note_path):
+        if tier != "full":
+            raise FileNotFoundError(f"No {tier} note mapping for genre '{genre}': {int_to_note_path}. "
+                                    f"Create it with src/modeling/distill.py.")
+        raise FileNotFoundError(f"Note mapping not found for genre '{genre}': {int_to_note_path}")
+
+    signature = (_file_signature(model_path), _file_signature(int_to_note_path))
+    if engine == "numpy":
+        from src.generation.numpy_engine import NumpyLSTM
+        model = NumpyLSTM.load(model_path)
+    else:
+        from tensorflow.keras.models import load_model
+        # The optimizer state is not needed for inference, so skip compiling
+        model = load_model(model_path, compile=False)
+    with open(int_to_note_path, 'r') as f:
+        int_to_note = json.load(f)
+    return ModelHandle(genre, model, int_to_note, model_path, int_to_note_path, signature, tier)
+
+def warm_up_handle(handle, sequence_length=50, decoding="window"):
+    """Runs a dummy prediction so the first real request doesn't pay the graph-tracing cost."""
+    dummy_input = np.zeros((1, sequence_length - 1), dtype=np.int32)
+    if decoding == "incremental":
+        from src.generation.incremental import IncrementalDecoder, get_step_model
+        decoder = IncrementalDecoder(get_step_model(handle))
+        decoder.prime(dummy_input)
+        decoder.step([0])
+    else:
+        handle.model.predict(dummy_input, verbose=0)
+    handle.warmed_up = True
+
+class ModelRegistry:
+    """
+    Process-wide cache of loaded generator models, keyed by genre and model tier.
+
+    Models are loaded once and kept resident until the memory budget is exceeded,
+    at which point the least recently used ones are evicted. A model is reloaded
+    when its .h5 or int_to_note file changes on disk.
+
+    Args:
+        models_dir (str): Directory containing the .h5 models and note mappings.
+        max_bytes (int): Memory budget for resident model weights. None means unbounded.
+        warm_up (bool): Whether to warm up models as soon as they are (re)loaded.
+        decoding (str): Decoding mode to warm up, "window" or "incremental".
+        engine (str): Inference engine the models are loaded for, "keras" or "numpy".
+    """
+
+    def __init__(self, models_dir=DEFAULT_MODELS_DIR, max_bytes=None, warm_up=False, sequence_length=50, decoding="window", engine="keras"):
+        self.models_dir = models_dir
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.warm_up = warm_up
+        self.sequence_length = sequence_length
+        self.decoding = decoding
+        self._handles = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def get(self, genre, tier="full"):
+        """Returns the ModelHandle for a genre (and model tier), loading or reloading it if needed."""
+        key = model_name(genre, tier)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Loading is serialised per genre, so concurrent requests for a cold
+        # genre wait for a single load instead of each deserialising the model.
+        with load_lock:
+            with self._lock:
+                handle = self._handles.get(key)
+            if handle is not None:
+                if not self._is_stale(handle):
+                    with self._lock:
+                        if key in self._handles:
+                            self._handles.move_to_end(key)
+                        self.hits += 1
+                    return handle
+                logger.info(f"Model files for genre '{genre}' changed on disk. Reloading.")
+                with self._lock:
+                    self.reloads += 1
+            else:
+                with self._lock:
+                    self.misses += 1
+
+            handle = load_model_handle(genre, self.models_dir, self.engine, tier)
+            handle.on_resize = self._handle_resized
+            if self.warm_up:
+                warm_up_handle(handle, self.sequence_length, self.decoding)
+
+            with self._lock:
+                self._handles[key] = handle
+                self._handles.move_to_end(key)
+                self._evict_over_budget(keep=key)
+            return handle
+
+    def preload(self, genres=GENRES, warm_up=True):
+        """Loads (and optionally warms up) several genres, skipping those without a model."""
+        for genre in genres:
+            try:
+                handle = self.get(genre)
+            except FileNotFoundError as e:
+                logger.warning(f"Skipping preload of genre '{genre}': {e}")
+                continue
+            if warm_up and not handle.warmed_up:
+                warm_up_handle(handle, self.sequence_length, self.decoding)
+
+    def evict(self, genre, tier="full"):
+        """Drops a genre (model tier) from the cache."""
+        with self._lock:
+            self._handles.pop(model_name(genre, tier), None)
+
+    def clear(self):
+        """Drops every resident model."""
+        with self._lock:
+            self._handles.clear()
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(handle.nbytes for handle in self._handles.values())
+
+    def stats(self):
+        """Returns a summary of the resident models and cache counters."""
+        with self._lock:
+            return {
+                "resident": [
+                    {"genre": handle.genre, "tier": handle.tier, "bytes": handle.nbytes, "vocab_size": handle.vocab_size, "warmed_up": handle.warmed_up}
+                    for handle in self._handles.values()
+                ],
+                "resident_bytes": sum(handle.nbytes for handle in self._handles.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+            }
+
+    def _is_stale(self, handle):
+        try:
+            signature = (_file_signature(handle.model_path), _file_signature(handle.int_to_note_path))
+        except FileNotFoundError:
+            # Keep serving the resident copy if the files were removed mid-flight
+            return False
+        return signature != handle.signature
+
+    def _handle_resized(self, handle):
+        # A resident model grew (e.g. its step model was built): re-apply the budget
+        with self._lock:
+            key = model_name(handle.genre, handle.tier)
+            if self._handles.get(key) is handle:
+                self._evict_over_budget(keep=key)
+
+    def _evict_over_budget(self, keep):
+        # Must be called with self._lock held
+        if self.max_bytes is None:
+            return
+        total = sum(handle.nbytes for handle in self._handles.values())
+        for key in list(self._handles.keys()):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            evicted = self._handles.pop(key)
+            total -= evicted.nbytes
+            self.evictions += 1
+            logger.info(f"Evicted model for genre '{evicted.genre}' from the cache ({evicted.nbytes} bytes).")
+
+# Default process-wide registry
+registry = ModelRegistry()
@@ -0,0 +1,249 @@
+"""
+NumPy-only inference engine for the create_model LSTM generator.
+
+Serving only needs an Embedding, two LSTMs and a Dense layer, so the weights are
+exported once from the trained .h5 files into a compact .npz archive and run with
+plain NumPy (matrix products go through the BLAS NumPy is linked against). The
+backend can then serve without importing TensorFlow at all.
+
+Exporting (needs TensorFlow, only once per trained model):
+    python src/generation/numpy_engine.py --genres Rock Jazz
+    python src/generation/numpy_engine.py --genres Rock --tier fast --dtype int8
+
+Weights can be stored as float32, float16 or int8 (symmetric, one scale per output
+column); they are always computed with in float32 once loaded.
+
+NumpyLSTM mirrors the two Keras interfaces the generation code uses:
+  * predict(patterns) -> next-note probabilities, like the trained model;
+  * predict_on_batch([tokens, h1, c1, h2, c2]) -> [logits, h1, c1, h2, c2], like the
+    step model of incremental.py, so IncrementalDecoder works unchanged.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.generation.sampling import log_softmax
+
+WEIGHT_NAMES = (
+    "embedding",
+    "lstm_1_kernel", "lstm_1_recurrent_kernel", "lstm_1_bias",
+    "lstm_2_kernel", "lstm_2_recurrent_kernel", "lstm_2_bias",
+    "dense_kernel", "dense_bias",
+)
+
+def weights_path(genre, models_dir, tier="full"):
+    """Returns the path of the exported NumPy weights of a genre (and model tier, see model_registry.TIERS)."""
+    from src.generation.model_registry import model_name
+    return os.path.join(models_dir, f"guitar_solo_generator_{model_name(genre, tier)}.npz")
+
+def quantize_int8(w):
+    """Symmetric int8 quantization with one scale per output column. Returns (int8 array, float32 scales)."""
+    w = np.asarray(w, dtype=np.float32)
+    scale = np.max(np.abs(w), axis=0) / 127
+    scale[scale == 0] = 1
+    return np.clip(np.round(w / scale), -127, 127).astype(np.int8), scale.astype(np.float32)
+
+def export_weights(model, output_path, dtype=np.float32):
+    """
+    Writes the weights of a create_model network to an .npz archive.
+
+    Args:
+        model: A Keras model built by modeling.create_model.
+        output_path (str): Destination .npz file.
+        dtype: Storage dtype; float16 halves the file size, int8 quarters it (matrices
+            only, biases stay float32); weights are converted back to float32 when loaded.
+    """
+    from src.generation.incremental import _find_layers
+
+    weights = []
+    for layer in _find_layers(model):
+        weights.extend(layer.get_weights())
+    arrays = {}
+    for name, w in zip(WEIGHT_NAMES, weights):
+        if np.dtype(dtype) == np.int8 and np.ndim(w) == 2:
+            arrays[name], arrays[f"{name}_scale"] = quantize_int8(w)
+        elif np.dtype(dtype) == np.int8:
+            arrays[name] = np.asarray(w, dtype=np.float32)
+        else:
+            arrays[name] = np.asarray(w, dtype=dtype)
+
+    tmp_path = output_path + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def _sigmoid(x):
+    # In place; tanh form avoids overflow warnings for large negative inputs
+    np.multiply(x, 0.5, out=x)
+    np.tanh(x, out=x)
+    np.multiply(x, 0.5, out=x)
+    np.add(x, 0.5, out=x)
+    return x
+
+class NumpyLSTM:
+    """
+    Embedding -> LSTM -> LSTM -> Dense forward pass in NumPy (float32).
+
+    The first LSTM's input projection only depends on the token, so it is folded
+    into a (vocab, 4 * units) lookup table at load time: each timestep of layer 1
+    costs one row gather plus the recurrent matrix product. The model holds no
+    state of its own, so one instance can serve concurrent requests.
+
+    Args:
+        weights (dict): Arrays keyed by WEIGHT_NAMES (see export_weights).
+    """
+
+    def __init__(self, weights):
+        w = {name: np.asarray(weights[name], dtype=np.float32) for name in WEIGHT_NAMES}
+        self._weights = [w[name] for name in WEIGHT_NAMES]
+        self.vocab_size = w["dense_kernel"].shape[1]
+        self.units_1 = w["lstm_1_recurrent_kernel"].shape[0]
+        self.units_2 = w["lstm_2_recurrent_kernel"].shape[0]
+        self.state_sizes = [self.units_1, self.units_1, self.units_2, self.units_2]
+
+        self._input_table_1 = w["embedding"] @ w["lstm_1_kernel"] + w["lstm_1_bias"]
+        self._recurrent_1 = w["lstm_1_recurrent_kernel"]
+        self._kernel_2 = w["lstm_2_kernel"]
+        self._bias_2 = w["lstm_2_bias"]
+        self._recurrent_2 = w["lstm_2_recurrent_kernel"]
+        self._dense_kernel = w["dense_kernel"]
+        self._dense_bias = w["dense_bias"]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as archive:
+            weights = {}
+            for name in WEIGHT_NAMES:
+                weights[name] = archive[name]
+                if f"{name}_scale" in archive.files:
+                    weights[name] = weights[name].astype(np.float32) * archive[f"{name}_scale"]
+            return cls(weights)
+
+    def get_weights(self):
+        """Weights in the order of the Keras model's get_weights(), plus the derived layer 1 input table."""
+        return list(self._weights) + [self._input_table_1]
+
+    @staticmethod
+    def _cell(z, c, units):
+        # Keras gate order: input, forget, cell candidate, output
+        _sigmoid(z[:, :2 * units])
+        _sigmoid(z[:, 3 * units:])
+        np.tanh(z[:, 2 * units:3 * units], out=z[:, 2 * units:3 * units])
+        c = z[:, units:2 * units] * c
+        c += z[:, :units] * z[:, 2 * units:3 * units]
+        h = np.tanh(c)
+        h *= z[:, 3 * units:]
+        return h, c
+
+    def predict_on_batch(self, inputs):
+        """
+        Runs tokens of shape (batch, timesteps) from the given states.
+        Returns [logits of the last timestep, h1, c1, h2, c2].
+        """
+        tokens, h1, c1, h2, c2 = inputs
+        tokens = np.asarray(tokens, dtype=np.int64)
+        if tokens.ndim == 1:
+            tokens = tokens[:, np.newaxis]
+        batch_size, timesteps = tokens.shape
+        h1 = np.asarray(h1, dtype=np.float32)
+        c1 = np.asarray(c1, dtype=np.float32)
+        h2 = np.asarray(h2, dtype=np.float32)
+        c2 = np.asarray(c2, dtype=np.float32)
+
+        # Layer 1 over the whole sequence, keeping every hidden state
+        hidden_1 = np.empty((timesteps, batch_size, self.units_1), dtype=np.float32)
+        for t in range(timesteps):
+            z = self._input_table_1[tokens[:, t]]
+            z += h1 @ self._recurrent_1
+            h1, c1 = self._cell(z, c1, self.units_1)
+            hidden_1[t] = h1
+
+        # Layer 2's input projection for all timesteps in one matrix product
+        projected_2 = hidden_1.reshape(timesteps * batch_size, self.units_1) @ self._kernel_2
+        projected_2 += self._bias_2
+        projected_2 = projected_2.reshape(timesteps, batch_size, 4 * self.units_2)
+        for t in range(timesteps):
+            z = projected_2[t]
+            z += h2 @ self._recurrent_2
+            h2, c2 = self._cell(z, c2, self.units_2)
+
+        logits = h2 @ self._dense_kernel
+        logits += self._dense_bias
+        return [logits, h1, c1, h2, c2]
+
+    def predict(self, patterns, verbose=0):
+        """Next-note probabilities for (batch, timesteps) patterns fed from a zero state."""
+        patterns = np.asarray(patterns)
+        batch_size = patterns.shape[0]
+        states = [np.zeros((batch_size, size), dtype=np.float32) for size in self.state_sizes]
+        logits = self.predict_on_batch([patterns] + states)[0]
+        return np.exp(log_softmax(logits)).astype(np.float32)
+
+def check_parity(keras_model, numpy_model, sequence_length=50, batch_size=4, steps=8, seed=0):
+    """
+    Compares both engines on random patterns. Returns the maximum absolute difference
+    of the window-path probabilities and of the incremental-path logits over `steps` steps.
+    """
+    from src.generation.incremental import IncrementalDecoder, build_step_model
+
+    rng = np.random.default_rng(seed)
+    patterns = rng.integers(0, numpy_model.vocab_size, size=(batch_size, sequence_length - 1))
+
+    window_diff = float(np.max(np.abs(keras_model.predict(patterns, verbose=0) - numpy_model.predict(patterns))))
+
+    keras_decoder = IncrementalDecoder(build_step_model(keras_model))
+    numpy_decoder = IncrementalDecoder(numpy_model)
+    keras_logits = keras_decoder.prime(patterns)
+    numpy_logits = numpy_decoder.prime(patterns)
+    step_diff = float(np.max(np.abs(keras_logits - numpy_logits)))
+    for _ in range(steps):
+        tokens = rng.integers(0, numpy_model.vocab_size, size=batch_size)
+        keras_logits = keras_decoder.step(tokens)
+        numpy_logits = numpy_decoder.step(tokens)
+        step_diff = max(step_diff, float(np.max(np.abs(keras_logits - numpy_logits))))
+    return {"window_max_abs_diff": window_diff, "step_max_abs_diff": step_diff}
+
+def export_genre(genre, models_dir, dtype=np.float32, check=True, tier="full"):
+    """Exports the .h5 model of a genre (and tier) next to it. Returns (path, parity or None)."""
+    from tensorflow.keras.models import load_model
+    from src.generation.model_registry import model_paths
+
+    model_path, _ = model_paths(genre, models_dir, tier)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found for genre '{genre}': {model_path}")
+    model = load_model(model_path, compile=False)
+    path = export_weights(model, weights_path(genre, models_dir, tier), dtype=dtype)
+    parity = check_parity(model, NumpyLSTM.load(path)) if check else None
+    return path, parity
+
+if __name__ == '__main__':
+    from src.generation.model_registry import DEFAULT_MODELS_DIR, GENRES, TIERS
+
+    parser = argparse.ArgumentParser(description="Export trained .h5 models for the NumPy inference engine.")
+    parser.add_argument("--genres", nargs="+", default=GENRES)
+    parser.add_argument("--models-dir", default=DEFAULT_MODELS_DIR)
+    parser.add_argument("--dtype", choices=["float32", "float16", "int8"], default="float32")
+    parser.add_argument("--tier", choices=TIERS, default="full")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Maximum parity difference (float32 only).")
+    parser.add_argument("--no-check", action="store_true", help="Skip the parity check against Keras.")
+    args = parser.parse_args()
+
+    failed = False
+    for genre in args.genres:
+        try:
+            path, parity = export_genre(genre, args.models_dir, dtype=np.dtype(args.dtype), check=not args.no_check, tier=args.tier)
+        except FileNotFoundError as e:
+            print(f"Skipping {genre}: {e}")
+            continue
+        print(f"Exported {genre} to {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        if parity is not None:
+            print(f"  parity: window {parity['window_max_abs_diff']:.2e}, step {parity['step_max_abs_diff']:.2e}")
+            if args.dtype == "float32" and max(parity.values()) > args.tolerance:
+                print(f"  parity check FAILED (tolerance {args.tolerance:.0e})")
+                failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,105 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class OutputStore:
+    """
+    On-disk store for generated MIDI files with a retention policy.
+
+    Files are written atomically (temporary file + rename). A sweep removes .mid files
+    older than max_age, then the oldest ones until at most max_files files and
+    max_bytes bytes are left. Sweeps run on a background thread (start_sweeper) and,
+    cheaply, whenever a save pushes the file count over max_files.
+
+    Args:
+        directory (str): Where the MIDI files are stored.
+        max_files (int): Maximum number of files kept. None means unbounded.
+        max_bytes (int): Maximum total size of the files kept. None means unbounded.
+        max_age (float): Maximum age of a file in seconds. None means unbounded.
+    """
+
+    def __init__(self, directory, max_files=None, max_bytes=None, max_age=None):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        self._saved_since_sweep = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, filename, data):
+        """Writes data to directory/filename and returns the path."""
+        path = os.path.join(self.directory, filename)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        logger.debug(f"Saved {len(data)} bytes to {path}")
+
+        with self._lock:
+            self._saved_since_sweep += 1
+            over_count = self.max_files is not None and self._saved_since_sweep >= max(self.max_files // 10, 1)
+        if over_count:
+            self.sweep()
+        return path
+
+    def sweep(self):
+        """Applies the retention policy. Returns the number of files removed."""
+        with self._lock:
+            self._saved_since_sweep = 0
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and entry.name.endswith(".mid"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, entry.path))
+            files.sort()  # Oldest first
+
+            to_remove = []
+            if self.max_age is not None:
+                cutoff = time.time() - self.max_age
+                while files and files[0][0] < cutoff:
+                    to_remove.append(files.pop(0))
+
+            total_bytes = sum(size for _, size, _ in files)
+            while files and ((self.max_files is not None and len(files) > self.max_files)
+                             or (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                removed = files.pop(0)
+                total_bytes -= removed[1]
+                to_remove.append(removed)
+
+            for _, _, path in to_remove:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if to_remove:
+            logger.info(f"Output sweep removed {len(to_remove)} file(s) from {self.directory}")
+        return len(to_remove)
+
+    def start_sweeper(self, interval=60):
+        """Starts a daemon thread that sweeps every `interval` seconds."""
+        if self._sweeper is not None:
+            return
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except Exception as e:
+                    logger.error(f"Output sweep failed: {e}")
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=run, name="output-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        self._sweeper = None
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+def result_cache_key(model_hash, genre, seed_pattern, temperature, generation_length, rng_seed, decoding, num_candidates=1, rank=True,
+                     top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0):
+    """Content address of a deterministic generation request."""
+    payload = json.dumps({
+        "model": model_hash,
+        "genre": genre.lower(),
+        "seed": [int(index) for index in seed_pattern],
+        "temperature": float(temperature),
+        "length": int(generation_length),
+        "rng_seed": int(rng_seed),
+        "decoding": decoding,
+        "num_candidates": int(num_candidates),
+        "rank": bool(rank),
+        "top_k": int(top_k),
+        "top_p": float(top_p),
+        "repetition_penalty": float(repetition_penalty),
+        "max_consecutive": int(max_consecutive),
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResultCache:
+    """
+    Content-addressed cache of generated files (MIDI, or zip for multi-candidate
+    requests) for seeded (deterministic) requests.
+
+    Results live in an in-memory LRU and, optionally, in an on-disk tier (one .bin file
+    per key, holding the MIDI or zip bytes as they were cached) that survives restarts. Identical requests that arrive while the first one
+    is still being computed are coalesced onto the same in-flight future.
+
+    Args:
+        max_entries (int): Number of results kept in memory.
+        disk_dir (str): Directory of the on-disk tier. None disables it.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._waiters = {}
+        self._cancels = {}
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._compute_seconds = 0.0
+        self._computed = 0
+
+    def get_or_submit(self, key, submit):
+        """
+        Returns (future, source) for a key, where source is "memory", "disk", "coalesced"
+        or "computed". submit() is only called on a miss; it must start the computation
+        and return (future, cancel), where future is a concurrent.futures.Future resolving
+        to the MIDI bytes and cancel() stops the computation.
+        """
+        with self._lock:
+            data, cost = self._memory.get(key, (None, 0.0))
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.saved_seconds += cost
+                return self._resolved(data), "memory"
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._waiters[key] += 1
+                self.coalesced += 1
+                self.saved_seconds += self._average_cost()
+                return inflight, "coalesced"
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self.saved_seconds += self._average_cost()
+                self._store_memory(key, data, self._average_cost())
+            return self._resolved(data), "disk"
+
+        with self._lock:
+            # Another thread may have started the same computation meanwhile
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                self._waiters[key] += 1
+                self.coalesced += 1
+                self.saved_seconds += self._average_cost()
+                return inflight, "coalesced"
+            future, cancel = submit()
+            self.misses += 1
+            self._inflight[key] = future
+            self._waiters[key] = 1
+            self._cancels[key] = cancel
+        started_at = time.perf_counter()
+        future.add_done_callback(lambda f: self._on_done(key, f, time.perf_counter() - started_at))
+        return future, "computed"
+
+    def lookup(self, key):
+        """
+        Returns the cached result of a key (memory, then disk), or None on a miss. For
+        callers that compute the result themselves and store it with put(), such as
+        the streaming endpoint.
+        """
+        with self._lock:
+            data, cost = self._memory.get(key, (None, 0.0))
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                self.saved_seconds += cost
+                return data
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self.saved_seconds += self._average_cost()
+            self._store_memory(key, data, self._average_cost())
+        return data
+
+    def put(self, key, data, cost):
+        """Stores a result computed outside get_or_submit; cost is its computation time in seconds."""
+        with self._lock:
+            self._compute_seconds += cost
+            self._computed += 1
+            self._store_memory(key, data, cost)
+        self._write_disk(key, data)
+
+    def abandon(self, key):
+        """
+        Called when a waiter gives up (timeout, disconnect). The computation is only
+        cancelled once nobody else is waiting for it.
+        """
+        with self._lock:
+            if key not in self._waiters:
+                return
+            self._waiters[key] -= 1
+            cancel = self._cancels.get(key) if self._waiters[key] <= 0 else None
+        if cancel is not None:
+            cancel()
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits + self.coalesced
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_tier": self.disk_dir is not None,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "coalesced": self.coalesced,
+                "misses": self.misses,
+                "in_flight": len(self._inflight),
+                "hit_ratio": hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+    def _on_done(self, key, future, duration):
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._waiters.pop(key, None)
+            self._cancels.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            data = future.result()
+            self._compute_seconds += duration
+            self._computed += 1
+            self._store_memory(key, data, duration)
+        self._write_disk(key, data)
+
+    def _store_memory(self, key, data, cost):
+        # Must be called with self._lock held
+        self._memory[key] = (data, cost)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _average_cost(self):
+        # Must be called with self._lock held
+        return self._compute_seconds / self._computed if self._computed else 0.0
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            with open(path + ".tmp", 'wb') as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.error(f"Could not write result cache entry {path}: {e}")
+
+    @staticmethod
+    def _resolved(data):
+        future = Future()
+        future.set_result(data)
+        return future
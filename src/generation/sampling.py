@@ -0,0 +1,216 @@
+import numpy as np
+
+def log_softmax(logits):
+    """Row-wise log-softmax of a (batch, vocab) array."""
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    return shifted - np.log(np.sum(np.exp(shifted), axis=-1, keepdims=True))
+
+def validate_sampling_options(temperature=1.0, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0):
+    """Raises ValueError for sampling options BatchSampler.add would reject."""
+    if temperature <= 0:
+        raise ValueError("temperature must be positive.")
+    if not 0 < top_p <= 1:
+        raise ValueError("top_p must be in (0, 1].")
+    if top_k < 0:
+        raise ValueError("top_k must be non-negative.")
+    if repetition_penalty <= 0:
+        raise ValueError("repetition_penalty must be positive.")
+    if max_consecutive is not None and max_consecutive < 0:
+        raise ValueError("max_consecutive must be non-negative.")
+
+class BatchSampler:
+    """
+    Vectorised next-note sampling for a batch of sequences.
+
+    Every row (sequence) has its own temperature, top-k, top-p (nucleus), repetition
+    penalty, consecutive-repeat limit and np.random.Generator, so requests that share
+    a forward pass still sample independently. Rows can be added and removed between
+    steps, mirroring IncrementalDecoder.extend/keep.
+
+    The sampler works on logits (or log-probabilities); probabilities from a softmax
+    output can be passed too and are converted with a single log. Work buffers are
+    preallocated and grown only when the batch outgrows them, so the decode loop does
+    not allocate full (batch, vocab) arrays on every step.
+
+    Repetition penalty follows the CTRL formulation: the score of every note that
+    appears in the last `repetition_window` notes is divided by the penalty if positive
+    and multiplied by it if negative. max_consecutive forbids a note that has already
+    been repeated that many times in a row, like _limit_consecutive_notes does for the
+    training data.
+
+    Args:
+        vocab_size (int): Size of the model's output layer.
+        repetition_window (int): Number of recent notes considered by the repetition penalty.
+        capacity (int): Initial number of rows the buffers are sized for.
+    """
+
+    def __init__(self, vocab_size, repetition_window=16, capacity=1):
+        self.vocab_size = vocab_size
+        self.repetition_window = repetition_window
+        self.rows = 0
+        self._capacity = 0
+        self._rngs = []
+        self._allocate(max(capacity, 1))
+        self._refresh()
+
+    def _allocate(self, capacity):
+        def grow(array, shape, fill):
+            new = np.full(shape, fill, dtype=array.dtype if array is not None else None)
+            if array is not None:
+                new[:self.rows] = array[:self.rows]
+            return new
+
+        get = lambda name: getattr(self, name, None)
+        self._temperature = grow(get("_temperature"), capacity, 1.0)
+        self._top_k = grow(get("_top_k"), capacity, 0)
+        self._top_p = grow(get("_top_p"), capacity, 1.0)
+        self._penalty = grow(get("_penalty"), capacity, 1.0)
+        self._max_consecutive = grow(get("_max_consecutive"), capacity, 0)
+        self._last_token = grow(get("_last_token"), capacity, -1)
+        self._run_length = grow(get("_run_length"), capacity, 0)
+        self._history = grow(get("_history"), (capacity, self.repetition_window), -1)
+        self._history_pos = grow(get("_history_pos"), capacity, 0)
+        self._counts = grow(get("_counts"), (capacity, self.vocab_size), 0)
+        self._scores = np.empty((capacity, self.vocab_size), dtype=np.float64)
+        self._uniform = np.empty(capacity, dtype=np.float64)
+        self._above = np.empty((capacity, self.vocab_size), dtype=bool)
+        self._capacity = capacity
+
+    def add(self, temperature=1.0, top_k=0, top_p=1.0, repetition_penalty=1.0, max_consecutive=0, rng=None, history=()):
+        """
+        Adds a row and returns its index. history (e.g. the seed pattern) primes the
+        repetition penalty and consecutive-repeat limit. rng=None uses the global NumPy RNG.
+        """
+        validate_sampling_options(temperature, top_k, top_p, repetition_penalty, max_consecutive)
+
+        if self.rows == self._capacity:
+            self._allocate(self._capacity * 2)
+        row = self.rows
+        self.rows += 1
+        self._temperature[row] = temperature
+        self._top_k[row] = top_k if top_k < self.vocab_size else 0
+        self._top_p[row] = top_p
+        self._penalty[row] = repetition_penalty
+        self._max_consecutive[row] = max_consecutive or 0
+        self._last_token[row] = -1
+        self._run_length[row] = 0
+        self._history[row] = -1
+        self._history_pos[row] = 0
+        self._counts[row] = 0
+        self._rngs.append(rng)
+        self._refresh()
+        if repetition_penalty != 1.0 or max_consecutive:
+            for token in history:
+                self._record(np.array([row]), np.array([token]))
+        return row
+
+    def keep(self, mask):
+        """Drops the rows whose entry in the boolean mask is False."""
+        mask = np.asarray(mask, dtype=bool)
+        kept = np.flatnonzero(mask)
+        n = len(kept)
+        for array in (self._temperature, self._top_k, self._top_p, self._penalty, self._max_consecutive,
+                      self._last_token, self._run_length, self._history, self._history_pos, self._counts):
+            array[:n] = array[kept]
+        self._rngs = [self._rngs[i] for i in kept]
+        self.rows = n
+        self._refresh()
+
+    def _refresh(self):
+        # Rows that use each option, so the per-step work skips disabled options entirely
+        n = self.rows
+        self._penalised_rows = np.flatnonzero(self._penalty[:n] != 1.0)
+        self._limited_rows = np.flatnonzero(self._max_consecutive[:n] > 0)
+        self._tracked_rows = np.union1d(self._penalised_rows, self._limited_rows)
+        self._top_k_rows = np.flatnonzero(self._top_k[:n] > 0)
+        self._top_p_rows = np.flatnonzero(self._top_p[:n] < 1.0)
+        self._scaled = bool(np.any(self._temperature[:n] != 1.0))
+        self._shared_rng = n > 0 and all(rng is self._rngs[0] for rng in self._rngs)
+
+    def sample(self, logits=None, probs=None):
+        """
+        Draws one note per row from logits (or probabilities) of shape (rows, vocab),
+        records it in the row's history and returns the sampled indices.
+        """
+        n = self.rows
+        vocab_size = self.vocab_size
+        scores = self._scores[:n]
+        if logits is not None:
+            np.copyto(scores, logits)
+        else:
+            np.maximum(probs, 1e-30, out=scores)
+            np.log(scores, out=scores)
+
+        rows = self._penalised_rows
+        if len(rows):
+            present = self._counts[rows] > 0
+            row_scores = scores[rows]
+            penalty = self._penalty[rows, np.newaxis]
+            scores[rows] = np.where(present, np.where(row_scores > 0, row_scores / penalty, row_scores * penalty), row_scores)
+
+        rows = self._limited_rows
+        if len(rows):
+            rows = rows[self._run_length[rows] >= self._max_consecutive[rows]]
+            scores[rows, self._last_token[rows]] = -np.inf
+
+        if self._scaled:
+            scores /= self._temperature[:n, np.newaxis]
+
+        rows = self._top_k_rows
+        if len(rows):
+            row_scores = scores[rows]
+            ascending = np.sort(row_scores, axis=1)
+            threshold = ascending[np.arange(len(rows)), vocab_size - self._top_k[rows]]
+            row_scores[row_scores < threshold[:, np.newaxis]] = -np.inf
+            scores[rows] = row_scores
+
+        # Softmax numerators, in place (normalisation is folded into the draw below)
+        row_max = np.max(scores, axis=1, keepdims=True)
+        row_max[~np.isfinite(row_max)] = 0.0
+        scores -= row_max
+        np.exp(scores, out=scores)
+
+        rows = self._top_p_rows
+        if len(rows):
+            row_scores = scores[rows]
+            descending = -np.sort(-row_scores, axis=1)
+            cumulative = np.cumsum(descending, axis=1)
+            cutoff_index = np.count_nonzero(cumulative < (self._top_p[rows] * cumulative[:, -1])[:, np.newaxis], axis=1)
+            cutoff = descending[np.arange(len(rows)), np.minimum(cutoff_index, vocab_size - 1)]
+            row_scores[row_scores < cutoff[:, np.newaxis]] = 0.0
+            scores[rows] = row_scores
+
+        # Inverse-CDF draw: one uniform number per row
+        np.cumsum(scores, axis=1, out=scores)
+        uniform = self._uniform[:n]
+        if self._shared_rng:
+            # One generator for the whole batch (e.g. the candidates of one request)
+            if self._rngs[0] is None:
+                uniform[:] = np.random.random(n)
+            else:
+                self._rngs[0].random(out=uniform)
+        else:
+            for row, rng in enumerate(self._rngs):
+                uniform[row] = rng.random() if rng is not None else np.random.random()
+        uniform *= scores[:, -1]
+        # First note whose cumulative mass exceeds the draw
+        indices = np.argmax(np.greater(scores, uniform[:, np.newaxis], out=self._above[:n]), axis=1)
+
+        if len(self._tracked_rows):
+            self._record(self._tracked_rows, indices[self._tracked_rows])
+        return indices
+
+    def _record(self, rows, tokens):
+        tokens = np.asarray(tokens)
+        # Consecutive-repeat tracking
+        same = self._last_token[rows] == tokens
+        self._run_length[rows] = np.where(same, self._run_length[rows] + 1, 1)
+        self._last_token[rows] = tokens
+        # Sliding window of recent notes, kept as per-row counts
+        positions = self._history_pos[rows]
+        dropped = self._history[rows, positions]
+        has_dropped = dropped >= 0
+        self._counts[rows[has_dropped], dropped[has_dropped]] -= 1
+        self._history[rows, positions] = tokens
+        self._counts[rows, tokens] += 1
+        self._history_pos[rows] = (positions + 1) % self.repetition_window
@@ -0,0 +1,121 @@
+"""
+Checkpointing for train_model, so that an interrupted run resumes where it stopped.
+
+A checkpoint directory (models/checkpoints/<genre>/ by default) holds:
+  * epoch-<n>.keras   the model after epoch n, optimizer state included
+  * best-<n>.npz      the best weights EarlyStopping is holding on to, if any
+  * order-<n>.npy     the order the training windows are visited in next epoch
+  * state.json        epoch counter, EarlyStopping counters, shuffling RNG state and
+                      the training configuration the checkpoint belongs to
+
+state.json is replaced atomically after the files it points to are written, so a
+run killed while checkpointing resumes from the previous complete checkpoint.
+"""
+import os
+import json
+import shutil
+import numpy as np
+from tensorflow.keras.models import load_model
+from tensorflow.keras.callbacks import Callback, EarlyStopping
+
+class ResumableEarlyStopping(EarlyStopping):
+    """EarlyStopping whose counters and best weights survive a restart (see restore)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._restored = None
+
+    def get_state(self):
+        return {"wait": self.wait, "best": None if self.best is None else float(self.best), "best_epoch": self.best_epoch}
+
+    def restore(self, state, best_weights):
+        """Applies a saved state at the start of the next fit()."""
+        self._restored = (state, best_weights)
+
+    def on_train_begin(self, logs=None):
+        super().on_train_begin(logs)
+        if self._restored:
+            state, self.best_weights = self._restored
+            self.wait, self.best, self.best_epoch = state["wait"], state["best"], state["best_epoch"]
+            self._restored = None
+
+class TrainingCheckpoint(Callback):
+    """
+    Saves a checkpoint every `every` epochs. Must come after the EarlyStopping
+    callback in the callbacks list, so its counters are up to date.
+
+    Args:
+        directory (str): Checkpoint directory.
+        config (dict): Training configuration; a checkpoint is only resumed with the same one.
+        early_stopping (ResumableEarlyStopping): Callback whose state is saved.
+        batches: Training WindowBatches, whose window order and shuffling RNG state are saved.
+    """
+
+    def __init__(self, directory, config, early_stopping, batches=None, every=1):
+        super().__init__()
+        self.directory = directory
+        self.config = config
+        self.early_stopping = early_stopping
+        self.batches = batches
+        self.every = max(1, every)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.every == 0:
+            save_checkpoint(self.directory, self.model, epoch + 1, self.config, self.early_stopping, self.batches)
+
+def save_checkpoint(directory, model, epoch, config, early_stopping, batches=None):
+    """Writes the checkpoint of a finished epoch and removes the previous one."""
+    os.makedirs(directory, exist_ok=True)
+    model_file = f"epoch-{epoch}.keras"
+    model.save(os.path.join(directory, model_file))
+    best_file = None
+    if early_stopping.best_weights is not None:
+        best_file = f"best-{epoch}.npz"
+        np.savez(os.path.join(directory, best_file), *early_stopping.best_weights)
+    order_file = None
+    if batches is not None:
+        order_file = f"order-{epoch}.npy"
+        np.save(os.path.join(directory, order_file), batches.order)
+
+    state = {
+        "epoch": epoch,
+        "config": config,
+        "model": model_file,
+        "best_weights": best_file,
+        "order": order_file,
+        "early_stopping": early_stopping.get_state(),
+        "rng": batches.rng.bit_generator.state if batches is not None else None,
+    }
+    tmp_path = os.path.join(directory, "state.json.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, os.path.join(directory, "state.json"))
+
+    for filename in os.listdir(directory):
+        if filename.endswith((".keras", ".npz", ".npy")) and filename not in (model_file, best_file, order_file):
+            os.remove(os.path.join(directory, filename))
+
+def load_checkpoint(directory, config):
+    """
+    Returns (state, model, best weights, window order) of the checkpoint in directory,
+    or None if there is none or it was written for a different configuration.
+    """
+    try:
+        with open(os.path.join(directory, "state.json"), 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("config") != config:
+        print(f"Ignoring the checkpoint in {directory}: it belongs to a different training configuration")
+        return None
+    model = load_model(os.path.join(directory, state["model"]))
+    best_weights = None
+    if state["best_weights"]:
+        with np.load(os.path.join(directory, state["best_weights"])) as archive:
+            best_weights = [archive[f"arr_{i}"] for i in range(len(archive.files))]
+    order = np.load(os.path.join(directory, state["order"])) if state.get("order") else None
+    return state, model, best_weights, order
+
+def clear_checkpoint(directory):
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
@@ -0,0 +1,243 @@
+"""
+Post-training pipeline for the "fast" model tier.
+
+A trained genre model (the teacher) is distilled into a much smaller student with
+the same architecture and vocabulary, trained on the teacher's softened next-note
+distributions over the processed sequences, split into training and validation
+windows exactly as the teacher's were (see the teacher's .training.json). The
+student is saved next to the teacher as guitar_solo_generator_<genre>_fast.h5, with
+its own copy of the teacher's vocabulary in int_to_note_<genre>_fast.json and its
+own .training.json, and served with tier="fast" (see model_registry.TIERS).
+
+Both tiers can then be exported for the NumPy engine as float32, float16 or int8
+weights, and the pipeline reports, for each tier and weight format, the file size,
+the per-note latency of incremental decoding and the validation perplexity.
+
+    python src/modeling/distill.py --genres Rock Jazz
+    python src/modeling/distill.py --genres Rock --export-dtype int8
+    python src/modeling/distill.py --genres Rock --report-only
+"""
+import os
+import json
+import sys
+import time
+import tempfile
+import argparse
+import numpy as np
+from tensorflow.keras.models import load_model
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.utils import PyDataset
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.modeling.modeling import AUGMENTATION_MODES, open_sequences, build_training_data, create_model, _load_notes, _training_info_path
+from src.generation.model_registry import model_paths, model_name, TIERS
+from src.generation.numpy_engine import NumpyLSTM, export_weights, weights_path
+from src.generation.incremental import IncrementalDecoder, build_step_model
+
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS", "All"]
+DTYPES = ("float32", "float16", "int8")
+
+class SoftTargetBatches(PyDataset):
+    """
+    Turns WindowBatches into (inputs, target distributions) batches for distillation.
+
+    The targets mix the teacher's predictions, softened by temperature, with the
+    one-hot next note: alpha * soft + (1 - alpha) * hard. Cross-entropy is linear in
+    the targets, so training on them with categorical_crossentropy minimises the
+    same mixture of the soft and hard losses. With alpha=0 the teacher is not run.
+
+    Args:
+        batches (WindowBatches): Windows with integer targets.
+        teacher: Keras model giving next-note probabilities.
+        temperature (float): Softening of the teacher's distributions (1 leaves them as they are).
+        alpha (float): Weight of the soft targets.
+    """
+
+    def __init__(self, batches, teacher, temperature=2.0, alpha=0.9, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = batches
+        self.teacher = teacher
+        self.temperature = temperature
+        self.alpha = alpha
+        self.vocab_size = teacher.output_shape[-1]
+
+    def __len__(self):
+        return len(self.batches)
+
+    def __getitem__(self, index):
+        inputs, targets = self.batches[index]
+        distributions = np.zeros((len(targets), self.vocab_size), dtype=np.float32)
+        if self.alpha > 0:
+            log_probs = np.log(np.maximum(np.asarray(self.teacher.predict_on_batch(inputs)), 1e-12)) / self.temperature
+            soft = np.exp(log_probs - log_probs.max(axis=1, keepdims=True))
+            distributions += self.alpha * soft / soft.sum(axis=1, keepdims=True)
+        distributions[np.arange(len(targets)), targets] += 1 - self.alpha
+        return inputs, distributions
+
+    def on_epoch_end(self):
+        self.batches.on_epoch_end()
+
+def _data_path(genre, data_dir):
+    return os.path.join(data_dir, f"processed_sequences_{genre.lower()}.txt")
+
+def distill_model(genre, models_dir, data_dir, sequence_length=50, epochs=50, augmentation="random", embedding_dim=64,
+                  rnn_units=256, temperature=2.0, alpha=0.9, learning_rate=0.001, seed=None):
+    """
+    Trains the fast student of a genre's model and saves it next to the teacher.
+
+    The sequence length, augmentation and held-out genres are read from the teacher's
+    .training.json, so the student never trains on windows the teacher kept out (the
+    all-genres model leaves out the genre validation windows); sequence_length and
+    augmentation are only used for a teacher without one.
+
+    Returns:
+        dict: epochs run, best epoch, best validation loss (cross-entropy on the real
+        next notes) and training seconds.
+    """
+    teacher_path, int_to_note_path = model_paths(genre, models_dir)
+    student_path, student_int_to_note_path = model_paths(genre, models_dir, "fast")
+    if not os.path.exists(teacher_path):
+        raise FileNotFoundError(f"Model not found for genre '{genre}': {teacher_path}")
+    teacher = load_model(teacher_path, compile=False)
+    notes = _load_notes(int_to_note_path)
+    try:
+        with open(_training_info_path(teacher_path), 'r') as f:
+            teacher_info = json.load(f)
+    except (OSError, ValueError):
+        print(f"No training info for {teacher_path}: the student's split may differ from the teacher's")
+        teacher_info = {}
+    sequence_length = teacher_info.get("sequence_length", sequence_length)
+    augmentation = teacher_info.get("augmentation", augmentation)
+    held_out_genres = teacher_info.get("held_out_genres", [])
+
+    sequences = open_sequences(_data_path(genre, data_dir))
+    held_out_of = [open_sequences(_data_path(name, data_dir)) for name in held_out_genres]
+    _, train_batches, validation_batches = build_training_data(sequences, sequence_length, augmentation, seed=seed,
+                                                               notes=notes, held_out_of=held_out_of)
+
+    student = create_model(len(notes), embedding_dim, rnn_units, sequence_length)
+    student.compile(optimizer=Adam(learning_rate=learning_rate), loss='categorical_crossentropy', metrics=['accuracy'])
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    print(f"Distilling {teacher_path} into a {embedding_dim}/{rnn_units} student...")
+    start = time.perf_counter()
+    history = student.fit(SoftTargetBatches(train_batches, teacher, temperature, alpha), epochs=epochs,
+                          validation_data=SoftTargetBatches(validation_batches, teacher, alpha=0.0),
+                          callbacks=[early_stopping])
+    seconds = time.perf_counter() - start
+    # The student gets its own copy of the teacher's vocabulary, renamed into place after the model
+    tmp_student_path = os.path.splitext(student_path)[0] + ".tmp.h5"
+    student.save(tmp_student_path)
+    with open(student_int_to_note_path + ".tmp", 'w') as f:
+        json.dump({i: n for i, n in enumerate(notes)}, f)
+    os.replace(tmp_student_path, student_path)
+    os.replace(student_int_to_note_path + ".tmp", student_int_to_note_path)
+    print(f"Student saved to {student_path}")
+
+    val_losses = history.history.get('val_loss', [float('nan')])
+    best_epoch = int(np.nanargmin(val_losses)) if not np.all(np.isnan(val_losses)) else 0
+    summary = {"epochs": len(val_losses), "best_epoch": best_epoch + 1, "val_loss": float(val_losses[best_epoch]),
+               "seconds": seconds}
+    # Same fields as train_model's sidecar; the teacher's knowledge includes its own training windows
+    info_path = _training_info_path(student_path)
+    with open(info_path + ".tmp", 'w') as f:
+        json.dump({"source_files": sequences.metadata.get("source_files", []), "num_tokens": int(len(sequences.tokens)),
+                   "sequence_length": sequence_length, "augmentation": augmentation, "init": "distilled",
+                   "teacher": model_name(genre), "held_out_genres": held_out_genres, "summary": summary}, f, indent=2)
+    os.replace(info_path + ".tmp", info_path)
+    return summary
+
+def perplexity(model, validation_batches, max_batches=40):
+    """
+    exp(mean cross-entropy) of the next note over up to max_batches validation
+    batches, spread evenly over the set. model is a Keras model or a NumpyLSTM.
+    """
+    indices = np.unique(np.linspace(0, len(validation_batches) - 1, min(max_batches, len(validation_batches))).astype(int))
+    losses = []
+    for index in indices:
+        inputs, targets = validation_batches[index]
+        probs = np.asarray(model.predict(inputs, verbose=0), dtype=np.float64)
+        losses.append(-np.log(np.maximum(probs[np.arange(len(targets)), targets], 1e-12)))
+    return float(np.exp(np.concatenate(losses).mean()))
+
+def note_latency_ms(step_model, vocab_size, sequence_length=50, steps=200, seed=0):
+    """Median milliseconds per generated note of single-sequence incremental decoding."""
+    rng = np.random.default_rng(seed)
+    decoder = IncrementalDecoder(step_model)
+    decoder.prime(rng.integers(0, vocab_size, size=(1, sequence_length - 1)))
+    times = []
+    for token in rng.integers(0, vocab_size, size=steps):
+        start = time.perf_counter()
+        decoder.step([token])
+        times.append(time.perf_counter() - start)
+    return float(np.median(times)) * 1000
+
+def report_tiers(genre, models_dir, data_dir, sequence_length=50, dtypes=DTYPES, max_batches=40):
+    """
+    Measures every available tier of a genre: the Keras .h5 model and its NumPy
+    export in each of dtypes. Returns one dict per (tier, format) with size, per-note
+    latency and validation perplexity.
+    """
+    sequences = open_sequences(_data_path(genre, data_dir))
+    rows = []
+    for tier in TIERS:
+        model_path, int_to_note_path = model_paths(genre, models_dir, tier)
+        if not os.path.exists(model_path):
+            continue
+        notes = _load_notes(int_to_note_path)
+        _, _, validation_batches = build_training_data(sequences, sequence_length, notes=notes)
+        model = load_model(model_path, compile=False)
+        rows.append({"tier": tier, "format": "keras .h5", "mb": os.path.getsize(model_path) / 1e6,
+                     "note_ms": note_latency_ms(build_step_model(model), len(notes), sequence_length),
+                     "perplexity": perplexity(model, validation_batches, max_batches)})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for dtype in dtypes:
+                path = export_weights(model, os.path.join(tmp_dir, f"{dtype}.npz"), dtype=np.dtype(dtype))
+                numpy_model = NumpyLSTM.load(path)
+                rows.append({"tier": tier, "format": f"numpy {dtype}", "mb": os.path.getsize(path) / 1e6,
+                             "note_ms": note_latency_ms(numpy_model, len(notes), sequence_length),
+                             "perplexity": perplexity(numpy_model, validation_batches, max_batches)})
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Distil the genre models into fast students and report latency, size and perplexity per tier.")
+    parser.add_argument("--genres", nargs="+", default=GENRES)
+    parser.add_argument("--models-dir", default=os.path.join(project_root, "models"))
+    parser.add_argument("--data-dir", default=os.path.join(project_root, "data"))
+    parser.add_argument("--epochs", type=int, default=50, help="Max epochs for EarlyStopping.")
+    parser.add_argument("--augmentation", choices=AUGMENTATION_MODES, default="random",
+                        help="Only used for teachers without a .training.json; otherwise the teacher's augmentation is used.")
+    parser.add_argument("--embedding-dim", type=int, default=64, help="Student embedding size.")
+    parser.add_argument("--rnn-units", type=int, default=256, help="Student units of the first LSTM (half in the second).")
+    parser.add_argument("--temperature", type=float, default=2.0, help="Softening of the teacher's predictions.")
+    parser.add_argument("--alpha", type=float, default=0.9, help="Weight of the teacher's predictions against the real next notes.")
+    parser.add_argument("--export-dtype", choices=DTYPES, help="Also export both tiers for the NumPy engine with these weights.")
+    parser.add_argument("--report-only", action="store_true", help="Only report on the existing tiers.")
+    args = parser.parse_args()
+
+    for genre in args.genres:
+        try:
+            if not args.report_only:
+                summary = distill_model(genre, args.models_dir, args.data_dir, epochs=args.epochs,
+                                        augmentation=args.augmentation, embedding_dim=args.embedding_dim,
+                                        rnn_units=args.rnn_units, temperature=args.temperature, alpha=args.alpha)
+                print(f"Student val_loss {summary['val_loss']:.4f} at epoch {summary['best_epoch']} of "
+                      f"{summary['epochs']}, {summary['seconds']:.0f}s")
+            if args.export_dtype:
+                for tier in TIERS:
+                    model_path, _ = model_paths(genre, args.models_dir, tier)
+                    path = export_weights(load_model(model_path, compile=False), weights_path(genre, args.models_dir, tier),
+                                          dtype=np.dtype(args.export_dtype))
+                    print(f"Exported {path}")
+            rows = report_tiers(genre, args.models_dir, args.data_dir)
+        except FileNotFoundError as e:
+            print(f"Skipping {genre}: {e}")
+            continue
+
+        print(f"\n{genre}")
+        print(f"{'tier':>5} {'format':>14} {'MB':>8} {'ms/note':>8} {'perplexity':>11}")
+        for row in rows:
+            print(f"{row['tier']:>5} {row['format']:>14} {row['mb']:>8.2f} {row['note_ms']:>8.2f} {row['perplexity']:>11.3f}")
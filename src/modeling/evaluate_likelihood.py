@@ -0,0 +1,279 @@
+"""
+Likelihood evaluation of the trained models on held-out data.
+
+Every guitar_solo_generator_*.h5 model in the models directory (all genres and
+tiers) scores the held-out windows of every processed dataset: the last 20% of the
+windows of each processed_sequences_<genre> store, which training keeps for
+validation (see build_training_data). For each (dataset, model) pair it reports the
+next-note cross-entropy, perplexity and top-k accuracy, and the perplexities form a
+dataset x model confusion table.
+
+Windows are streamed from the memory-mapped stores in large batches, one batch at a
+time, and every model scores the same batch before the next one is read, so memory
+stays bounded whatever the size of the dataset. A window with a note outside a
+model's vocabulary can't be scored by that model and only lowers its coverage.
+
+A held-out window of one dataset can still be a training window of another model:
+the genre models trained on part of the All dataset's held-out split, and a model
+trained before the All model left out the genre validation windows, or warm-started
+from such a model, has seen genre held-out windows. Every result therefore reports
+the share of its windows the model trained on ("seen"), rebuilt from the model's
+own .training.json (see training_windows; a fast student also counts its teacher's); the confusion table marks the cells with
+seen windows with "!", and those whose training data is unknown with "?".
+
+    python src/modeling/evaluate_likelihood.py
+    python src/modeling/evaluate_likelihood.py --datasets Rock Jazz --max-batches 20 --output likelihood.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.modeling.modeling import AUGMENTATION_MODES, open_sequences, build_training_data, window_keys, _load_notes
+from src.generation.model_registry import model_paths, TIERS
+
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS", "All"]
+NUM_NOTES = 128 # MIDI note range
+MODEL_PREFIX = "guitar_solo_generator_"
+
+def _split_name(name):
+    """Model name -> (genre, tier), e.g. "rock_fast" -> ("rock", "fast")."""
+    for tier in TIERS:
+        if tier != "full" and name.endswith(f"_{tier}"):
+            return name[:-len(tier) - 1], tier
+    return name, "full"
+
+def find_models(models_dir):
+    """
+    Returns {model name: (genre, tier)} for every guitar_solo_generator_*.h5 file,
+    e.g. "rock_fast" -> ("rock", "fast").
+    """
+    models = {}
+    for path in sorted(glob.glob(os.path.join(models_dir, f"{MODEL_PREFIX}*.h5"))):
+        name = os.path.basename(path)[len(MODEL_PREFIX):-len(".h5")]
+        models[name] = _split_name(name)
+    return models
+
+def training_windows(name, models_dir, data_dir, source_ids, cache=None):
+    """
+    Keys (see window_keys) of the windows a model (e.g. "rock" or "rock_fast")
+    trained on, read back from its own .training.json: the training split of its
+    genre's dataset, without the genre validation windows it held out, plus those of
+    the all-genres model if it was warm-started from it and those of its teacher if
+    it was distilled. Returns None when the model or its data is not known. cache
+    (name -> keys) saves rebuilding the windows of a model several others build on.
+    """
+    if cache is not None and name in cache:
+        return cache[name]
+    keys = _training_windows(name, models_dir, data_dir, source_ids, cache)
+    if cache is not None:
+        cache[name] = keys
+    return keys
+
+def _training_windows(name, models_dir, data_dir, source_ids, cache):
+    genre, _ = _split_name(name)
+    info_path = os.path.join(models_dir, f"{MODEL_PREFIX}{name}.training.json")
+    data_path = os.path.join(data_dir, f"processed_sequences_{genre}.txt")
+    try:
+        with open(info_path, 'r') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(data_path):
+        return None
+    sequence_length = info.get("sequence_length", 50)
+    held_out_of = [open_sequences(os.path.join(data_dir, f"processed_sequences_{name.lower()}.txt"))
+                   for name in info.get("held_out_genres", [])]
+    sequences = open_sequences(data_path)
+    _, train, _ = build_training_data(sequences, sequence_length, info.get("augmentation", "random"),
+                                      notes=list(range(NUM_NOTES)), held_out_of=held_out_of)
+    keys = window_keys(sequences, train.starts, source_ids)
+    # The model's knowledge includes the windows the model it started from, or learnt from, trained on
+    source = {"warm_start": "all", "distilled": info.get("teacher")}.get(info.get("init"))
+    if source is not None:
+        source_keys = training_windows(source, models_dir, data_dir, source_ids, cache)
+        if source_keys is None:
+            return None
+        keys = np.concatenate([keys, source_keys])
+    return np.unique(keys[keys >= 0])
+
+def vocabulary_lookup(notes):
+    """Maps a MIDI note to its index in a model's vocabulary, or -1 if the model doesn't know it."""
+    lookup = np.full(NUM_NOTES, -1, dtype=np.int32)
+    lookup[notes] = np.arange(len(notes))
+    return lookup
+
+def score_batch(model, lookup, windows, top_k=(1, 5), seen=None):
+    """
+    Scores a batch of windows (MIDI notes, inputs followed by the target) with a model.
+    seen flags the windows the model trained on. Returns the number of windows
+    scored, their summed cross-entropy (nats), the number of targets within each
+    top-k and the number of scored windows that were seen.
+    """
+    mapped = lookup[windows]
+    scorable = (mapped >= 0).all(axis=1)
+    if not scorable.any():
+        return 0, 0.0, [0] * len(top_k), 0
+    inputs, targets = mapped[scorable, :-1], mapped[scorable, -1]
+    probs = np.asarray(model.predict_on_batch(inputs), dtype=np.float64)
+    target_probs = probs[np.arange(len(targets)), targets]
+    # Rank of the target: how many notes the model found strictly more likely
+    ranks = (probs > target_probs[:, np.newaxis]).sum(axis=1)
+    cross_entropy = float(-np.log(np.maximum(target_probs, 1e-12)).sum())
+    num_seen = int(seen[scorable].sum()) if seen is not None else 0
+    return len(targets), cross_entropy, [int((ranks < k).sum()) for k in top_k], num_seen
+
+def evaluate_dataset(models, sequences, sequence_length=50, augmentation="none", batch_size=1024, max_batches=None, top_k=(1, 5),
+                     trained_on=None, source_ids=None):
+    """
+    Scores the held-out windows of one dataset with every model.
+
+    Args:
+        models (dict): Model name -> (Keras model, vocabulary lookup).
+        sequences (SequenceStore): The dataset.
+        trained_on (dict): Model name -> keys of its training windows (see
+            training_windows), or None when unknown; source_ids is the dict they were built with.
+        augmentation (str): "none" scores the original held-out windows; "random" or
+            "exhaustive" also every transposition of them, as validation does in training.
+        batch_size (int): Windows per forward pass.
+        max_batches (int): Only score this many batches, spread evenly over the held-out set.
+
+    Returns:
+        dict: Model name -> results (see _summary).
+    """
+    # Windows come out as MIDI notes; each model maps them to its own vocabulary
+    _, _, held_out = build_training_data(sequences, sequence_length, augmentation, batch_size=batch_size, notes=list(range(NUM_NOTES)))
+    indices = np.arange(len(held_out))
+    if max_batches is not None and max_batches < len(held_out):
+        indices = np.unique(np.linspace(0, len(held_out) - 1, max_batches).astype(int))
+
+    trained_on = trained_on or {}
+    held_out_keys = window_keys(sequences, held_out.starts, {} if source_ids is None else source_ids)
+    seen = {name: np.isin(held_out_keys, trained_on[name]) for name in models if trained_on.get(name) is not None}
+
+    totals = {name: [0, 0.0, np.zeros(len(top_k), dtype=np.int64), 0] for name in models}
+    windows_seen = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=1) as prefetcher:
+        # Gathers the next batch from the store while the models run on the current one
+        pending = prefetcher.submit(held_out.__getitem__, indices[0]) if len(indices) else None
+        for i in range(len(indices)):
+            inputs, targets = pending.result()
+            if i + 1 < len(indices):
+                pending = prefetcher.submit(held_out.__getitem__, indices[i + 1])
+            windows = np.concatenate([inputs, targets[:, np.newaxis]], axis=1)
+            windows_seen += len(windows)
+            # Validation batches are not shuffled, so batch i holds windows i * batch_size onwards
+            rows = slice(indices[i] * held_out.batch_size, indices[i] * held_out.batch_size + len(windows))
+            for name, (model, lookup) in models.items():
+                scored, cross_entropy, hits, num_seen = score_batch(model, lookup, windows, top_k,
+                                                                    seen[name][rows] if name in seen else None)
+                totals[name][0] += scored
+                totals[name][1] += cross_entropy
+                totals[name][2] += hits
+                totals[name][3] += num_seen
+    seconds = time.perf_counter() - start
+    return {name: _summary(scored, cross_entropy, hits, windows_seen, top_k, seconds, num_seen if name in seen else None)
+            for name, (scored, cross_entropy, hits, num_seen) in totals.items()}
+
+def _summary(scored, cross_entropy, hits, windows, top_k, seconds, num_seen=None):
+    mean = cross_entropy / scored if scored else float("nan")
+    return {
+        "windows": windows,
+        "scored": scored,
+        "coverage": scored / windows if windows else 0.0,
+        # Share of the scored windows the model trained on, None if its training data is unknown
+        "seen": (num_seen / scored if scored else 0.0) if num_seen is not None else None,
+        "cross_entropy": mean,
+        "perplexity": float(np.exp(mean)),
+        **{f"top_{k}_accuracy": (int(h) / scored if scored else float("nan")) for k, h in zip(top_k, hits)},
+        "windows_per_second": windows / seconds if seconds else 0.0,
+    }
+
+def evaluate_models_likelihood(models_dir, data_dir, datasets=GENRES, sequence_length=50, augmentation="none",
+                               batch_size=1024, max_batches=None, top_k=(1, 5)):
+    """
+    Scores every model of models_dir on the held-out windows of every dataset of data_dir.
+    Returns {dataset: {model name: results}}; datasets without processed data are skipped.
+    """
+    models, trained_on, windows_cache, source_ids = {}, {}, {}, {}
+    for name, (genre, tier) in find_models(models_dir).items():
+        model_path, int_to_note_path = model_paths(genre, models_dir, tier)
+        if not os.path.exists(int_to_note_path):
+            print(f"Skipping {name}: no vocabulary at {int_to_note_path}")
+            continue
+        models[name] = (load_model(model_path, compile=False), vocabulary_lookup(_load_notes(int_to_note_path)))
+        trained_on[name] = training_windows(name, models_dir, data_dir, source_ids, windows_cache)
+    if not models:
+        raise FileNotFoundError(f"No {MODEL_PREFIX}*.h5 models in {models_dir}")
+
+    results = {}
+    for dataset in datasets:
+        data_path = os.path.join(data_dir, f"processed_sequences_{dataset.lower()}.txt")
+        if not os.path.exists(data_path):
+            print(f"Skipping {dataset}: no processed data at {data_path}")
+            continue
+        print(f"Scoring {dataset} with {len(models)} models...")
+        results[dataset] = evaluate_dataset(models, open_sequences(data_path), sequence_length, augmentation,
+                                            batch_size, max_batches, top_k, trained_on, source_ids)
+    return results
+
+def print_report(results, top_k=(1, 5)):
+    accuracy_headers = "".join(f" {f'top-{k}':>7}" for k in top_k)
+    print(f"\n{'dataset':>8} {'model':>10} {'windows':>9} {'coverage':>8} {'seen':>6} {'CE':>7} {'perplexity':>10}"
+          f"{accuracy_headers} {'windows/s':>10}")
+    for dataset, by_model in results.items():
+        for name, r in by_model.items():
+            accuracies = "".join(f" {r[f'top_{k}_accuracy']:>7.3f}" for k in top_k)
+            seen = f"{r['seen']:>6.1%}" if r["seen"] is not None else f"{'?':>6}"
+            print(f"{dataset:>8} {name:>10} {r['scored']:>9} {r['coverage']:>8.1%} {seen} {r['cross_entropy']:>7.3f} "
+                  f"{r['perplexity']:>10.3f}{accuracies} {r['windows_per_second']:>10.0f}")
+
+    # Confusion table: perplexity of every model (columns) on every dataset (rows); * marks the best model,
+    # ! a model that trained on some of the windows and ? one whose training data is unknown
+    names = list(next(iter(results.values()))) if results else []
+    print(f"\nPerplexity, dataset x model (* best per dataset, ! trained on some of these windows, ? training data unknown)")
+    print(f"{'':>8}" + "".join(f" {name:>12}" for name in names))
+    for dataset, by_model in results.items():
+        perplexities = [by_model[name]["perplexity"] for name in names]
+        best = np.nanargmin(perplexities) if not np.all(np.isnan(perplexities)) else -1
+        flags = ["?" if by_model[name]["seen"] is None else "!" if by_model[name]["seen"] > 0 else " " for name in names]
+        print(f"{dataset:>8}" + "".join(f" {p:>10.3f}{'*' if i == best else ' '}{flag}"
+                                        for i, (p, flag) in enumerate(zip(perplexities, flags))))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score every genre model on the held-out windows of every dataset.")
+    parser.add_argument("--models-dir", default=os.path.join(project_root, "models"))
+    parser.add_argument("--data-dir", default=os.path.join(project_root, "data"))
+    parser.add_argument("--datasets", nargs="+", default=GENRES)
+    parser.add_argument("--sequence-length", type=int, default=50)
+    parser.add_argument("--augmentation", choices=AUGMENTATION_MODES, default="none",
+                        help="'none' scores the original held-out windows, the others every transposition of them.")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Windows per forward pass.")
+    parser.add_argument("--max-batches", type=int, default=None, help="Batches scored per dataset, spread evenly (default: all).")
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, 5])
+    parser.add_argument("--threads", type=int, default=os.cpu_count(), help="TensorFlow threads for the forward passes.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    # Must be set before TensorFlow runs anything
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(args.threads)
+
+    results = evaluate_models_likelihood(args.models_dir, args.data_dir, args.datasets, args.sequence_length, args.augmentation,
+                                         args.batch_size, args.max_batches, tuple(args.top_k))
+    print_report(results, tuple(args.top_k))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
@@ -0,0 +1,159 @@
+"""
+Instrumentation of train_model: where the time goes while a model trains.
+
+TrainingInstrumentation is a Keras callback that times every training step and
+every validation pass, and writes a run log next to the model after each epoch:
+
+  * <model>.run.json  run configuration, data preparation time and one record per epoch
+  * <model>.run.csv   the per-epoch records as a table
+
+Each epoch record holds training and validation seconds, validation overhead (share
+of the epoch spent validating), samples/sec, step-time percentiles, loss/val_loss
+and the peak RSS of the process so far.
+
+With profile_steps=(first, last), the TensorFlow profiler traces those training
+steps (counted from 1 across epochs) into profile_dir, to be opened with
+TensorBoard's profile plugin.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.utils.memory import peak_rss_mb
+
+EPOCH_FIELDS = ["epoch", "seconds", "train_seconds", "validation_seconds", "validation_overhead", "steps",
+                "samples_per_second", "step_ms_p50", "step_ms_p90", "step_ms_p99", "step_ms_max",
+                "loss", "val_loss", "peak_rss_mb"]
+
+def run_log_paths(model_path):
+    """Returns the (JSON, CSV) run log paths of a model."""
+    root = os.path.splitext(model_path)[0]
+    return root + ".run.json", root + ".run.csv"
+
+class TrainingInstrumentation(Callback):
+    """
+    Records per-epoch throughput and timings and writes them to the run log of a model.
+
+    Args:
+        model_path (str): Path the model is saved to; the run log goes next to it.
+        run_info (dict): Configuration and data preparation timings stored in the JSON log.
+        batch_size (int): Samples per training step, for samples/sec (the last batch of
+            an epoch may be smaller; it is counted as full).
+        profile_steps (tuple): (first, last) training steps to trace with the TensorFlow profiler.
+        profile_dir (str): Where the profiler trace is written.
+    """
+
+    def __init__(self, model_path, run_info=None, batch_size=64, profile_steps=None, profile_dir=None):
+        super().__init__()
+        self.json_path, self.csv_path = run_log_paths(model_path)
+        self.run_info = dict(run_info or {})
+        self.batch_size = batch_size
+        self.profile_steps = profile_steps
+        self.profile_dir = profile_dir
+        self.epochs = []
+        self.global_step = 0
+        self._profiling = False
+
+    def on_train_begin(self, logs=None):
+        self.run_info["started"] = time.time()
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._step_times = []
+        self._train_end = None
+        self._validation_seconds = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self.global_step += 1
+        if self.profile_steps and self.global_step == self.profile_steps[0]:
+            tf.profiler.experimental.start(self.profile_dir)
+            self._profiling = True
+        self._step_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        now = time.perf_counter()
+        self._step_times.append(now - self._step_start)
+        self._train_end = now
+        if self._profiling and self.global_step >= self.profile_steps[1]:
+            self._stop_profiler()
+
+    def on_test_begin(self, logs=None):
+        self._test_start = time.perf_counter()
+
+    def on_test_end(self, logs=None):
+        self._validation_seconds += time.perf_counter() - self._test_start
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        seconds = time.perf_counter() - self._epoch_start
+        train_seconds = (self._train_end or time.perf_counter()) - self._epoch_start
+        step_ms = np.array(self._step_times) * 1000 if self._step_times else np.zeros(1)
+        record = {
+            "epoch": epoch + 1,
+            "seconds": seconds,
+            "train_seconds": train_seconds,
+            "validation_seconds": self._validation_seconds,
+            "validation_overhead": self._validation_seconds / seconds if seconds else 0.0,
+            "steps": len(self._step_times),
+            "samples_per_second": len(self._step_times) * self.batch_size / train_seconds if train_seconds else 0.0,
+            "step_ms_p50": float(np.percentile(step_ms, 50)),
+            "step_ms_p90": float(np.percentile(step_ms, 90)),
+            "step_ms_p99": float(np.percentile(step_ms, 99)),
+            "step_ms_max": float(step_ms.max()),
+            "loss": float(logs["loss"]) if "loss" in logs else None,
+            "val_loss": float(logs["val_loss"]) if "val_loss" in logs else None,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        self.epochs.append(record)
+        self.write()
+
+    def on_train_end(self, logs=None):
+        if self._profiling:
+            self._stop_profiler()
+        self.run_info["finished"] = time.time()
+        self.write()
+
+    def _stop_profiler(self):
+        tf.profiler.experimental.stop()
+        self._profiling = False
+        self.run_info["profile"] = {"steps": list(self.profile_steps), "directory": self.profile_dir}
+        print(f"Profiler trace of steps {self.profile_steps[0]}-{self.profile_steps[1]} written to {self.profile_dir}")
+
+    def summary(self):
+        """Totals over the epochs run so far."""
+        if not self.epochs:
+            return {}
+        seconds = sum(record["seconds"] for record in self.epochs)
+        validation_seconds = sum(record["validation_seconds"] for record in self.epochs)
+        return {
+            "epochs": len(self.epochs),
+            "seconds": seconds,
+            "validation_overhead": validation_seconds / seconds if seconds else 0.0,
+            "samples_per_second": float(np.median([record["samples_per_second"] for record in self.epochs])),
+            "step_ms_p50": float(np.median([record["step_ms_p50"] for record in self.epochs])),
+            "peak_rss_mb": max(record["peak_rss_mb"] for record in self.epochs),
+        }
+
+    def write(self):
+        """Rewrites both run log files (atomically, so they can be read while training)."""
+        os.makedirs(os.path.dirname(self.json_path) or ".", exist_ok=True)
+        tmp_path = self.json_path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(self.run_info, epochs=self.epochs, summary=self.summary()), f, indent=2)
+        os.replace(tmp_path, self.json_path)
+
+        tmp_path = self.csv_path + ".tmp"
+        with open(tmp_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=EPOCH_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.epochs)
+        os.replace(tmp_path, self.csv_path)
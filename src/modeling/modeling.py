@@ -2,10 +2,28 @@
 import numpy as np
 import json
 import os
-from tensorflow.keras.models import Sequential
+import sys
+import time
+from tensorflow.keras.models import Sequential, load_model
+from tensorflow.keras.optimizers import Adam
 from tensorflow.keras.layers import LSTM, Dense, Embedding, Dropout
-from tensorflow.keras.utils import to_categorical
-from tensorflow.keras.callbacks import EarlyStopping # Import EarlyStopping
+import argparse
+from tensorflow.keras.utils import PyDataset
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.data_preprocessing.sequence_store import SequenceStore, DEFAULT_AUGMENTATION, store_path_for
+from src.modeling.checkpoint import ResumableEarlyStopping, TrainingCheckpoint, load_checkpoint, clear_checkpoint
+from src.modeling.instrumentation import TrainingInstrumentation, run_log_paths
+
+# "random": every training window gets a random transposition each epoch (default)
+# "exhaustive": every window in every transposition, as when they were written to disk
+# "none": original sequences only
+AUGMENTATION_MODES = ("random", "exhaustive", "none")
+TRANSPOSITIONS = DEFAULT_AUGMENTATION["transpositions"]
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS"]
 
 def load_sequences(file_path):
     """Loads sequences from a text file."""
@@ -13,7 +31,201 @@ def load_sequences(file_path):
         sequences = [list(map(int, line.strip().split())) for line in f.readlines()]
     return sequences
 
-def create_model(vocab_size, embedding_dim, rnn_units, sequence_length):
+def open_sequences(file_path):
+    """
+    Opens the binary sequence store that goes with a processed_sequences_*.txt file
+    (memory-mapped, nothing is copied). If only the text file exists, it is converted
+    to a store first.
+    """
+    store_path = store_path_for(file_path)
+    if not os.path.exists(store_path):
+        from src.data_preprocessing.sequence_store import convert_text_file
+        print(f"No sequence store for {file_path}, converting it")
+        convert_text_file(file_path, store_path)
+    return SequenceStore(store_path)
+
+def window_starts(sequences, sequence_length, originals_only=True):
+    """
+    Token offsets of every window of sequence_length notes (sequence_length - 1 inputs
+    followed by the target) that fits inside one sequence, in sequence order.
+    Returns (starts, index of the sequence each window comes from).
+    """
+    offsets = np.asarray(sequences.offsets)
+    counts = np.maximum(np.diff(offsets) - sequence_length, 0)
+    if originals_only:
+        counts = counts * (np.asarray(sequences.transpositions) == 0)
+    sequence_ids = np.repeat(np.arange(len(counts)), counts)
+    positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return offsets[:-1][sequence_ids] + positions, sequence_ids
+
+def expand_transpositions(starts, sequence_ids, transpositions):
+    """
+    Pairs every window with every transposition, ordered like the old materialised
+    files: for each sequence, its windows as is, then transposed by each shift in turn.
+    Returns (starts, shifts).
+    """
+    shifts = np.array(sorted(transpositions, key=lambda s: s != 0), dtype=np.int16)
+    window_index = np.tile(np.arange(len(starts)), len(shifts))
+    shift_index = np.repeat(np.arange(len(shifts)), len(starts))
+    order = np.lexsort((window_index, shift_index, sequence_ids[window_index]))
+    return starts[window_index[order]], shifts[shift_index[order]]
+
+class WindowBatches(PyDataset):
+    """
+    Streams (inputs, integer targets) batches out of the token array of a store.
+
+    Windows are rows of a strided view over the (memory-mapped) tokens, so only the
+    window offsets are held in memory and each batch is gathered, transposed and
+    mapped to vocabulary indices when Keras asks for it.
+
+    Args:
+        tokens (np.ndarray): MIDI notes of all sequences, concatenated.
+        starts (np.ndarray): Token offset of each window.
+        lookup (np.ndarray): Maps a MIDI note to its vocabulary index.
+        sequence_length (int): Notes per window, target included.
+        shifts (np.ndarray): Fixed transposition of each window, or None to draw one
+            from `transpositions` every time the window is served.
+        transpositions (list): Semitone shifts to draw from when shifts is None.
+        shuffle (bool): Reshuffle the windows every epoch.
+    """
+
+    def __init__(self, tokens, starts, lookup, sequence_length, shifts=None, transpositions=None,
+                 batch_size=64, shuffle=True, seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.windows = np.lib.stride_tricks.sliding_window_view(tokens, sequence_length)
+        self.starts = starts
+        self.lookup = lookup
+        self.shifts = shifts
+        self.transpositions = np.asarray(transpositions if transpositions is not None else [0], dtype=np.int16)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.order = self.rng.permutation(len(starts)) if shuffle else np.arange(len(starts))
+        self._restored = None
+
+    def __len__(self):
+        return -(-len(self.starts) // self.batch_size)
+
+    def __getitem__(self, index):
+        rows = self.order[index * self.batch_size:(index + 1) * self.batch_size]
+        if self.shifts is not None:
+            shifts = self.shifts[rows]
+        else:
+            shifts = self.rng.choice(self.transpositions, size=len(rows))
+        batch = self.windows[self.starts[rows]].astype(np.int16)
+        batch += shifts[:, np.newaxis]
+        batch = self.lookup[batch]
+        return batch[:, :-1], batch[:, -1]
+
+    def restore(self, order, rng_state):
+        """
+        Applies a checkpointed window order and RNG state at the next on_epoch_end,
+        which fit() calls before the first epoch, instead of reshuffling. Batches fit()
+        draws before that to inspect the data do not shift the restored RNG.
+        """
+        self._restored = (order, rng_state)
+
+    def on_epoch_end(self):
+        if self._restored is not None:
+            self.order, self.rng.bit_generator.state = self._restored
+            self._restored = None
+        elif self.shuffle:
+            self.rng.shuffle(self.order)
+
+def window_keys(sequences, starts, source_ids):
+    """
+    Identifies windows across stores built from the same JAMS files: the source file,
+    the sequence within that file and the position in the sequence, packed in an int64.
+
+    Args:
+        sequences (SequenceStore): Store the window offsets refer to.
+        starts (np.ndarray): Token offset of each window.
+        source_ids (dict): Source file name -> id, shared by the stores being compared;
+            new names are added to it.
+
+    Returns:
+        np.ndarray: One key per window, -1 for windows whose source is unknown.
+    """
+    offsets = np.asarray(sequences.offsets)
+    sources = np.asarray(sequences.sources)
+    ids = np.array([source_ids.setdefault(name, len(source_ids)) for name in sequences.metadata.get("source_files", [])] + [-1],
+                   dtype=np.int64)
+    sequence_ids = np.searchsorted(offsets, starts, side='right') - 1
+    # The sequences of a source are contiguous, so their rank is counted from the first one
+    first = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+    ranks = sequence_ids - first[np.searchsorted(first, sequence_ids, side='right') - 1]
+    source_keys = ids[sources[sequence_ids]]
+    keys = (source_keys << 40) | (ranks.astype(np.int64) << 24) | (starts - offsets[sequence_ids]).astype(np.int64)
+    return np.where(source_keys < 0, -1, keys)
+
+def _split_windows(sequences, sequence_length, augmentation, transpositions):
+    """Returns the (starts, shifts) of the training and validation windows (the last 20%)."""
+    materialised = bool(np.any(np.asarray(sequences.transpositions) != 0))
+    if augmentation == "exhaustive" and materialised:
+        starts, _ = window_starts(sequences, sequence_length, originals_only=False)
+        shifts = np.zeros(len(starts), dtype=np.int16)
+        split_at = int(len(starts) * 0.8)
+        return (starts[:split_at], shifts[:split_at]), (starts[split_at:], shifts[split_at:])
+    starts, sequence_ids = window_starts(sequences, sequence_length)
+    if augmentation == "random":
+        split_at = int(len(starts) * 0.8)
+        return (starts[:split_at], None), expand_transpositions(starts[split_at:], sequence_ids[split_at:], transpositions)
+    starts, shifts = expand_transpositions(starts, sequence_ids, transpositions)
+    split_at = int(len(starts) * 0.8)
+    return (starts[:split_at], shifts[:split_at]), (starts[split_at:], shifts[split_at:])
+
+def build_training_data(sequences, sequence_length=50, augmentation="random", batch_size=64, seed=None, notes=None,
+                        held_out_of=()):
+    """
+    Builds the vocabulary and the training and validation batches of a store.
+
+    augmentation is one of AUGMENTATION_MODES. The last 20% of the windows (as with
+    validation_split=0.2) are held out for validation, in every transposition and in
+    a fixed order. In "exhaustive" mode the data is exactly that of the old
+    materialised files; a store that already holds transposed copies is used as is.
+    notes fixes the vocabulary (e.g. to that of a trained model) instead of deriving
+    it from the data; it must cover every note the data produces.
+
+    held_out_of lists other stores from the same JAMS files (the genre partitions,
+    for the all-genres store) whose validation windows are left out of training, so
+    a model warm-started from this one is still validated on unseen windows.
+
+    Returns:
+        tuple: (notes, training WindowBatches, validation WindowBatches)
+    """
+    if augmentation not in AUGMENTATION_MODES:
+        raise ValueError(f"Unknown augmentation '{augmentation}', expected one of {AUGMENTATION_MODES}")
+    transpositions = [0] if augmentation == "none" else TRANSPOSITIONS
+
+    # Create a vocabulary covering every original note in every transposition
+    is_original = np.repeat(np.asarray(sequences.transpositions) == 0, sequences.lengths)
+    original_notes = np.unique(np.asarray(sequences.tokens)[is_original]).astype(np.int64)
+    data_notes = np.unique(original_notes[:, np.newaxis] + np.array(transpositions)).tolist()
+    if notes is None:
+        notes = data_notes
+    elif not set(data_notes) <= set(notes):
+        missing = sorted(set(data_notes) - set(notes))
+        raise ValueError(f"The vocabulary lacks {len(missing)} notes of the data (e.g. {missing[:5]})")
+
+    # Maps MIDI notes to vocabulary indices in one gather
+    lookup = np.zeros(max(notes) + 1, dtype=np.int32)
+    lookup[notes] = np.arange(len(notes))
+
+    train, validation = _split_windows(sequences, sequence_length, augmentation, transpositions)
+    if held_out_of:
+        source_ids = {}
+        held_out = np.concatenate([window_keys(other, _split_windows(other, sequence_length, augmentation, transpositions)[1][0],
+                                               source_ids) for other in held_out_of])
+        keep = ~np.isin(window_keys(sequences, train[0], source_ids), held_out[held_out >= 0])
+        train = (train[0][keep], None if train[1] is None else train[1][keep])
+
+    train_batches = WindowBatches(sequences.tokens, train[0], lookup, sequence_length, shifts=train[1],
+                                  transpositions=transpositions, batch_size=batch_size, seed=seed)
+    validation_batches = WindowBatches(sequences.tokens, validation[0], lookup, sequence_length,
+                                       shifts=validation[1], batch_size=batch_size, shuffle=False)
+    return notes, train_batches, validation_batches
+
+def create_model(vocab_size, embedding_dim, rnn_units, sequence_length, learning_rate=0.001):
     """Creates the RNN model."""
     model = Sequential([
         Embedding(vocab_size, embedding_dim, input_length=sequence_length-1),
@@ -23,11 +235,109 @@ def create_model(vocab_size, embedding_dim, rnn_units, sequence_length):
         Dropout(0.4),
         Dense(vocab_size, activation='softmax')
     ])
-    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='sparse_categorical_crossentropy', metrics=['accuracy'])
     return model
 
-def train_model(genre=None, sequence_length=50, epochs=200): # Increased max epochs
-    """Trains the model and saves it."""
+def warm_start_weights(model, source_model, source_notes, notes):
+    """
+    Initialises model from source_model, a create_model network trained on another
+    vocabulary (e.g. the all-genres model). The LSTM weights are copied as they are;
+    embedding rows and output units are copied for the notes both vocabularies
+    share, the others keep their fresh initialisation.
+
+    Args:
+        model: Built create_model network to initialise.
+        source_model: Trained create_model network with the same layer sizes.
+        source_notes (list): MIDI note of each vocabulary index of source_model.
+        notes (list): MIDI note of each vocabulary index of model.
+
+    Returns:
+        int: Number of notes shared by the two vocabularies.
+    """
+    source_index = {note: i for i, note in enumerate(source_notes)}
+    rows = np.array([i for i, note in enumerate(notes) if note in source_index], dtype=np.int64)
+    source_rows = np.array([source_index[notes[i]] for i in rows], dtype=np.int64)
+
+    for layer, source_layer in zip(model.layers, source_model.layers):
+        weights = layer.get_weights()
+        source_weights = source_layer.get_weights()
+        # Only the vocabulary axis (embedding rows, output units) may differ
+        if isinstance(layer, Embedding):
+            shapes, source_shapes = [weights[0].shape[1:]], [source_weights[0].shape[1:]]
+        elif isinstance(layer, Dense):
+            shapes, source_shapes = [weights[0].shape[:1]], [source_weights[0].shape[:1]]
+        else:
+            shapes, source_shapes = [w.shape for w in weights], [w.shape for w in source_weights]
+        if shapes != source_shapes:
+            raise ValueError(f"Cannot warm-start layer {layer.name}: the source model has different layer sizes")
+
+        if isinstance(layer, Embedding):
+            weights[0][rows] = source_weights[0][source_rows]
+        elif isinstance(layer, Dense):
+            weights[0][:, rows] = source_weights[0][:, source_rows]
+            weights[1][rows] = source_weights[1][source_rows]
+        else:
+            weights = source_weights
+        layer.set_weights(weights)
+    return len(rows)
+
+def _training_info_path(model_path):
+    """Sidecar JSON of a trained model: source files and token count it was trained on, and its summary."""
+    return os.path.splitext(model_path)[0] + ".training.json"
+
+def _load_notes(int_to_note_path):
+    with open(int_to_note_path, 'r') as f:
+        int_to_note = json.load(f)
+    return [int_to_note[str(i)] for i in range(len(int_to_note))]
+
+def _refresh_partition(data_dir, data_path, genre, sequences):
+    """
+    Re-runs preprocessing for one partition if data_dir holds JAMS files its store
+    has not seen. Returns the (possibly reopened) sequences.
+    """
+    from src.data_preprocessing.data_preprocessing import preprocess_data
+
+    jams_files = {filename for filename in os.listdir(data_dir)
+                  if filename.endswith(".jams") and (not genre or genre.lower() in filename.lower())}
+    if jams_files - set(sequences.metadata.get("source_files", [])):
+        print(f"New JAMS files in {data_dir}, updating {data_path}")
+        preprocess_data(data_dir, data_path, genre)
+        sequences = open_sequences(data_path)
+    return sequences
+
+def train_model(genre=None, sequence_length=50, epochs=200, augmentation="random", seed=None, models_dir=None, data_dir=None,
+                warm_start_dir=None, learning_rate=0.001, embedding_dim=256, rnn_units=1536,
+                resume=True, checkpoint_every=1, incremental=False, profile_steps=None, profile_dir=None): # Increased max epochs
+    """
+    Trains the model and saves it. Data is read from data/ and the model saved to
+    models/ unless data_dir or models_dir are given.
+
+    augmentation is one of AUGMENTATION_MODES; transpositions are applied to each
+    batch while training (see build_training_data). With warm_start_dir, a genre
+    model is initialised from the all-genres model in that directory (see
+    warm_start_weights) and fine-tuned instead of trained from scratch. The
+    all-genres model never trains on the validation windows of the genre partitions
+    in data_dir, so the val_loss of a warm-started genre model stays held out, as
+    long as both use the same sequence_length and augmentation.
+
+    Every checkpoint_every epochs the model, optimizer and EarlyStopping state are
+    checkpointed to models_dir/checkpoints/<genre>/ (see checkpoint.py); with resume,
+    an interrupted run with the same configuration continues from its last checkpoint.
+
+    With incremental, JAMS files added to the data directory since the existing
+    model was trained are preprocessed and the existing model is fine-tuned on the
+    combined data (its vocabulary remapped if new notes appeared). Nothing is
+    trained if there is no new data.
+
+    Timings (data preparation, per-epoch throughput, step-time percentiles, validation
+    overhead, peak RSS) are written to the run log next to the model (see
+    instrumentation.py). profile_steps=(first, last) traces those training steps with
+    the TensorFlow profiler into profile_dir (default models_dir/profiles/<genre>/).
+
+    Returns:
+        dict: epochs run, best epoch, best val_loss and training seconds (None if
+        an incremental run found no new data).
+    """
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
     
     if genre:
@@ -39,49 +349,160 @@ def train_model(genre=None, sequence_length=50, epochs=200): # Increased max epo
         model_file = "guitar_solo_generator_all.h5"
         int_to_note_file = "int_to_note_all.json"
 
-    data_path = os.path.join(project_root, "data", data_file)
-    model_path = os.path.join(project_root, "models", model_file)
-    int_to_note_path = os.path.join(project_root, "models", int_to_note_file)
+    data_dir = data_dir or os.path.join(project_root, "data")
+    data_path = os.path.join(data_dir, data_file)
+    models_dir = models_dir or os.path.join(project_root, "models")
+    model_path = os.path.join(models_dir, model_file)
+    int_to_note_path = os.path.join(models_dir, int_to_note_file)
+    checkpoint_dir = os.path.join(models_dir, "checkpoints", genre.lower() if genre else "all")
 
     print(f"Loading sequences from {data_path}")
-    sequences = load_sequences(data_path)
+    data_start = time.perf_counter()
+    sequences = open_sequences(data_path)
+
+    # Fine-tune the existing model only if there is data it has not been trained on
+    fine_tune = incremental and os.path.exists(model_path) and os.path.exists(int_to_note_path)
+    if fine_tune:
+        sequences = _refresh_partition(data_dir, data_path, genre, sequences)
+        try:
+            with open(_training_info_path(model_path), 'r') as f:
+                trained_on = json.load(f)
+        except (OSError, ValueError):
+            trained_on = {}
+        new_files = set(sequences.metadata.get("source_files", [])) - set(trained_on.get("source_files", []))
+        if not new_files and trained_on.get("num_tokens") == len(sequences.tokens):
+            print(f"No new data for {genre if genre else 'all genres'}, {model_path} is up to date")
+            return None
+        print(f"Fine-tuning {model_path} on {len(new_files)} new source files")
     
-    # Create a vocabulary of unique notes
-    notes = sorted(list(set(note for seq in sequences for note in seq)))
-    note_to_int = {note: i for i, note in enumerate(notes)}
-    vocab_size = len(notes)
+    # The all-genres model leaves out the windows the genre models validate on (see build_training_data)
+    held_out_genres = []
+    if not genre:
+        held_out_genres = [name for name in GENRES
+                           if os.path.exists(os.path.join(data_dir, f"processed_sequences_{name.lower()}.txt"))]
+    held_out_of = [open_sequences(os.path.join(data_dir, f"processed_sequences_{name.lower()}.txt")) for name in held_out_genres]
 
-    # Create input and output sequences
-    input_sequences = []
-    output_notes = []
-    for seq in sequences:
-        if len(seq) > sequence_length:
-            for i in range(len(seq) - sequence_length):
-                input_sequences.append([note_to_int[note] for note in seq[i:i+sequence_length-1]])
-                output_notes.append(note_to_int[seq[i+sequence_length-1]])
+    open_seconds = time.perf_counter() - data_start
+    build_start = time.perf_counter()
+    notes, train_batches, validation_batches = build_training_data(sequences, sequence_length, augmentation, seed=seed,
+                                                                   held_out_of=held_out_of)
+    build_seconds = time.perf_counter() - build_start
+    vocab_size = len(notes)
 
-    X = np.array(input_sequences)
-    y = to_categorical(np.array(output_notes), num_classes=vocab_size)
+    # The mapping of the existing model stays in place until the new model is saved,
+    # so an interrupted incremental run still finds the notes the old model was trained on
+    previous_notes = _load_notes(int_to_note_path) if fine_tune else None
 
-    # Save the note-to-int mapping
-    int_to_note = {i: n for i, n in enumerate(notes)}
-    with open(int_to_note_path, 'w') as f:
-        json.dump(int_to_note, f)
+    # Define EarlyStopping callback
+    early_stopping = ResumableEarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
 
-    model = create_model(vocab_size, 256, 1536, sequence_length)
+    # A checkpoint is only resumed by a run that would train the very same model
+    config = {"genre": genre, "sequence_length": sequence_length, "augmentation": augmentation, "seed": seed,
+              "notes": notes, "num_tokens": int(len(sequences.tokens)), "learning_rate": learning_rate,
+              "embedding_dim": embedding_dim, "rnn_units": rnn_units, "held_out_genres": held_out_genres,
+              "init": "incremental" if fine_tune else "warm_start" if warm_start_dir and genre else "scratch"}
+    checkpoint = load_checkpoint(checkpoint_dir, config) if resume else None
+    initial_epoch = 0
+    if checkpoint:
+        state, model, best_weights, order = checkpoint
+        initial_epoch = state["epoch"]
+        early_stopping.restore(state["early_stopping"], best_weights)
+        if order is not None:
+            train_batches.restore(order, state["rng"])
+        elif state["rng"]:
+            # Checkpoints written before the order was saved only have the RNG state
+            train_batches.rng.bit_generator.state = state["rng"]
+            train_batches.on_epoch_end()
+        print(f"Resuming from the checkpoint of epoch {initial_epoch} in {checkpoint_dir}")
+    else:
+        clear_checkpoint(checkpoint_dir)
+        model = create_model(vocab_size, embedding_dim, rnn_units, sequence_length, learning_rate)
+        if fine_tune:
+            model.build((None, sequence_length - 1))
+            warm_start_weights(model, load_model(model_path, compile=False), previous_notes, notes)
+        elif warm_start_dir and genre:
+            source_model = load_model(os.path.join(warm_start_dir, "guitar_solo_generator_all.h5"), compile=False)
+            source_notes = _load_notes(os.path.join(warm_start_dir, "int_to_note_all.json"))
+            model.build((None, sequence_length - 1))
+            shared = warm_start_weights(model, source_model, source_notes, notes)
+            print(f"Warm-started from the all-genres model ({shared}/{vocab_size} notes shared)")
     print(f"Training model for {genre if genre else 'all genres'}...")
-    
-    # Define EarlyStopping callback
-    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
 
-    model.fit(X, y, epochs=epochs, batch_size=64, validation_split=0.2, callbacks=[early_stopping])
-    model.save(model_path)
+    run_info = {"config": {key: value for key, value in config.items() if key != "notes"}, "vocab_size": vocab_size,
+                "initial_epoch": initial_epoch, "data": {"open_seconds": open_seconds, "build_seconds": build_seconds,
+                "train_windows": int(len(train_batches.starts)), "validation_windows": int(len(validation_batches.starts))}}
+    if profile_steps:
+        profile_dir = profile_dir or os.path.join(models_dir, "profiles", genre.lower() if genre else "all")
+    instrumentation = TrainingInstrumentation(model_path, run_info, train_batches.batch_size, profile_steps, profile_dir)
+    callbacks = [early_stopping, TrainingCheckpoint(checkpoint_dir, config, early_stopping, train_batches, checkpoint_every),
+                 instrumentation]
+    start = time.perf_counter()
+    # WindowBatches shuffles the windows itself; Keras' own (unseeded) shuffling of the
+    # batch order would make a resumed run visit them in a different order
+    history = model.fit(train_batches, epochs=epochs, initial_epoch=initial_epoch, validation_data=validation_batches,
+                        callbacks=callbacks, shuffle=False)
+    seconds = time.perf_counter() - start
+    # Both files are written aside and then renamed over the old ones, model first
+    tmp_model_path = os.path.splitext(model_path)[0] + ".tmp.h5"
+    model.save(tmp_model_path)
+    with open(int_to_note_path + ".tmp", 'w') as f:
+        json.dump({i: n for i, n in enumerate(notes)}, f)
+    os.replace(tmp_model_path, model_path)
+    os.replace(int_to_note_path + ".tmp", int_to_note_path)
     print(f"Model saved to {model_path}")
 
+    epochs_run = initial_epoch + len(history.history.get('loss', []))
+    if early_stopping.best is not None:
+        summary = {"epochs": epochs_run, "best_epoch": early_stopping.best_epoch + 1,
+                   "val_loss": float(early_stopping.best), "seconds": seconds}
+    else:
+        summary = {"epochs": epochs_run, "best_epoch": epochs_run, "val_loss": float('nan'), "seconds": seconds}
+    with open(_training_info_path(model_path), 'w') as f:
+        json.dump({"source_files": sequences.metadata.get("source_files", []), "num_tokens": int(len(sequences.tokens)),
+                   "sequence_length": sequence_length, "augmentation": augmentation, "init": config["init"], "held_out_genres": held_out_genres, "summary": summary,
+                   "run_log": os.path.basename(run_log_paths(model_path)[0])}, f, indent=2)
+    clear_checkpoint(checkpoint_dir)
+    print(f"Best val_loss {summary['val_loss']:.4f} at epoch {summary['best_epoch']} of {summary['epochs']}, {seconds:.0f}s")
+    return summary
+
 if __name__ == '__main__':
-    genres = ["Rock", "Jazz", "Funk", "BN", "SS"]
-    for genre_name in genres:
-        train_model(genre=genre_name, epochs=200) # Max epochs for EarlyStopping
-    
-    # Train a model for all genres as well
-    train_model(genre=None, epochs=200) # Max epochs for EarlyStopping
+    parser = argparse.ArgumentParser(description="Train the genre models and the all-genres model.")
+    parser.add_argument("--augmentation", choices=AUGMENTATION_MODES, default="random",
+                        help="Transposition augmentation; 'exhaustive' reproduces the previous training data.")
+    parser.add_argument("--genres", nargs="+", default=GENRES + ["all"],
+                        help="Models to train, one after another ('all' is the all-genres model).")
+    parser.add_argument("--epochs", type=int, default=200, help="Max epochs for EarlyStopping.")
+    parser.add_argument("--models-dir", help="Where to save the models (default: models/).")
+    parser.add_argument("--data-dir", help="Where the processed sequences are (default: data/).")
+    parser.add_argument("--warm-start", nargs="?", const="", metavar="MODELS_DIR",
+                        help="Initialise genre models from the all-genres model in MODELS_DIR (default: the models "
+                             "directory). If 'all' is among the genres it is trained first.")
+    parser.add_argument("--learning-rate", type=float, default=0.001)
+    parser.add_argument("--restart", action="store_true", help="Discard existing checkpoints instead of resuming from them.")
+    parser.add_argument("--checkpoint-every", type=int, default=1, help="Checkpoint every N epochs.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fine-tune the existing models on JAMS files added to the data directory since they were trained.")
+    parser.add_argument("--profile-steps", type=int, nargs=2, metavar=("FIRST", "LAST"),
+                        help="Trace these training steps (counted from 1 across epochs) with the TensorFlow profiler.")
+    parser.add_argument("--profile-dir", help="Where to write the profiler trace (default: models/profiles/<genre>/).")
+    parser.add_argument("--intra-op-threads", type=int, default=0, help="TensorFlow intra-op threads (0: TensorFlow default).")
+    parser.add_argument("--inter-op-threads", type=int, default=0, help="TensorFlow inter-op threads (0: TensorFlow default).")
+    args = parser.parse_args()
+
+    # Must happen before TensorFlow runs its first op
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(args.intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(args.inter_op_threads)
+
+    genre_names = {genre.lower(): genre for genre in GENRES}
+    genres = [None if name.lower() == "all" else genre_names.get(name.lower(), name) for name in args.genres]
+    warm_start_dir = None
+    if args.warm_start is not None:
+        warm_start_dir = args.warm_start or args.models_dir or os.path.join(project_root, "models")
+        # The genre models start from the all-genres model, so it goes first
+        genres.sort(key=lambda genre: genre is not None)
+    for genre in genres:
+        train_model(genre=genre, epochs=args.epochs, augmentation=args.augmentation, models_dir=args.models_dir,
+                    data_dir=args.data_dir, warm_start_dir=warm_start_dir, learning_rate=args.learning_rate,
+                    resume=not args.restart, checkpoint_every=args.checkpoint_every, incremental=args.incremental,
+                    profile_steps=args.profile_steps, profile_dir=args.profile_dir)
@@ -0,0 +1,237 @@
+"""
+Trains the genre models and the all-genres model concurrently, one process per model.
+
+Each job runs modeling.py for a single model with its own share of the CPU: the
+TensorFlow intra-op threads are split across the jobs running together in
+proportion to the number of training tokens, so the large "all" model gets most
+cores while the small genres still finish early; with --max-parallel, a queued job
+takes over the cores of the job it replaces. Every job trains into its own run directory
+
+    models/runs/<job>/    train.log, status.json and the freshly trained artefacts
+
+and its .h5 and int_to_note files are only moved to models/ once it succeeds.
+Rerunning the orchestrator skips jobs whose last run succeeded with the same
+settings on the same data, so after a failure only the failed (or stale) jobs run.
+
+    python src/modeling/train_all.py
+    python src/modeling/train_all.py --genres Rock all --force
+    python src/modeling/train_all.py --warm-start    # "all" first, then the genres fine-tuned from it
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import subprocess
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from src.data_preprocessing.sequence_store import store_path_for
+
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS"]
+DEFAULT_MODELS_DIR = os.path.join(project_root, "models")
+DEFAULT_DATA_DIR = os.path.join(project_root, "data")
+MODELING_SCRIPT = os.path.join(project_root, "src", "modeling", "modeling.py")
+
+def job_name(genre):
+    """Job/file name of a genre ('all' for the all-genres model)."""
+    return genre.lower() if genre else "all"
+
+def artefact_names(genre):
+    name = job_name(genre)
+    return [f"guitar_solo_generator_{name}.h5", f"int_to_note_{name}.json"]
+
+def data_fingerprint(genre, data_dir=DEFAULT_DATA_DIR):
+    """Identifies the training data of a job: size and modification time of its store (or text file)."""
+    text_path = os.path.join(data_dir, f"processed_sequences_{job_name(genre)}.txt")
+    store_path = store_path_for(text_path)
+    if os.path.exists(store_path):
+        with open(os.path.join(store_path, "metadata.json"), 'r') as f:
+            metadata = json.load(f)
+        return {"path": store_path, "num_tokens": metadata["num_tokens"],
+                "mtime": os.path.getmtime(os.path.join(store_path, "tokens.npy"))}
+    if os.path.exists(text_path):
+        return {"path": text_path, "num_bytes": os.path.getsize(text_path), "mtime": os.path.getmtime(text_path)}
+    raise FileNotFoundError(f"No processed sequences for '{job_name(genre)}' in {data_dir}, run data_preprocessing.py first")
+
+def dataset_size(fingerprint):
+    """Relative amount of training data, used to share the cores."""
+    return fingerprint.get("num_tokens") or fingerprint.get("num_bytes") or 1
+
+def allocate_threads(sizes, cores=None):
+    """
+    Splits the cores among jobs in proportion to their dataset size.
+
+    Args:
+        sizes (dict): Job name -> dataset size.
+        cores (int): Cores to share; defaults to os.cpu_count().
+
+    Returns:
+        dict: Job name -> (intra-op threads, inter-op threads), at least one each.
+    """
+    cores = cores or os.cpu_count() or 1
+    total = sum(sizes.values()) or 1
+    threads = {}
+    for name, size in sizes.items():
+        intra = max(1, int(cores * size / total))
+        # A second inter-op thread only pays off for jobs with several cores
+        threads[name] = (intra, 2 if intra >= 4 else 1)
+    return threads
+
+def _read_status(run_dir):
+    try:
+        with open(os.path.join(run_dir, "status.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_status(run_dir, status):
+    tmp_path = os.path.join(run_dir, "status.json.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, os.path.join(run_dir, "status.json"))
+
+def is_up_to_date(genre, settings, fingerprint, models_dir=DEFAULT_MODELS_DIR):
+    """True if the job's last run succeeded with these settings on this data and its artefacts are in place."""
+    status = _read_status(os.path.join(models_dir, "runs", job_name(genre)))
+    if not status or status.get("state") != "succeeded":
+        return False
+    if status.get("settings") != settings or status.get("data") != fingerprint:
+        return False
+    return all(os.path.exists(os.path.join(models_dir, name)) for name in artefact_names(genre))
+
+def _publish(genre, run_dir, models_dir):
+    # os.replace is atomic, so the backend never sees a half-copied model. The
+    # .training.json sidecar follows when there is one (incremental training and
+    # evaluate_likelihood read it) but isn't required for a job to be up to date
+    sidecar = f"guitar_solo_generator_{job_name(genre)}.training.json"
+    names = artefact_names(genre) + ([sidecar] if os.path.exists(os.path.join(run_dir, sidecar)) else [])
+    for name in names:
+        tmp_path = os.path.join(models_dir, name + ".tmp")
+        shutil.copyfile(os.path.join(run_dir, name), tmp_path)
+        os.replace(tmp_path, os.path.join(models_dir, name))
+
+def run_jobs(genres, epochs=200, augmentation="random", models_dir=DEFAULT_MODELS_DIR, data_dir=DEFAULT_DATA_DIR,
+             max_parallel=None, cores=None, force=False, warm_start=False):
+    """
+    Trains the given models (None is the all-genres model) concurrently.
+
+    Jobs are started largest first, at most max_parallel at a time (default: all);
+    the jobs started together split the cores left free by the running ones, so a
+    job started when another finishes gets the cores it released.
+    With warm_start, genre models are initialised from the all-genres model in
+    models_dir, which is trained first when it is among the jobs; a genre job is
+    stale whenever that model changed.
+    Returns a dict job name -> status (state, seconds, returncode, threads, ...).
+    """
+    if warm_start and None in genres and len(genres) > 1:
+        results = run_jobs([None], epochs, augmentation, models_dir, data_dir, max_parallel, cores, force)
+        if results["all"].get("state") != "succeeded":
+            return results
+        results.update(run_jobs([genre for genre in genres if genre is not None], epochs, augmentation, models_dir,
+                                data_dir, max_parallel, cores, force, warm_start))
+        return results
+
+    base_settings = {"epochs": epochs, "augmentation": augmentation}
+    all_model_path = os.path.join(models_dir, artefact_names(None)[0])
+    settings, fingerprints = {}, {}
+    for genre in genres:
+        name = job_name(genre)
+        settings[name] = base_settings
+        fingerprints[name] = data_fingerprint(genre, data_dir)
+        if warm_start and genre:
+            if not os.path.exists(all_model_path):
+                raise FileNotFoundError(f"Warm start needs the all-genres model: {all_model_path}")
+            settings[name] = dict(base_settings, warm_start=True)
+            fingerprints[name] = dict(fingerprints[name], warm_start_mtime=os.path.getmtime(all_model_path))
+    pending = [genre for genre in genres
+               if force or not is_up_to_date(genre, settings[job_name(genre)], fingerprints[job_name(genre)], models_dir)]
+    results = {job_name(genre): dict(_read_status(os.path.join(models_dir, "runs", job_name(genre))) or {}, skipped=True)
+               for genre in genres if genre not in pending}
+    if not pending:
+        return results
+
+    cores = cores or os.cpu_count() or 1
+    queue = sorted(pending, key=lambda genre: dataset_size(fingerprints[job_name(genre)]), reverse=True)
+    max_parallel = max_parallel or len(queue)
+    running = {}
+
+    def start(genre, intra, inter):
+        name = job_name(genre)
+        run_dir = os.path.join(models_dir, "runs", name)
+        os.makedirs(run_dir, exist_ok=True)
+        command = [sys.executable, MODELING_SCRIPT, "--genres", name, "--epochs", str(epochs),
+                   "--augmentation", augmentation, "--models-dir", run_dir, "--data-dir", data_dir,
+                   "--intra-op-threads", str(intra), "--inter-op-threads", str(inter)]
+        if "warm_start" in settings[name]:
+            command += ["--warm-start", models_dir]
+        # NumPy's BLAS and OpenMP would otherwise start one thread per core in every job
+        env = dict(os.environ, OMP_NUM_THREADS=str(intra), OPENBLAS_NUM_THREADS=str(intra), MKL_NUM_THREADS=str(intra))
+        log = open(os.path.join(run_dir, "train.log"), 'w')
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env, cwd=project_root)
+        status = {"state": "running", "settings": settings[name], "data": fingerprints[name],
+                  "threads": {"intra_op": intra, "inter_op": inter}, "pid": process.pid, "started": time.time()}
+        _write_status(run_dir, status)
+        running[name] = (genre, process, log, run_dir, status)
+        print(f"Started {name} (pid {process.pid}, {intra} intra-op / {inter} inter-op threads)")
+
+    while queue or running:
+        if queue and len(running) < max_parallel:
+            # TensorFlow fixes its thread pools at start-up, so the jobs starting now share
+            # the cores the running ones leave free
+            starting = queue[:max_parallel - len(running)]
+            del queue[:len(starting)]
+            busy = sum(status["threads"]["intra_op"] for _, _, _, _, status in running.values())
+            threads = allocate_threads({job_name(genre): dataset_size(fingerprints[job_name(genre)]) for genre in starting},
+                                       max(cores - busy, len(starting)))
+            for genre in starting:
+                start(genre, *threads[job_name(genre)])
+        time.sleep(1)
+        for name, (genre, process, log, run_dir, status) in list(running.items()):
+            if process.poll() is None:
+                continue
+            log.close()
+            del running[name]
+            status.update(returncode=process.returncode, seconds=time.time() - status["started"])
+            status.pop("pid")
+            if process.returncode == 0:
+                _publish(genre, run_dir, models_dir)
+                status["state"] = "succeeded"
+            else:
+                status["state"] = "failed"
+            _write_status(run_dir, status)
+            results[name] = status
+            print(f"{name} {status['state']} in {status['seconds']:.0f}s (log: {os.path.join(run_dir, 'train.log')})")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Train all genre models concurrently, resuming failed or stale jobs.")
+    parser.add_argument("--genres", nargs="+", default=GENRES + ["all"], help="Models to train ('all' is the all-genres model).")
+    parser.add_argument("--epochs", type=int, default=200)
+    # modeling.AUGMENTATION_MODES, not imported to keep TensorFlow out of the orchestrator
+    parser.add_argument("--augmentation", choices=["random", "exhaustive", "none"], default="random")
+    parser.add_argument("--models-dir", default=DEFAULT_MODELS_DIR)
+    parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR)
+    parser.add_argument("--max-parallel", type=int, help="Maximum concurrent jobs (default: all of them).")
+    parser.add_argument("--cores", type=int, help="Cores to share among jobs (default: all).")
+    parser.add_argument("--force", action="store_true", help="Retrain even the jobs that are up to date.")
+    parser.add_argument("--warm-start", action="store_true", help="Fine-tune the genre models from the all-genres model.")
+    args = parser.parse_args()
+
+    genres = [None if genre.lower() == "all" else genre for genre in args.genres]
+    start = time.time()
+    results = run_jobs(genres, args.epochs, args.augmentation, args.models_dir, args.data_dir,
+                       args.max_parallel, args.cores, args.force, args.warm_start)
+    wall_clock = time.time() - start
+
+    print(f"{'job':>6} {'state':>10} {'seconds':>8}")
+    for name, status in results.items():
+        state = "skipped" if status.get("skipped") else status.get("state", "?")
+        print(f"{name:>6} {state:>10} {status.get('seconds', 0):>8.0f}")
+    trained = [status["seconds"] for status in results.values() if not status.get("skipped") and "seconds" in status]
+    if trained:
+        print(f"Wall clock {wall_clock:.0f}s, sum of job times {sum(trained):.0f}s")
+    sys.exit(1 if any(status.get("state") == "failed" for status in results.values()) else 0)
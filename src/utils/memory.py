@@ -0,0 +1,15 @@
+"""Memory measurements shared by the training instrumentation and the benchmarks."""
+
+def peak_rss_mb():
+    """Peak resident set size of the current process, in MB."""
+    # VmHWM is reset on exec, unlike ru_maxrss which a fresh interpreter inherits
+    # from the (TensorFlow-loaded) parent on Linux
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Add the project root to sys.path to allow absolute imports
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+@pytest.fixture(scope="session")
+def keras_model():
+    """A small create_model network with random (non-zero) weights."""
+    from src.modeling.modeling import create_model
+
+    model = create_model(24, 8, 16, 50)
+    model.build((None, 49))
+    rng = np.random.default_rng(0)
+    model.set_weights([rng.normal(0, 0.5, w.shape).astype(np.float32) for w in model.get_weights()])
+    return model
@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+import pytest
+
+from src.generation.batch_scheduler import BatchScheduler
+from src.generation.model_registry import ModelHandle
+
+SEED_NOTES = "E2 G2 A2"
+
+@pytest.fixture
+def scheduler(keras_model):
+    # Vocabulary of the fixture model: MIDI notes 40 (E2) to 63
+    handle = ModelHandle("Rock", keras_model, {str(i): 40 + i for i in range(24)}, None, None, None)
+    scheduler = BatchScheduler(lambda genre, tier="full": handle, max_batch_size=8, max_wait=0.05, idle_timeout=0.2)
+    yield scheduler
+    scheduler.shutdown()
+
+def _workers():
+    return [thread for thread in threading.enumerate() if thread.name.startswith("batch-scheduler")]
+
+@pytest.mark.parametrize("genre, options", [
+    ("Nope", {}), ("Rock", {"tier": "bogus"}), ("Rock", {"top_p": 2.0}), ("Rock", {"temperature": 0}),
+])
+def test_invalid_requests_are_rejected_before_a_worker_starts(scheduler, genre, options):
+    workers = len(_workers())
+    with pytest.raises(ValueError):
+        scheduler.submit(genre, SEED_NOTES, 10, **options)
+    assert len(_workers()) == workers
+
+def test_a_bad_seed_fails_only_its_own_job(scheduler):
+    futures = [scheduler.submit("Rock", SEED_NOTES, 12, rng=np.random.default_rng(0)),
+               scheduler.submit("Rock", "C8", 12),
+               scheduler.submit("Rock", "E2", 12, rng=np.random.default_rng(1))]
+    assert len(futures[0].result(timeout=30)) == 12
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=30)
+    assert len(futures[2].result(timeout=30)) == 12
+
+def test_generated_notes_come_from_the_vocabulary(scheduler):
+    notes = scheduler.submit("Rock", SEED_NOTES, 30, top_k=5).result(timeout=30)
+    assert all(40 <= note < 64 for note in notes)
+
+def test_cancelled_jobs_leave_the_batch(scheduler):
+    cancelled = scheduler.submit("Rock", SEED_NOTES, 100000)
+    other = scheduler.submit("Rock", SEED_NOTES, 10)
+    assert cancelled.cancel() or cancelled.done()
+    assert len(other.result(timeout=30)) == 10
+
+def test_idle_workers_exit_and_restart_on_demand(scheduler):
+    scheduler.submit("Rock", SEED_NOTES, 5).result(timeout=30)
+    for worker in list(scheduler._workers.values()):
+        worker.join(timeout=5)
+    assert not scheduler._workers
+    assert len(scheduler.submit("Rock", SEED_NOTES, 5).result(timeout=30)) == 5
+
+def test_stats_can_be_read_while_workers_come_and_go(scheduler):
+    errors = []
+    done = threading.Event()
+
+    def poll():
+        while not done.is_set():
+            try:
+                scheduler.stats()
+            except Exception as e:
+                errors.append(e)
+
+    poller = threading.Thread(target=poll)
+    poller.start()
+    try:
+        for tier in ("full", "fast") * 3:
+            futures = [scheduler.submit("Rock", SEED_NOTES, 8, tier=tier) for _ in range(4)]
+            for future in futures:
+                future.result(timeout=30)
+    finally:
+        done.set()
+        poller.join()
+    assert not errors
+    stats = scheduler.stats()
+    assert stats["completed"] == 24
+    assert stats["steps"] > 0 and 1 <= stats["avg_batch_size"] <= scheduler.max_batch_size
+    assert stats["queued"] == 0
+
+def test_on_note_sees_every_note_before_the_result(scheduler):
+    streamed = []
+    failing = scheduler.submit("Rock", SEED_NOTES, 20, on_note=lambda note: 1 / 0)
+    future = scheduler.submit("Rock", SEED_NOTES, 20, on_note=streamed.append)
+    assert future.result(timeout=30) == streamed
+    with pytest.raises(ZeroDivisionError):
+        failing.result(timeout=30)
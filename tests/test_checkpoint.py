@@ -0,0 +1,51 @@
+import numpy as np
+
+from src.modeling.checkpoint import ResumableEarlyStopping, TrainingCheckpoint, load_checkpoint
+from src.modeling.modeling import WindowBatches, create_model
+
+SEQUENCE_LENGTH = 6
+
+class RecordingBatches(WindowBatches):
+    """WindowBatches that remember every batch Keras asks for."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen = []
+
+    def __getitem__(self, index):
+        inputs, targets = super().__getitem__(index)
+        self.seen.append(np.concatenate([inputs, targets[:, np.newaxis]], axis=1))
+        return inputs, targets
+
+def _batches():
+    tokens = np.random.default_rng(0).integers(50, 70, size=60)
+    lookup = np.zeros(128, dtype=np.int64)
+    lookup[40:80] = np.arange(40)
+    # Random transpositions, so the RNG is drawn from between shuffles too
+    return RecordingBatches(tokens, np.arange(len(tokens) - SEQUENCE_LENGTH + 1), lookup, SEQUENCE_LENGTH,
+                            transpositions=[-2, 0, 2], batch_size=8, seed=0)
+
+def _fit(batches, epochs, callbacks, model=None, initial_epoch=0):
+    model = model or create_model(40, 4, 8, SEQUENCE_LENGTH)
+    model.fit(batches, epochs=epochs, initial_epoch=initial_epoch, callbacks=callbacks, shuffle=False, verbose=0)
+
+def test_resumed_training_sees_the_batches_of_an_uninterrupted_run(tmp_path):
+    config = {"test": True}
+    uninterrupted = _batches()
+    _fit(uninterrupted, 3, [ResumableEarlyStopping(monitor="loss", patience=10)])
+
+    interrupted = _batches()
+    early_stopping = ResumableEarlyStopping(monitor="loss", patience=10)
+    _fit(interrupted, 1, [early_stopping, TrainingCheckpoint(str(tmp_path), config, early_stopping, interrupted)])
+
+    state, model, best_weights, order = load_checkpoint(str(tmp_path), config)
+    resumed = _batches()
+    resumed.restore(order, state["rng"])
+    early_stopping = ResumableEarlyStopping(monitor="loss", patience=10)
+    early_stopping.restore(state["early_stopping"], best_weights)
+    _fit(resumed, 3, [early_stopping], model=model, initial_epoch=state["epoch"])
+
+    epoch_batches = 2 * len(resumed)
+    assert len(resumed.seen) > epoch_batches
+    np.testing.assert_array_equal(np.concatenate(resumed.seen[-epoch_batches:]),
+                                  np.concatenate(uninterrupted.seen[-epoch_batches:]))
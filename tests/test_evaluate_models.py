@@ -0,0 +1,35 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.analysis.evaluate_models import analyze_original_data_metrics
+
+GENRES = ["Rock", "Jazz", "Funk", "BN", "SS"]
+
+def _write_jams(path, notes):
+    annotations = [{"namespace": "note_midi", "data": [{"value": float(note)} for note in notes]}]
+    with open(path, "w") as f:
+        json.dump({"annotations": annotations}, f)
+
+@pytest.fixture
+def data_dir(tmp_path):
+    rng = np.random.default_rng(0)
+    # Sorted file names list SS and Jazz before Rock, unlike the genres
+    for i, genre in enumerate(["SS", "Jazz", "Rock", "Funk", "SS", "Rock", "Jazz", "BN"]):
+        low = int(rng.integers(40, 70))
+        _write_jams(tmp_path / f"{i:02d}_{genre}{i}-100-X_solo.jams", rng.integers(low, low + 12, size=rng.integers(20, 200)))
+    _write_jams(tmp_path / "08_Rock9-100-X_empty.jams", [])
+    (tmp_path / "09_Jazz9-100-X_broken.jams").write_text("{not json")
+    return tmp_path
+
+def test_pool_and_serial_give_the_same_results_in_genre_order(data_dir):
+    serial = analyze_original_data_metrics(str(data_dir), GENRES, workers=1)
+    pooled = analyze_original_data_metrics(str(data_dir), GENRES, workers=3)
+
+    assert list(serial) == list(pooled) == GENRES
+    assert serial == pooled
+
+def test_genres_without_files_are_left_out(data_dir):
+    results = analyze_original_data_metrics(str(data_dir), ["Metal", "Rock", "Jazz"], workers=1)
+    assert list(results) == ["Rock", "Jazz"]
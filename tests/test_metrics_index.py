@@ -0,0 +1,103 @@
+import os
+import sqlite3
+
+import numpy as np
+import pytest
+
+from src.analysis.metrics_index import MetricsIndex
+from src.analysis.network_analyzer import METRICS, analyze_midi_sequence_as_network
+from src.generation.generate import midi_bytes
+
+def _notes(seed, length=45):
+    rng = np.random.default_rng(seed)
+    return rng.integers(55, 70, size=length).tolist()
+
+def _save(directory, filename, notes):
+    data = midi_bytes(notes)
+    with open(os.path.join(directory, filename), "wb") as f:
+        f.write(data)
+    return data
+
+@pytest.fixture
+def output_dir(tmp_path):
+    directory = tmp_path / "output"
+    directory.mkdir()
+    return str(directory)
+
+@pytest.fixture
+def index(tmp_path):
+    return MetricsIndex(str(tmp_path / "metrics.sqlite"))
+
+def test_update_analyses_new_files_once(index, output_dir):
+    notes = {"rock_solo_a.mid": _notes(0), "jazz_solo_b.mid": _notes(1, 30)}
+    for filename, sequence in notes.items():
+        _save(output_dir, filename, sequence)
+
+    analysed = index.update(output_dir)
+    assert set(analysed) == set(notes)
+    for filename, sequence in notes.items():
+        assert analysed[filename] == pytest.approx(analyze_midi_sequence_as_network(sequence))
+    assert index.update(output_dir) == {}
+
+    # A modified file is analysed again; a copy of indexed content reuses its metrics
+    _save(output_dir, "rock_solo_a.mid", _notes(2))
+    _save(output_dir, "rock_solo_c.mid", notes["jazz_solo_b.mid"])
+    analysed = index.update(output_dir)
+    assert set(analysed) == {"rock_solo_a.mid", "rock_solo_c.mid"}
+    assert analysed["rock_solo_c.mid"] == pytest.approx(analyze_midi_sequence_as_network(notes["jazz_solo_b.mid"]))
+
+def test_aggregate_groups_by_recorded_parameters(index, output_dir):
+    sequences = [_notes(seed) for seed in range(4)]
+    for i, (sequence, temperature) in enumerate(zip(sequences, [0.5, 0.5, 1.0, 1.0])):
+        data = _save(output_dir, f"rock_solo_{i}.mid", sequence)
+        index.record_generation(f"rock_solo_{i}.mid", data, {"genre": "Rock", "tier": "full", "temperature": temperature})
+    _save(output_dir, "jazz_solo_x.mid", _notes(9))
+    index.update(output_dir)
+
+    groups = index.aggregate(("genre", "temperature"))
+    assert [(g["genre"], g["temperature"], g["count"]) for g in groups] == [("jazz", None, 1), ("rock", 0.5, 2), ("rock", 1.0, 2)]
+    expected = [analyze_midi_sequence_as_network(sequence) for sequence in sequences[:2]]
+    for name in METRICS:
+        assert groups[1][name] == pytest.approx(np.mean([metrics[name] for metrics in expected]))
+    assert [g["count"] for g in index.aggregate((), genre="Rock")] == [4]
+    with pytest.raises(ValueError):
+        index.aggregate(("seed",))
+
+def test_unreadable_files_are_not_counted(index, output_dir):
+    _save(output_dir, "rock_solo_good.mid", _notes(0))
+    with open(os.path.join(output_dir, "rock_solo_bad.mid"), "wb") as f:
+        f.write(b"not a midi file")
+
+    analysed = index.update(output_dir)
+    assert analysed["rock_solo_bad.mid"] is None
+    [group] = index.aggregate(("genre",))
+    assert group["count"] == 1
+    assert group["sequence_length"] == 45
+    # Not read again until it changes, and analysed once it is readable
+    assert index.update(output_dir) == {}
+    _save(output_dir, "rock_solo_bad.mid", _notes(1))
+    assert index.update(output_dir)["rock_solo_bad.mid"] is not None
+    assert index.aggregate(("genre",))[0]["count"] == 2
+
+def test_indexes_without_the_error_column_are_migrated(index, output_dir, tmp_path):
+    _save(output_dir, "rock_solo_good.mid", _notes(0))
+    with open(os.path.join(output_dir, "rock_solo_bad.mid"), "wb") as f:
+        f.write(b"not a midi file")
+    index.update(output_dir)
+    # What an older version left behind: the unreadable file scored as an empty solo
+    with sqlite3.connect(index.db_path) as conn:
+        conn.execute(f"UPDATE solos SET {', '.join(f'{name} = 0' for name in METRICS)}, analyzed_at = 1 "
+                     "WHERE filename = 'rock_solo_bad.mid'")
+        conn.execute("ALTER TABLE solos DROP COLUMN error")
+
+    migrated = MetricsIndex(index.db_path)
+    assert migrated.aggregate(("genre",))[0]["count"] == 1
+    assert migrated.update(output_dir) == {"rock_solo_bad.mid": None}
+
+def test_prune_drops_rows_of_removed_files(index, output_dir):
+    _save(output_dir, "rock_solo_a.mid", _notes(0))
+    _save(output_dir, "rock_solo_b.mid", _notes(1))
+    index.update(output_dir)
+    os.remove(os.path.join(output_dir, "rock_solo_a.mid"))
+    assert index.prune(output_dir) == 1
+    assert index.aggregate(())[0]["count"] == 1
@@ -0,0 +1,50 @@
+import networkx as nx
+import pytest
+from scipy import sparse
+
+# network_analysis imports them at module level (plots, MIDI parsing)
+pytest.importorskip("matplotlib")
+pytest.importorskip("music21")
+
+from src.analysis.network_analysis import get_graph_metrics, sequence_to_adjacency, sequence_to_graph
+
+def _disconnected():
+    # Two melodies over disjoint notes, one with a self-loop, and an isolated note
+    G = nx.union(sequence_to_graph([60, 62, 64, 62, 60, 67]), sequence_to_graph([40, 40, 43, 45, 40]))
+    G.add_node(100)
+    return G
+
+GRAPHS = {
+    "melody": sequence_to_graph([60, 62, 64, 60, 65, 64, 62, 60, 67, 69, 67, 65]),
+    "self_loops": sequence_to_graph([60, 60, 60, 62, 62, 64, 64, 60, 62, 62]),
+    "single_note": sequence_to_graph([60, 60]),
+    "disconnected": _disconnected(),
+    "undirected": sequence_to_graph([60, 60, 62, 64, 62, 65, 60]).to_undirected(),
+}
+
+@pytest.mark.parametrize("name", GRAPHS)
+def test_sparse_metrics_match_networkx(name):
+    G = GRAPHS[name]
+    assert get_graph_metrics(G, backend="sparse") == pytest.approx(get_graph_metrics(G, backend="networkx"), abs=1e-12)
+
+@pytest.mark.parametrize("sequence", [[60, 62, 64, 60, 65, 64, 62, 60, 60], [60, 60, 60, 62, 62, 60], [60]])
+def test_adjacency_input_matches_the_networkx_graph(sequence):
+    adjacency, notes = sequence_to_adjacency(sequence)
+    assert notes == sorted(set(sequence))
+    expected = get_graph_metrics(sequence_to_graph(sequence), backend="networkx")
+    assert get_graph_metrics(adjacency, backend="sparse") == pytest.approx(expected, abs=1e-12)
+    assert get_graph_metrics(adjacency, backend="networkx") == pytest.approx(expected, abs=1e-12)
+
+def test_disconnected_adjacency_matches_networkx():
+    # Block-diagonal sum of two sequence graphs: two components, self-loops in both
+    first, _ = sequence_to_adjacency([60, 60, 62, 64, 60])
+    second, _ = sequence_to_adjacency([40, 43, 43, 45, 43, 40])
+    adjacency = sparse.csr_array(sparse.block_diag((first, second)))
+    expected = get_graph_metrics(nx.from_scipy_sparse_array(adjacency, create_using=nx.DiGraph), backend="networkx")
+    assert get_graph_metrics(adjacency, backend="sparse") == pytest.approx(expected, abs=1e-12)
+
+def test_sampling_every_source_is_exact():
+    G = _disconnected()
+    sampled = get_graph_metrics(G, backend="sparse", sample_sources=len(G), seed=0)
+    assert sampled.pop("avg_path_length_error") == 0
+    assert sampled == pytest.approx(get_graph_metrics(G, backend="networkx"), abs=1e-12)
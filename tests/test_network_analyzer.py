@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from src.analysis.network_analyzer import METRICS, analyze_midi_sequence_as_network, analyze_sequences_as_networks
+
+def _sequences(count=60, seed=0):
+    rng = np.random.default_rng(seed)
+    sequences = [[], [60], [60, 60, 60], [60, 62, 60, 62], [0, 127, 0]]
+    for _ in range(count):
+        # Narrow note ranges give repeated transitions, self-loops and triangles
+        low = int(rng.integers(30, 80))
+        sequences.append(rng.integers(low, low + rng.integers(2, 15), size=rng.integers(1, 120)).tolist())
+    return sequences
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 256])
+def test_numpy_metrics_match_networkx(chunk_size):
+    sequences = _sequences()
+    table = analyze_sequences_as_networks(sequences, chunk_size=chunk_size)
+    for i, sequence in enumerate(sequences):
+        expected = analyze_midi_sequence_as_network(sequence, engine="networkx")
+        for name in METRICS:
+            assert table[name][i] == pytest.approx(expected[name], abs=1e-12), (name, sequence)
+
+def test_single_sequence_engines_agree():
+    for sequence in _sequences(count=10, seed=1):
+        numpy_metrics = analyze_midi_sequence_as_network(sequence, engine="numpy")
+        networkx_metrics = analyze_midi_sequence_as_network(sequence, engine="networkx")
+        assert numpy_metrics == pytest.approx(networkx_metrics, abs=1e-12)
+
+def test_store_layout_matches_list_of_sequences():
+    sequences = _sequences(count=20, seed=2)
+    offsets = np.cumsum([0] + [len(sequence) for sequence in sequences])
+    tokens = np.concatenate([np.asarray(sequence, dtype=np.uint8) for sequence in sequences])
+    by_store = analyze_sequences_as_networks(tokens, offsets)
+    by_list = analyze_sequences_as_networks(sequences)
+    for name in METRICS:
+        np.testing.assert_array_equal(by_store[name], by_list[name])
+
+def test_rejects_notes_outside_the_midi_range():
+    with pytest.raises(ValueError):
+        analyze_sequences_as_networks([[60, 128]])
+    with pytest.raises(ValueError):
+        analyze_midi_sequence_as_network([60], engine="igraph")
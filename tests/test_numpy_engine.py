@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from src.generation.numpy_engine import NumpyLSTM, export_weights, quantize_int8, check_parity
+
+# Maximum |Keras - NumPy| of the window-path probabilities and of the incremental-path logits
+TOLERANCES = {
+    "float32": (1e-5, 1e-4),
+    "float16": (1e-3, 1e-2),
+    "int8": (1e-2, 1e-1),
+}
+
+@pytest.mark.parametrize("dtype", list(TOLERANCES))
+def test_parity_with_keras(keras_model, tmp_path, dtype):
+    path = export_weights(keras_model, str(tmp_path / f"{dtype}.npz"), dtype=np.dtype(dtype))
+    parity = check_parity(keras_model, NumpyLSTM.load(path), steps=16)
+    window_tolerance, step_tolerance = TOLERANCES[dtype]
+    assert parity["window_max_abs_diff"] < window_tolerance
+    assert parity["step_max_abs_diff"] < step_tolerance
+
+def test_predict_returns_distributions(keras_model, tmp_path):
+    model = NumpyLSTM.load(export_weights(keras_model, str(tmp_path / "model.npz")))
+    probs = model.predict(np.random.default_rng(1).integers(0, model.vocab_size, size=(3, 49)))
+    assert probs.shape == (3, model.vocab_size)
+    np.testing.assert_allclose(probs.sum(axis=1), 1.0, rtol=1e-5)
+
+def test_quantize_int8_error_is_within_half_a_step():
+    w = np.random.default_rng(2).normal(size=(32, 16)).astype(np.float32)
+    q, scale = quantize_int8(w)
+    assert q.dtype == np.int8
+    assert np.all(np.abs(q.astype(np.float32) * scale - w) <= scale / 2 + 1e-7)
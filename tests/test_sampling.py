@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from src.generation.sampling import BatchSampler, log_softmax, validate_sampling_options
+
+VOCAB_SIZE = 8
+
+def _logits(rows=1, seed=0):
+    return np.random.default_rng(seed).normal(size=(rows, VOCAB_SIZE))
+
+def test_samples_follow_the_softmax():
+    logits = _logits()
+    sampler = BatchSampler(VOCAB_SIZE)
+    sampler.add(rng=np.random.default_rng(0))
+    draws = np.array([sampler.sample(logits=logits)[0] for _ in range(20000)])
+    frequencies = np.bincount(draws, minlength=VOCAB_SIZE) / len(draws)
+    np.testing.assert_allclose(frequencies, np.exp(log_softmax(logits))[0], atol=0.015)
+
+def test_probabilities_and_logits_give_the_same_draws():
+    logits = _logits(rows=4)
+    by_logits, by_probs = BatchSampler(VOCAB_SIZE), BatchSampler(VOCAB_SIZE)
+    for row in range(4):
+        by_logits.add(rng=np.random.default_rng(row))
+        by_probs.add(rng=np.random.default_rng(row))
+    for _ in range(50):
+        np.testing.assert_array_equal(by_logits.sample(logits=logits), by_probs.sample(probs=np.exp(log_softmax(logits))))
+
+def test_top_k_and_top_p_keep_only_the_most_likely_notes():
+    logits = _logits(rows=3)
+    sampler = BatchSampler(VOCAB_SIZE)
+    sampler.add(top_k=1, rng=np.random.default_rng(0))
+    sampler.add(top_p=1e-6, rng=np.random.default_rng(1))
+    sampler.add(top_k=3, rng=np.random.default_rng(2))
+    top_3 = set(np.argsort(logits[2])[-3:])
+    for _ in range(200):
+        indices = sampler.sample(logits=logits)
+        assert indices[0] == np.argmax(logits[0])
+        assert indices[1] == np.argmax(logits[1])
+        assert indices[2] in top_3
+
+def test_max_consecutive_breaks_runs():
+    logits = np.full((1, VOCAB_SIZE), -5.0)
+    logits[0, 3] = 5.0
+    sampler = BatchSampler(VOCAB_SIZE)
+    sampler.add(max_consecutive=2, rng=np.random.default_rng(0))
+    draws = [int(sampler.sample(logits=logits)[0]) for _ in range(300)]
+    longest, current = 0, 0
+    for previous, note in zip([None] + draws, draws):
+        current = current + 1 if note == previous else 1
+        longest = max(longest, current)
+    assert longest <= 2
+
+def test_repetition_penalty_discourages_recent_notes():
+    logits = np.zeros((1, VOCAB_SIZE))
+    logits[0, 0] = 1.0
+    plain, penalised = BatchSampler(VOCAB_SIZE), BatchSampler(VOCAB_SIZE)
+    plain.add(rng=np.random.default_rng(0), history=[0] * 4)
+    penalised.add(repetition_penalty=4.0, rng=np.random.default_rng(0), history=[0] * 4)
+    plain_draws = [plain.sample(logits=logits)[0] for _ in range(2000)]
+    penalised_draws = [penalised.sample(logits=logits)[0] for _ in range(2000)]
+    assert np.mean(np.array(penalised_draws) == 0) < np.mean(np.array(plain_draws) == 0)
+
+def test_rows_sample_independently_of_the_batch():
+    logits = _logits(rows=3)
+    alone = BatchSampler(VOCAB_SIZE)
+    alone.add(temperature=0.7, top_k=4, rng=np.random.default_rng(42))
+    batch = BatchSampler(VOCAB_SIZE)
+    batch.add(temperature=1.5, rng=np.random.default_rng(1))
+    batch.add(temperature=0.7, top_k=4, rng=np.random.default_rng(42))
+    batch.add(top_p=0.5, rng=np.random.default_rng(2))
+    for _ in range(100):
+        assert alone.sample(logits=logits[1:2])[0] == batch.sample(logits=logits)[1]
+
+def test_keep_drops_rows_and_their_options():
+    logits = _logits(rows=3)
+    sampler = BatchSampler(VOCAB_SIZE)
+    sampler.add(top_k=1, rng=np.random.default_rng(0))
+    sampler.add(rng=np.random.default_rng(1))
+    sampler.add(top_p=1e-6, rng=np.random.default_rng(2))
+    sampler.keep([True, False, True])
+    assert sampler.rows == 2
+    indices = sampler.sample(logits=logits[[0, 2]])
+    assert list(indices) == [np.argmax(logits[0]), np.argmax(logits[2])]
+
+def test_buffers_grow_past_the_initial_capacity():
+    sampler = BatchSampler(VOCAB_SIZE, capacity=1)
+    for row in range(5):
+        sampler.add(rng=np.random.default_rng(row))
+    assert sampler.sample(logits=_logits(rows=5)).shape == (5,)
+
+@pytest.mark.parametrize("options", [
+    {"temperature": 0}, {"top_p": 0}, {"top_p": 1.5}, {"top_k": -1}, {"repetition_penalty": 0}, {"max_consecutive": -1},
+])
+def test_invalid_options_are_rejected(options):
+    with pytest.raises(ValueError):
+        validate_sampling_options(**options)
+    with pytest.raises(ValueError):
+        BatchSampler(VOCAB_SIZE).add(**options)
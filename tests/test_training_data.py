@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.data_preprocessing.sequence_store import SequenceStore, SequenceStoreWriter
+from src.modeling.evaluate_likelihood import training_windows
+from src.modeling.modeling import build_training_data, window_keys
+
+SEQUENCE_LENGTH = 10
+
+def _sources(genre, count, seed):
+    rng = np.random.default_rng(seed)
+    sources = []
+    for i in range(count):
+        lengths = rng.integers(SEQUENCE_LENGTH + 1, 40, size=rng.integers(1, 4))
+        sources.append((f"{genre}_{i}.jams", rng.integers(50, 70, size=lengths.sum()), lengths))
+    return sources
+
+def _write_store(directory, genre, sources):
+    # Named as the preprocessing names them, next to the (here empty) text file
+    (directory / f"processed_sequences_{genre or 'all'}.txt").touch()
+    path = directory / f"processed_sequences_{genre or 'all'}.store"
+    writer = SequenceStoreWriter(str(path), genre=genre)
+    for source_file, tokens, lengths in sources:
+        writer.add(tokens, lengths, np.zeros(len(lengths), dtype=np.int8), source_file=source_file)
+    writer.close()
+    return SequenceStore(str(path))
+
+def _windows(batches):
+    return {batches.windows[start].tobytes() for start in batches.starts}
+
+@pytest.fixture
+def stores(tmp_path):
+    rock, jazz = _sources("rock", 6, 0), _sources("jazz", 6, 1)
+    # The all-genres store interleaves the files, as a directory listing would
+    everything = [source for pair in zip(rock, jazz) for source in pair]
+    return (_write_store(tmp_path, None, everything),
+            [_write_store(tmp_path, "rock", rock), _write_store(tmp_path, "jazz", jazz)])
+
+@pytest.mark.parametrize("augmentation", ["random", "none", "exhaustive"])
+def test_all_genres_training_leaves_out_the_genre_validation_windows(stores, augmentation):
+    all_store, genre_stores = stores
+    _, train, validation = build_training_data(all_store, SEQUENCE_LENGTH, augmentation, held_out_of=genre_stores)
+    _, full_train, full_validation = build_training_data(all_store, SEQUENCE_LENGTH, augmentation)
+    genre_validation = set().union(*(_windows(build_training_data(store, SEQUENCE_LENGTH, augmentation)[2])
+                                     for store in genre_stores))
+
+    assert genre_validation & _windows(full_train)
+    assert not genre_validation & _windows(train)
+    # Only genre validation windows are dropped, and the all-genres validation split is unchanged
+    assert _windows(full_train) - _windows(train) <= genre_validation
+    np.testing.assert_array_equal(validation.starts, full_validation.starts)
+
+def test_a_distilled_student_is_credited_with_its_teachers_windows(stores, tmp_path):
+    _, genre_stores = stores
+    info = {"sequence_length": SEQUENCE_LENGTH, "augmentation": "random", "held_out_genres": ["Rock", "Jazz"]}
+    for name, extra in [("all", {"init": "scratch"}), ("all_fast", {"init": "distilled", "teacher": "all"}),
+                        ("rock_fast", {"init": "distilled", "teacher": "rock"})]:
+        with open(tmp_path / f"guitar_solo_generator_{name}.training.json", "w") as f:
+            json.dump({**info, **extra}, f)
+
+    source_ids = {}
+    student = training_windows("all_fast", str(tmp_path), str(tmp_path), source_ids)
+    np.testing.assert_array_equal(student, training_windows("all", str(tmp_path), str(tmp_path), source_ids))
+    for store in genre_stores:
+        validation = build_training_data(store, SEQUENCE_LENGTH, "random")[2]
+        assert not np.isin(window_keys(store, validation.starts, source_ids), student).any()
+    # The rock teacher has no .training.json, so neither is its student's training data known
+    assert training_windows("rock_fast", str(tmp_path), str(tmp_path), source_ids) is None
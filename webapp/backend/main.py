@@ -1,22 +1,154 @@
 import os
 import sys
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
+import json
+import io
+import base64
+import asyncio
+import zipfile
+import logging
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal, Optional
+from concurrent.futures import Future
+import numpy as np
 import uuid # For unique filenames
 
-# Add the parent directory of src to the Python path to import generate
-# This assumes the webapp/backend is one level below the project root
+# Add the project root to the Python path to import the generation package
+# This assumes the webapp/backend is two levels below the project root
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-sys.path.insert(0, os.path.join(project_root, 'src', 'generation'))
+sys.path.insert(0, project_root)
 
 try:
-    from generate import generate_music
+    from src.generation.generate import generate_notes, generate_candidates, midi_bytes, midi_notes, seed_to_pattern
+    from src.generation.model_registry import registry as model_registry, GENRES, TIERS
+    from src.generation.batch_scheduler import BatchScheduler
+    from src.generation.executor import GenerationExecutor, ExecutorSaturated, ExecutorShuttingDown
+    from src.generation.output_store import OutputStore
+    from src.generation.result_cache import ResultCache, result_cache_key
 except ImportError as e:
-    raise RuntimeError(f"Could not import generate_music. Make sure src/generation is in PYTHONPATH. Error: {e}")
+    raise RuntimeError(f"Could not import the generation modules. Make sure the project root is in PYTHONPATH. Error: {e}")
 
-app = FastAPI()
+# Model cache configuration
+# MODEL_CACHE_MAX_MB: memory budget for resident models (unset or 0 = unbounded)
+# WARMUP_GENRES: comma-separated genres to load and warm up at startup, or "all"
+# DECODING_MODE: "window" (re-feed the full window per note) or "incremental" (stateful, one step per note)
+# INFERENCE_ENGINE: "keras" (.h5 models) or "numpy" (exported .npz weights, TensorFlow is never imported)
+MODEL_CACHE_MAX_MB = float(os.environ.get("MODEL_CACHE_MAX_MB", "0"))
+WARMUP_GENRES = os.environ.get("WARMUP_GENRES", "")
+DECODING_MODE = os.environ.get("DECODING_MODE", "window")
+INFERENCE_ENGINE = os.environ.get("INFERENCE_ENGINE", "keras").lower()
+
+# Dynamic batching configuration
+# BATCHING_ENABLED: decode concurrent requests of the same genre together (implies incremental decoding)
+# BATCH_MAX_SIZE: maximum number of requests decoded in one forward pass
+# BATCH_MAX_WAIT_MS: how long an idle genre worker waits for more requests before starting
+BATCHING_ENABLED = os.environ.get("BATCHING_ENABLED", "0").lower() in ("1", "true", "yes")
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "5"))
+
+# Execution layer configuration
+# GENERATION_WORKERS: number of threads running generation outside the event loop
+# GENERATION_QUEUE_SIZE: requests allowed to wait for a worker before answering 429. With batching
+#   enabled the default admits a full batch (BATCH_MAX_SIZE) for every genre worker, so batches can fill
+# GENERATION_TIMEOUT_S: per-request timeout, after which generation is cancelled
+GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "2"))
+DEFAULT_QUEUE_SIZE = max(BATCH_MAX_SIZE * len(GENRES) - GENERATION_WORKERS, 8) if BATCHING_ENABLED else 8
+GENERATION_QUEUE_SIZE = int(os.environ.get("GENERATION_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+GENERATION_TIMEOUT_S = float(os.environ.get("GENERATION_TIMEOUT_S", "300"))
+
+# Request limits (requests outside them are answered 422 before being queued)
+# MAX_GENERATION_LENGTH: most notes a single request can ask for
+# MAX_CANDIDATES: most candidates decoded for one /generate_solo request
+MAX_GENERATION_LENGTH = int(os.environ.get("MAX_GENERATION_LENGTH", "2000"))
+MAX_CANDIDATES = int(os.environ.get("MAX_CANDIDATES", "16"))
+DISCONNECT_POLL_S = 0.5
+
+# Output and logging configuration
+# PERSIST_OUTPUT: also keep a copy of every generated MIDI in output/ (responses never read from disk)
+# OUTPUT_MAX_FILES / OUTPUT_MAX_MB / OUTPUT_MAX_AGE_HOURS: retention policy for output/ (0 = unbounded)
+# OUTPUT_SWEEP_INTERVAL_S: how often the background sweeper applies the retention policy
+# METRICS_INDEX: record the generation parameters of every stored file in output/metrics.sqlite
+# LOG_LEVEL: e.g. DEBUG to see per-step generation details
+PERSIST_OUTPUT = os.environ.get("PERSIST_OUTPUT", "1").lower() in ("1", "true", "yes")
+OUTPUT_MAX_FILES = int(os.environ.get("OUTPUT_MAX_FILES", "1000"))
+OUTPUT_MAX_MB = float(os.environ.get("OUTPUT_MAX_MB", "0"))
+OUTPUT_MAX_AGE_HOURS = float(os.environ.get("OUTPUT_MAX_AGE_HOURS", "0"))
+OUTPUT_SWEEP_INTERVAL_S = float(os.environ.get("OUTPUT_SWEEP_INTERVAL_S", "60"))
+METRICS_INDEX = os.environ.get("METRICS_INDEX", "1").lower() in ("1", "true", "yes")
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Result cache configuration (only requests with an explicit seed are cached)
+# RESULT_CACHE_SIZE: number of generated files kept in memory (0 disables the cache)
+# RESULT_CACHE_DIR: optional directory for the on-disk tier, relative to the project root
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+
+logging.basicConfig(level=LOG_LEVEL)
+logger = logging.getLogger(__name__)
+
+model_registry.max_bytes = int(MODEL_CACHE_MAX_MB * 1024 * 1024) if MODEL_CACHE_MAX_MB > 0 else None
+model_registry.warm_up = True
+model_registry.decoding = "incremental" if BATCHING_ENABLED else DECODING_MODE
+model_registry.engine = INFERENCE_ENGINE
+
+batch_scheduler = BatchScheduler(model_registry.get, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT_MS / 1000) if BATCHING_ENABLED else None
+# With batching enabled the queue still bounds admission, but decoding runs on the scheduler threads
+generation_executor = GenerationExecutor(max_workers=GENERATION_WORKERS, max_queue=GENERATION_QUEUE_SIZE)
+if batch_scheduler is not None and generation_executor.capacity < BATCH_MAX_SIZE:
+    logger.warning(f"Admission capacity {generation_executor.capacity} (GENERATION_WORKERS + GENERATION_QUEUE_SIZE) "
+                   f"is below BATCH_MAX_SIZE={BATCH_MAX_SIZE}: batches can never fill.")
+
+output_store = OutputStore(
+    os.path.join(project_root, "output"),
+    max_files=OUTPUT_MAX_FILES or None,
+    max_bytes=int(OUTPUT_MAX_MB * 1024 * 1024) or None,
+    max_age=OUTPUT_MAX_AGE_HOURS * 3600 or None
+) if PERSIST_OUTPUT else None
+
+# Opened on first use: metrics_index imports the network analysis (networkx), which startup doesn't need
+_metrics_index = None
+_metrics_index_lock = threading.Lock()
+
+def get_metrics_index():
+    """The metrics index of the output directory, or None if PERSIST_OUTPUT or METRICS_INDEX is off."""
+    global _metrics_index
+    if output_store is None or not METRICS_INDEX:
+        return None
+    with _metrics_index_lock:
+        if _metrics_index is None:
+            from src.analysis.metrics_index import MetricsIndex, INDEX_FILENAME
+            _metrics_index = MetricsIndex(os.path.join(output_store.directory, INDEX_FILENAME))
+    return _metrics_index
+
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    disk_dir=os.path.join(project_root, RESULT_CACHE_DIR) if RESULT_CACHE_DIR else None
+) if RESULT_CACHE_SIZE > 0 else None
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP_GENRES:
+        if WARMUP_GENRES.strip().lower() == "all":
+            warmup_genres = GENRES
+        else:
+            warmup_genres = [g.strip() for g in WARMUP_GENRES.split(",") if g.strip()]
+        logger.info(f"Warming up models for genres: {warmup_genres}")
+        model_registry.preload(warmup_genres)
+    if output_store is not None:
+        output_store.start_sweeper(OUTPUT_SWEEP_INTERVAL_S)
+    yield
+    if output_store is not None:
+        output_store.stop_sweeper()
+    generation_executor.shutdown()
+    if batch_scheduler is not None:
+        batch_scheduler.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 origins = [
@@ -37,35 +169,259 @@ app.add_middleware(
 )
 
 class GenerateRequest(BaseModel):
-    genre: str
+    genre: Literal[tuple(GENRES)]
     seed_notes: str
-    temperature: float = 1.0
-    generation_length: int = 500 # Add generation_length with a default value
+    temperature: float = Field(1.0, gt=0, le=10)
+    generation_length: int = Field(500, ge=1, le=MAX_GENERATION_LENGTH) # Add generation_length with a default value
+    seed: Optional[int] = Field(None, ge=0) # Random seed; makes the generation reproducible (and cacheable)
+    num_candidates: int = Field(1, ge=1, le=MAX_CANDIDATES) # More than 1 returns a zip of alternative solos, decoded as one batch
+    rank_candidates: bool = True # Sort the candidates by model log-likelihood
+    top_k: int = Field(0, ge=0, le=128) # Sample only among the k most likely notes (0 disables)
+    top_p: float = Field(1.0, gt=0, le=1) # Nucleus sampling: smallest set of notes with this much probability mass (1.0 disables)
+    repetition_penalty: float = Field(1.0, gt=0, le=10) # > 1 discourages recently played notes
+    max_consecutive: int = Field(0, ge=0, le=MAX_GENERATION_LENGTH) # Maximum repeats of the same note in a row (0 disables)
+    tier: Literal[TIERS] = "full" # "full" model or the distilled "fast" one (see src/modeling/distill.py)
+
+    @field_validator("genre", mode="before")
+    @classmethod
+    def _canonical_genre(cls, genre):
+        # Genres are matched case-insensitively, as the model files are
+        if isinstance(genre, str):
+            return next((known for known in GENRES if known.lower() == genre.lower()), genre)
+        return genre
+
+class ClientDisconnected(Exception):
+    pass
+
+def _request_rng(request):
+    return np.random.default_rng(request.seed) if request.seed is not None else None
+
+def _sampling_options(request):
+    return {
+        "temperature": request.temperature,
+        "top_k": request.top_k,
+        "top_p": request.top_p,
+        "repetition_penalty": request.repetition_penalty,
+        "max_consecutive": request.max_consecutive,
+    }
+
+def _generate_midi_bytes(request, cancel_event=None):
+    """Runs a full generation on a worker thread and returns the encoded MIDI file."""
+    generated_notes = list(generate_notes(
+        genre=request.genre,
+        seed_notes_str=request.seed_notes,
+        **_sampling_options(request),
+        generation_length=request.generation_length,
+        model_handle=model_registry.get(request.genre, request.tier),
+        decoding=DECODING_MODE,
+        cancel_event=cancel_event,
+        rng=_request_rng(request)
+    ))
+    return midi_bytes(generated_notes)
+
+def _generate_candidates_zip(request, cancel_event=None):
+    """
+    Decodes all candidates of a request as one batch and returns a zip with one MIDI
+    file per candidate plus candidates.json (file names and log-likelihoods, in rank order).
+    """
+    candidates = generate_candidates(
+        genre=request.genre,
+        seed_notes_str=request.seed_notes,
+        num_candidates=request.num_candidates,
+        **_sampling_options(request),
+        generation_length=request.generation_length,
+        model_handle=model_registry.get(request.genre, request.tier),
+        # The candidates are already batched, so the scheduler's stateful decoding is reused directly
+        decoding="incremental" if batch_scheduler is not None else DECODING_MODE,
+        cancel_event=cancel_event,
+        rng=_request_rng(request),
+        rank=request.rank_candidates
+    )
+    buffer = io.BytesIO()
+    summary = []
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for i, candidate in enumerate(candidates):
+            filename = f"candidate_{i + 1}.mid"
+            archive.writestr(filename, midi_bytes(candidate["notes"]))
+            summary.append({"file": filename, "log_likelihood": candidate["log_likelihood"]})
+        archive.writestr("candidates.json", json.dumps(summary, indent=2))
+    return buffer.getvalue()
+
+def _cacheable(request):
+    """
+    Whether a request's result can be served from (and stored in) the result cache:
+    it must be seeded and decoded on its own. With batching enabled a single-candidate
+    request (streamed or not) shares its forward passes with whatever else is in
+    flight, so its notes depend on the batch and cannot be regenerated from the
+    request alone; those are never cached.
+    """
+    if result_cache is None or request.seed is None:
+        return False
+    return batch_scheduler is None or request.num_candidates > 1
+
+def _request_cache_key(request):
+    """
+    Content address of a seeded request (see _cacheable). Runs on a worker thread since
+    it may load the model. A single-candidate request gets the same key on
+    /generate_solo and /generate_solo_stream, which decode it the same way.
+    """
+    handle = model_registry.get(request.genre, request.tier)
+    pattern = seed_to_pattern(request.seed_notes, handle.note_to_int)
+    decoding = DECODING_MODE
+    if request.num_candidates > 1:
+        decoding = "incremental" if batch_scheduler is not None else DECODING_MODE
+    return result_cache_key(handle.content_hash, request.genre, pattern, request.temperature, request.generation_length, request.seed, decoding,
+                            num_candidates=request.num_candidates, rank=request.rank_candidates,
+                            top_k=request.top_k, top_p=request.top_p, repetition_penalty=request.repetition_penalty,
+                            max_consecutive=request.max_consecutive)
+
+def _start_generation(request):
+    """Starts a generation and returns (future resolving to the response bytes, cancel callback)."""
+    if request.num_candidates > 1:
+        future, cancel_event = generation_executor.submit(_generate_candidates_zip, request)
+
+        def cancel():
+            cancel_event.set()
+            future.cancel()
+
+        return future, cancel
+
+    if batch_scheduler is not None:
+        # Decode together with the other in-flight requests for this genre
+        notes_future = generation_executor.track(lambda: batch_scheduler.submit(
+            request.genre,
+            request.seed_notes,
+            generation_length=request.generation_length,
+            **_sampling_options(request),
+            rng=_request_rng(request),
+            tier=request.tier
+        ))
+        future = Future()
+
+        def encode(f):
+            if f.cancelled():
+                future.cancel()
+            elif f.exception() is not None:
+                future.set_exception(f.exception())
+            else:
+                future.set_result(midi_bytes(f.result()))
+
+        notes_future.add_done_callback(encode)
+
+        def cancel():
+            notes_future.cancel()
+            future.cancel()
+
+        return future, cancel
+
+    # Run the generation on the worker pool so the event loop stays responsive
+    future, cancel_event = generation_executor.submit(_generate_midi_bytes, request)
+
+    def cancel():
+        cancel_event.set()
+        future.cancel()
+
+    return future, cancel
+
+def _generation_params(request):
+    """Parameters of a request, as recorded in the metrics index."""
+    return {
+        "genre": request.genre,
+        "tier": request.tier,
+        "seed_notes": request.seed_notes,
+        "generation_length": request.generation_length,
+        "seed": request.seed,
+        "engine": INFERENCE_ENGINE,
+        "decoding": DECODING_MODE,
+        "batching": BATCHING_ENABLED,
+        **_sampling_options(request),
+    }
+
+def _save_output(filename, data, params):
+    output_store.save(filename, data)
+    metrics_index = get_metrics_index()
+    if metrics_index is not None:
+        metrics_index.record_generation(filename, data, params)
+
+def _save_candidates(filename_prefix, zip_data, params):
+    with zipfile.ZipFile(io.BytesIO(zip_data)) as archive:
+        summary = {entry["file"]: entry for entry in json.loads(archive.read("candidates.json"))}
+        for name in archive.namelist():
+            if name.endswith(".mid"):
+                candidate = {"candidate": name, "log_likelihood": summary.get(name, {}).get("log_likelihood")}
+                _save_output(f"{filename_prefix}_{name}", archive.read(name), {**params, **candidate})
+
+async def _persist(filename, data, params):
+    """
+    Keeps a copy of a generated file (or of every candidate in a zip) in output/ if
+    persistence is enabled, and records its generation parameters in the metrics index.
+    """
+    if output_store is None:
+        return
+    try:
+        if filename.endswith(".zip"):
+            await asyncio.to_thread(_save_candidates, filename[:-len(".zip")], data, params)
+        else:
+            await asyncio.to_thread(_save_output, filename, data, params)
+    except (OSError, sqlite3.Error) as e:
+        # The response doesn't depend on the stored copy
+        logger.error(f"Could not persist {filename}: {e}")
+
+async def _wait_for_generation(future, http_request, cancel):
+    """
+    Awaits a concurrent future without blocking the event loop. On timeout or client
+    disconnect the generation is cancelled through cancel().
+    """
+    wrapped = asyncio.wrap_future(future)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + GENERATION_TIMEOUT_S
+    while True:
+        done, _ = await asyncio.wait({wrapped}, timeout=DISCONNECT_POLL_S)
+        if done:
+            return wrapped.result()
+        if await http_request.is_disconnected():
+            cancel()
+            raise ClientDisconnected()
+        if loop.time() >= deadline:
+            cancel()
+            raise HTTPException(status_code=504, detail=f"Solo generation timed out after {GENERATION_TIMEOUT_S:.0f} seconds.")
 
 @app.post("/generate_solo")
-async def generate_solo_endpoint(request: GenerateRequest):
+async def generate_solo_endpoint(request: GenerateRequest, http_request: Request):
     try:
-        # Create a unique filename for the generated MIDI
-        output_filename = f"{request.genre.lower()}_solo_{uuid.uuid4()}.mid"
-        output_path = os.path.join(project_root, "output", output_filename)
-        
-        # Ensure the output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-        # Call the generation function, passing the temperature and generation_length
-        generate_music(
-            genre=request.genre,
-            seed_notes_str=request.seed_notes,
-            output_path=output_path,
-            temperature=request.temperature,
-            generation_length=request.generation_length # Pass the generation_length here
-        )
+        # Create a unique filename for the generated MIDI (or zip of candidates)
+        if request.num_candidates > 1:
+            output_filename = f"{request.genre.lower()}_solos_{uuid.uuid4()}.zip"
+            media_type = "application/zip"
+        else:
+            output_filename = f"{request.genre.lower()}_solo_{uuid.uuid4()}.mid"
+            media_type = "audio/midi"
 
-        # Return the generated MIDI file with Content-Disposition header
-        return FileResponse(output_path, media_type="audio/midi", filename=output_filename, headers={"Content-Disposition": f"attachment; filename=\"{output_filename}\""})
+        if _cacheable(request):
+            # Seeded requests are deterministic: serve them from the cache, or share
+            # the computation of an identical request that is already in flight
+            key = await asyncio.to_thread(_request_cache_key, request)
+            future, source = result_cache.get_or_submit(key, lambda: _start_generation(request))
+            logger.debug(f"Result cache {source} for key {key[:12]}")
+            data = await _wait_for_generation(future, http_request, lambda: result_cache.abandon(key))
+        else:
+            future, cancel = _start_generation(request)
+            data = await _wait_for_generation(future, http_request, cancel)
 
+        await _persist(output_filename, data, _generation_params(request))
 
+        # Return the generated file (encoded in memory) with Content-Disposition header
+        return Response(content=data, media_type=media_type, headers={"Content-Disposition": f"attachment; filename=\"{output_filename}\""})
 
+    except HTTPException:
+        raise
+    except ClientDisconnected:
+        # Nobody is listening any more; 499 is the conventional "client closed request" status
+        return Response(status_code=499)
+    except ExecutorShuttingDown as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
@@ -73,6 +429,208 @@ async def generate_solo_endpoint(request: GenerateRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred during solo generation: {e}")
 
+def _stream_notes(request, notes_queue, loop, cancel_event=None):
+    """Runs generate_notes on a worker thread, handing every note to the event loop."""
+    def put(item):
+        loop.call_soon_threadsafe(notes_queue.put_nowait, item)
+
+    try:
+        for note in generate_notes(
+            genre=request.genre,
+            seed_notes_str=request.seed_notes,
+            **_sampling_options(request),
+            generation_length=request.generation_length,
+            model_handle=model_registry.get(request.genre, request.tier),
+            decoding=DECODING_MODE,
+            cancel_event=cancel_event,
+            rng=_request_rng(request)
+        ):
+            put(("note", note))
+        put(("end", None))
+    except Exception as e:
+        put(("error", e))
+
+def _start_stream(request, notes_queue, loop):
+    """
+    Starts a streamed generation that puts ("note", note) items on notes_queue, then
+    ("end", None) or ("error", exception). With batching enabled the request joins the
+    BatchScheduler like any other single-candidate request, otherwise it decodes on
+    the worker pool. Returns the cancel callback.
+    """
+    if batch_scheduler is not None:
+        def put(item):
+            loop.call_soon_threadsafe(notes_queue.put_nowait, item)
+
+        def finished(f):
+            if not f.cancelled():
+                put(("error", f.exception()) if f.exception() is not None else ("end", None))
+
+        notes_future = generation_executor.track(lambda: batch_scheduler.submit(
+            request.genre,
+            request.seed_notes,
+            generation_length=request.generation_length,
+            **_sampling_options(request),
+            rng=_request_rng(request),
+            tier=request.tier,
+            on_note=lambda note: put(("note", note))
+        ))
+        # Called after the last on_note, so "end" is queued after every note
+        notes_future.add_done_callback(finished)
+        return notes_future.cancel
+
+    future, cancel_event = generation_executor.submit(_stream_notes, request, notes_queue, loop)
+
+    def cancel():
+        cancel_event.set()
+        future.cancel()
+
+    return cancel
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _generation_error(e):
+    """HTTP error for an exception raised before any output was produced."""
+    if isinstance(e, FileNotFoundError):
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=400, detail=str(e))
+    return HTTPException(status_code=500, detail=f"An error occurred during solo generation: {e}")
+
+async def _replay_events(data, output_filename, request):
+    """SSE events of a cached solo: the same "note" events a live stream sends, then the "midi" event."""
+    for index, note in enumerate(midi_notes(data)):
+        yield _sse_event("note", {"index": index, "note": note})
+    await _persist(output_filename, data, _generation_params(request))
+    yield _sse_event("midi", {"filename": output_filename, "midi_base64": base64.b64encode(data).decode("ascii")})
+
+@app.post("/generate_solo_stream")
+async def generate_solo_stream_endpoint(request: GenerateRequest):
+    """
+    Streams the solo as Server-Sent Events while it is being decoded: one "note" event
+    per sampled note, then a "midi" event with the complete file (base64) at the end.
+    With batching enabled the request is decoded by the BatchScheduler, together with
+    the other requests in flight. Seeded requests share the result cache with
+    /generate_solo: a hit replays the cached solo.
+    """
+    if request.num_candidates != 1:
+        raise HTTPException(status_code=400, detail="Streaming supports a single candidate; use /generate_solo for num_candidates > 1.")
+
+    output_filename = f"{request.genre.lower()}_solo_{uuid.uuid4()}.mid"
+    key = None
+    if _cacheable(request):
+        try:
+            key = await asyncio.to_thread(_request_cache_key, request)
+        except Exception as e:
+            raise _generation_error(e)
+        cached = await asyncio.to_thread(result_cache.lookup, key)
+        if cached is not None:
+            logger.debug(f"Result cache hit for streamed key {key[:12]}")
+            return StreamingResponse(_replay_events(cached, output_filename, request), media_type="text/event-stream",
+                                     headers={"Cache-Control": "no-cache"})
+
+    loop = asyncio.get_running_loop()
+    notes_queue = asyncio.Queue()
+    started_at = loop.time()
+    try:
+        cancel = _start_stream(request, notes_queue, loop)
+    except ExecutorShuttingDown as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ExecutorSaturated as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ValueError as e:
+        raise _generation_error(e)
+
+    deadline = loop.time() + GENERATION_TIMEOUT_S
+
+    # Wait for the first note before answering, so that an unknown genre or an
+    # unparsable seed is still reported with a proper status code
+    try:
+        first_item = await asyncio.wait_for(notes_queue.get(), timeout=GENERATION_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        cancel()
+        raise HTTPException(status_code=504, detail=f"Solo generation timed out after {GENERATION_TIMEOUT_S:.0f} seconds.")
+    except asyncio.CancelledError:
+        cancel()
+        raise
+    kind, payload = first_item
+    if kind == "error":
+        raise _generation_error(payload)
+
+    async def events(kind, payload):
+        generated_notes = []
+        finished = False
+        try:
+            while True:
+                if kind == "note":
+                    yield _sse_event("note", {"index": len(generated_notes), "note": payload})
+                    generated_notes.append(payload)
+                elif kind == "end":
+                    finished = True
+                    encoded = midi_bytes(generated_notes)
+                    if key is not None:
+                        await asyncio.to_thread(result_cache.put, key, encoded, loop.time() - started_at)
+                    await _persist(output_filename, encoded, _generation_params(request))
+                    yield _sse_event("midi", {"filename": output_filename, "midi_base64": base64.b64encode(encoded).decode("ascii")})
+                    return
+                else:
+                    finished = True
+                    yield _sse_event("error", {"detail": f"An error occurred during solo generation: {payload}"})
+                    return
+                try:
+                    kind, payload = await asyncio.wait_for(notes_queue.get(), timeout=max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield _sse_event("error", {"detail": f"Solo generation timed out after {GENERATION_TIMEOUT_S:.0f} seconds."})
+                    return
+        finally:
+            # Stops the worker if the client went away or the stream timed out
+            if not finished:
+                cancel()
+
+    return StreamingResponse(events(kind, payload), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/models")
+async def models_status():
+    return model_registry.stats()
+
+@app.get("/scheduler")
+async def scheduler_status():
+    if batch_scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **batch_scheduler.stats()}
+
+@app.get("/executor")
+async def executor_status():
+    return generation_executor.stats()
+
+@app.post("/output/sweep")
+async def sweep_output():
+    if output_store is None:
+        return {"enabled": False, "removed": 0}
+    removed = await asyncio.to_thread(output_store.sweep)
+    return {"enabled": True, "removed": removed}
+
+@app.get("/output/metrics")
+async def output_metrics(group_by: str = "genre,temperature", genre: Optional[str] = None):
+    """
+    Mean network metrics of the stored solos per group, read from the metrics index.
+    Only files analysed by src/analysis/evaluate_models.py are counted.
+    """
+    metrics_index = await asyncio.to_thread(get_metrics_index)
+    if metrics_index is None:
+        return {"enabled": False}
+    try:
+        groups = await asyncio.to_thread(metrics_index.aggregate, [c.strip() for c in group_by.split(",") if c.strip()], genre)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"enabled": True, "groups": groups}
+
+@app.get("/result_cache")
+async def result_cache_status():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
 @app.get("/hello")
 async def read_root():
     return {"message": "Hello from FastAPI backend!"}
@@ -3,6 +3,8 @@ document.getElementById('generate-button').addEventListener('click', async () =>
     const seedNotes = document.getElementById('seed-input').value;
     const temperature = parseFloat(document.getElementById('temperature-slider').value);
     const generationLength = parseInt(document.getElementById('generation-length-input').value);
+    const seedValue = document.getElementById('seed-number-input').value;
+    const numCandidates = parseInt(document.getElementById('candidates-input').value);
 
     // Basic validation
     if (!seedNotes) {
@@ -14,42 +16,106 @@ document.getElementById('generate-button').addEventListener('click', async () =>
         return;
     }
 
+    const requestBody = { genre: genre, seed_notes: seedNotes, temperature: temperature, generation_length: generationLength };
+    if (seedValue !== '') {
+        requestBody.seed = parseInt(seedValue);
+    }
+
+    const notesPreview = document.getElementById('notes-preview');
+    const downloadLink = document.getElementById('download-link');
+    notesPreview.textContent = '';
+    downloadLink.style.display = 'none';
+
+    if (numCandidates > 1) {
+        // Alternative solos are decoded together and returned as a zip, best candidate first
+        requestBody.num_candidates = numCandidates;
+        try {
+            const response = await fetch('http://localhost:8000/generate_solo', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(requestBody),
+            });
+
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const blob = await response.blob();
+            const filename = `${genre.toLowerCase()}_solos.zip`;
+            downloadLink.href = URL.createObjectURL(blob);
+            downloadLink.download = filename;
+            downloadLink.style.display = 'block';
+            downloadLink.textContent = `Download ${numCandidates} candidates (${filename})`;
+        } catch (error) {
+            console.error('Error generating solos:', error);
+            alert('Failed to generate solos. Check console for details.');
+        }
+        return;
+    }
+
     try {
-        const response = await fetch('http://localhost:8000/generate_solo', {
+        // The streaming endpoint sends every note as soon as it is sampled (Server-Sent Events),
+        // followed by the complete MIDI file once the solo is finished.
+        const response = await fetch('http://localhost:8000/generate_solo_stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
-            body: JSON.stringify({ genre: genre, seed_notes: seedNotes, temperature: temperature, generation_length: generationLength }),
+            body: JSON.stringify(requestBody),
         });
 
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const blob = await response.blob();
-        const contentDisposition = response.headers.get('Content-Disposition');
-        console.log('Content-Disposition header:', contentDisposition); // DEBUG
-        let filename = 'generated_solo.mid';
-        if (contentDisposition && contentDisposition.indexOf('attachment') !== -1) {
-            const filenameRegex = /filename[^;=\n]*=((['"]).*?\2|[^;\n]*)/;
-            const matches = filenameRegex.exec(contentDisposition);
-            if (matches != null && matches[1]) {
-                filename = decodeURIComponent(matches[1].replace(/\+/g, ' '));
-                if (filename.startsWith("'") || filename.startsWith("\"")) {
-                    filename = filename.slice(1, -1);
-                }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let notesCount = 0;
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
             }
-        }
-        console.log('Extracted filename:', filename); // DEBUG
+            buffer += decoder.decode(value, { stream: true });
 
-        const url = URL.createObjectURL(blob);
+            // SSE events are separated by a blank line
+            let separatorIndex;
+            while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, separatorIndex);
+                buffer = buffer.slice(separatorIndex + 2);
+
+                let eventName = 'message';
+                let data = '';
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event: ')) {
+                        eventName = line.slice(7);
+                    } else if (line.startsWith('data: ')) {
+                        data += line.slice(6);
+                    }
+                }
+                const payload = JSON.parse(data);
 
-        const downloadLink = document.getElementById('download-link');
-        downloadLink.href = url;
-        downloadLink.download = filename;
-        downloadLink.style.display = 'block';
-        downloadLink.textContent = `Download ${filename}`;
+                if (eventName === 'note') {
+                    notesCount += 1;
+                    notesPreview.textContent += (notesCount > 1 ? ' ' : '') + payload.note;
+                } else if (eventName === 'midi') {
+                    const midiData = Uint8Array.from(atob(payload.midi_base64), c => c.charCodeAt(0));
+                    const blob = new Blob([midiData], { type: 'audio/midi' });
+                    const url = URL.createObjectURL(blob);
+
+                    downloadLink.href = url;
+                    downloadLink.download = payload.filename;
+                    downloadLink.style.display = 'block';
+                    downloadLink.textContent = `Download ${payload.filename}`;
+                } else if (eventName === 'error') {
+                    throw new Error(payload.detail);
+                }
+            }
+        }
 
     } catch (error) {
         console.error('Error generating solo:', error);